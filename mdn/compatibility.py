@@ -49,6 +49,29 @@ compat_feature_grammar = Grammar(compat_feature_grammar_source)
 compat_support_grammar = Grammar(compat_support_grammar_source)
 compat_footnote_grammar = compat_feature_grammar
 
+# Parse trees of recent table cells, keyed by grammar and raw cell text
+cell_parse_cache = OrderedDict()
+cell_parse_cache_size = 5000
+
+
+def parse_cell(grammar, raw_text):
+    """Parse the raw text of a table cell, reusing recent parse trees.
+
+    MDN compatibility tables repeat the same cells, such as "1.0" or
+    "{{CompatNo}}", many times.  Parse tree positions are relative to the
+    cell, and visitors add the cell offset, so one tree can be used for all
+    the identical cells.
+    """
+    key = (id(grammar), raw_text)
+    try:
+        tree = cell_parse_cache.pop(key)
+    except KeyError:
+        tree = grammar.parse(raw_text)
+        while len(cell_parse_cache) >= cell_parse_cache_size:
+            cell_parse_cache.popitem(last=False)
+    cell_parse_cache[key] = tree
+    return tree
+
 
 class CompatSectionExtractor(Extractor):
     """Extracts data from elements parsed from a Browser Compatibility section.
@@ -301,7 +324,7 @@ class CompatSectionExtractor(Extractor):
     def cell_to_feature(self, cell):
         """Parse cell items as a feature (first column)"""
         raw_text = cell.raw
-        reparsed = compat_feature_grammar.parse(raw_text)
+        reparsed = parse_cell(compat_feature_grammar, raw_text)
         visitor = CompatFeatureVisitor(
             parent_feature=self.feature, offset=cell.start, data=self.data)
         visitor.visit(reparsed)
@@ -313,7 +336,7 @@ class CompatSectionExtractor(Extractor):
     def cell_to_support(self, cell, feature, browser):
         """Parse a cell as a support (middle cell)."""
         raw_text = cell.raw
-        reparsed = compat_support_grammar.parse(raw_text)
+        reparsed = parse_cell(compat_support_grammar, raw_text)
         visitor = CompatSupportVisitor(
             feature_id=feature['id'], browser_id=browser['id'],
             browser_name=browser['name'], browser_slug=browser['slug'],
@@ -16,10 +16,49 @@ class Data(object):
     This class loads the data and, if it can, caches the data.
     """
 
-    def __init__(self):
+    def __init__(self, snapshot=False):
+        """Initialize Data.
+
+        If snapshot is True, then all the needed data is loaded at once, and
+        lookups do not query the database.  This is faster for parsing many
+        pages, but the data is not updated if the database changes.
+        """
         self.specifications = {}
         self.browser_data = None
         self.subfeature_data = {}
+        self.snapshot = None
+        if snapshot:
+            self.load_snapshot()
+
+    Snapshot = namedtuple(
+        'Snapshot', ['children', 'sections', 'slugs', 'supports', 'versions'])
+
+    def load_snapshot(self):
+        """Load the data used by lookups into in-memory indexes."""
+        children = {}
+        slugs = set()
+        for feature in Feature.objects.all():
+            children.setdefault(feature.parent_id, []).append(feature)
+            slugs.add(feature.slug)
+
+        sections = {}
+        for section in Section.objects.all():
+            sections.setdefault(section.specification_id, []).append(section)
+
+        supports = dict(
+            ((version_id, feature_id), support_id)
+            for support_id, version_id, feature_id in
+            Support.objects.values_list('id', 'version_id', 'feature_id'))
+
+        versions = dict(
+            ((version.browser_id, version.version), version)
+            for version in Version.objects.all())
+
+        for spec in Specification.objects.all():
+            self.specifications[spec.mdn_key] = spec
+
+        self.snapshot = self.Snapshot(
+            children, sections, slugs, supports, versions)
 
     BrowserParams = namedtuple(
         'BrowserParams', ['browser', 'browser_id', 'name', 'slug'])
@@ -112,7 +151,11 @@ class Data(object):
         # Initialize subfeature data as needed
         if parent_feature.id not in self.subfeature_data:
             subfeatures = {}
-            for feature in Feature.objects.filter(parent=parent_feature):
+            if self.snapshot:
+                children = self.snapshot.children.get(parent_feature.id, [])
+            else:
+                children = Feature.objects.filter(parent=parent_feature)
+            for feature in children:
                 if 'zxx' in feature.name:
                     fname = feature.name['zxx']
                 else:
@@ -131,7 +174,7 @@ class Data(object):
             while not feature_slug:
                 base_slug = parent_feature.slug + '_' + nname
                 feature_slug = slugify(base_slug, suffix=attempt)
-                if Feature.objects.filter(slug=feature_slug).exists():
+                if self.slug_exists(feature_slug):
                     attempt += 1
                     feature_slug = ''
             subfeatures[nname] = self.FeatureParams(
@@ -139,15 +182,27 @@ class Data(object):
 
         return self.subfeature_data[parent_feature.id][nname]
 
+    def slug_exists(self, slug):
+        """Check if a Feature has the slug."""
+        if self.snapshot:
+            return slug in self.snapshot.slugs
+        return Feature.objects.filter(slug=slug).exists()
+
     def lookup_section_id(self, spec_id, subpath, locale='en'):
         """Retrieve a section ID given a Specification ID and subpath."""
-        for section in Section.objects.filter(specification_id=spec_id):
+        if self.snapshot:
+            sections = self.snapshot.sections.get(spec_id, [])
+        else:
+            sections = Section.objects.filter(specification_id=spec_id)
+        for section in sections:
             if section.subpath.get(locale) == subpath:
                 return section.id
         return None
 
     def lookup_specification(self, mdn_key):
         """Retrieve a Specification by key."""
+        if self.snapshot and mdn_key not in self.specifications:
+            return None
         if mdn_key not in self.specifications:
             try:
                 spec = Specification.objects.get(mdn_key=mdn_key)
@@ -158,20 +213,21 @@ class Data(object):
 
     def lookup_support_id(self, version_id, feature_id):
         """Lookup or create a support ID for a version and feature."""
-        support = None
+        support_id = None
         real_version = not is_new_id(version_id)
         real_feature = not is_new_id(feature_id)
         if real_version and real_feature:
             # Might be known version
-            try:
-                support = Support.objects.get(
-                    version=version_id, feature=feature_id)
-            except Support.DoesNotExist:
-                pass
-        if support:
-            # Known support
-            support_id = support.id
-        else:
+            if self.snapshot:
+                support_id = self.snapshot.supports.get(
+                    (version_id, feature_id))
+            else:
+                try:
+                    support_id = Support.objects.get(
+                        version=version_id, feature=feature_id).id
+                except Support.DoesNotExist:
+                    pass
+        if not support_id:
             # New support
             support_id = "_%s-%s" % (feature_id, version_id)
         return support_id
@@ -196,11 +252,15 @@ class Data(object):
         version = None
         if not is_new_id(browser_id):
             # Might be known version
-            try:
-                version = Version.objects.get(
-                    browser=browser_id, version=version_name)
-            except Version.DoesNotExist:
-                pass
+            if self.snapshot:
+                version = self.snapshot.versions.get(
+                    (browser_id, version_name))
+            else:
+                try:
+                    version = Version.objects.get(
+                        browser=browser_id, version=version_name)
+                except Version.DoesNotExist:
+                    pass
         if version:
             # Known version
             version_id = version.id
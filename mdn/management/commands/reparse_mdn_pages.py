@@ -0,0 +1,126 @@
+"""Reparse the cached MDN content of FeaturePages in parallel."""
+from __future__ import unicode_literals
+from multiprocessing import Pool, cpu_count
+from optparse import make_option
+from time import time
+from traceback import format_exc
+
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from mdn.data import Data
+from mdn.models import FeaturePage, TranslatedContent
+from mdn.scrape import scrape_feature_page
+
+# Lookup data for the pages parsed by this process
+worker_data = None
+
+
+def init_worker():
+    """Setup a worker process with its own connections and lookup data."""
+    global worker_data
+    for connection in connections.all():
+        connection.close()
+    worker_data = Data(snapshot=True)
+
+
+def reparse_pages(featurepage_ids):
+    """Reparse a batch of FeaturePages in a worker process."""
+    return reparse_batch(featurepage_ids, worker_data)
+
+
+def reparse_batch(featurepage_ids, data):
+    """Reparse a batch of FeaturePages in one transaction.
+
+    Each page is reparsed in a savepoint, so a database error only rolls
+    back that page.  Return is the number of pages reparsed without an
+    exception.
+    """
+    count = 0
+    with transaction.atomic():
+        for fp in FeaturePage.objects.filter(id__in=featurepage_ids):
+            with transaction.atomic():
+                if reparse_page(fp, data):
+                    count += 1
+    return count
+
+
+def reparse_page(fp, data):
+    """Reparse a FeaturePage, recording unexpected exceptions as issues.
+
+    Return is True if the page was reparsed without an exception.
+    """
+    fp.status = FeaturePage.STATUS_PARSING
+    fp.reset_data()
+    try:
+        with transaction.atomic():
+            scrape_feature_page(fp, data=data)
+    except Exception:
+        fp.status = FeaturePage.STATUS_ERROR
+        fp.add_issue(('exception', 0, 0, {'traceback': format_exc()}))
+        fp.save()
+        return False
+    return True
+
+
+class Command(BaseCommand):
+    args = '<featurepage_id featurepage_id ...>'
+    help = (
+        'Reparse the cached MDN content of FeaturePages, or all pages with'
+        ' cached English content if no IDs are given.')
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--processes', type='int', default=cpu_count(),
+            help='Number of worker processes, or 1 to parse in-process'),
+        make_option(
+            '--batch', type='int', default=20,
+            help='Number of pages to write per transaction'),
+    )
+
+    def handle(self, *args, **options):
+        self.verbosity = int(options['verbosity'])
+        pages = FeaturePage.objects.filter(
+            translatedcontent__locale='en-US',
+            translatedcontent__status=TranslatedContent.STATUS_FETCHED)
+        if args:
+            pages = pages.filter(id__in=[int(arg) for arg in args])
+        page_ids = list(pages.order_by('id').values_list('id', flat=True))
+        batch_size = options['batch']
+        batches = [
+            page_ids[start:start + batch_size]
+            for start in range(0, len(page_ids), batch_size)]
+
+        start = time()
+        processes = options['processes']
+        if processes > 1 and len(batches) > 1:
+            # Don't share the parent's connection with the workers
+            for connection in connections.all():
+                connection.close()
+            pool = Pool(processes, init_worker)
+            try:
+                results = pool.imap_unordered(reparse_pages, batches)
+                count = self.report_progress(results, len(page_ids), start)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            data = Data(snapshot=True)
+            results = (reparse_batch(batch, data) for batch in batches)
+            count = self.report_progress(results, len(page_ids), start)
+
+        elapsed = time() - start
+        rate = (count / elapsed) if elapsed else 0.0
+        self.stdout.write(
+            'Reparsed %d pages in %0.1f seconds (%0.1f pages/sec).' % (
+                count, elapsed, rate))
+
+    def report_progress(self, results, total, start):
+        """Report progress as batches complete, and return the page count."""
+        count = 0
+        for batch_count in results:
+            count += batch_count
+            if self.verbosity > 1:
+                elapsed = time() - start
+                self.stdout.write('%d of %d pages (%0.1f pages/sec)' % (
+                    count, total, (count / elapsed) if elapsed else 0.0))
+        return count
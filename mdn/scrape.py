@@ -2,6 +2,7 @@
 from __future__ import unicode_literals
 from collections import OrderedDict
 from itertools import chain
+import re
 
 from django.utils.six import text_type
 from parsimonious import IncompleteParseError
@@ -17,7 +18,7 @@ from .utils import date_to_iso, is_new_id
 from .visitor import Extractor
 
 
-def scrape_feature_page(feature_page):
+def scrape_feature_page(feature_page, data=None):
     """Scrape a FeaturePage object, which links an API Feature to an MDN page.
 
     1. Data and data issues are extracted from the English raw page using
@@ -28,7 +29,7 @@ def scrape_feature_page(feature_page):
     3. The formatted data is stored in the FeaturePage.data field.
     """
     en_content = feature_page.translatedcontent_set.get(locale='en-US')
-    scraped_data = scrape_page(en_content.raw, feature_page.feature)
+    scraped_data = scrape_page(en_content.raw, feature_page.feature, data=data)
     view_feature = ScrapedViewFeature(feature_page, scraped_data)
     merged_data = view_feature.generate_data()
 
@@ -64,6 +65,9 @@ def scrape_page(mdn_page, feature, locale='en', data=None):
     1. Parsed with the kumascript_grammar,
     2. Processed with the PageVisitor into HTMLIntervals
     3. Data and data issues are extracted and packaged with PageExtractor
+
+    When segment_page can find the relevant sections, only those sections
+    are parsed.  Otherwise, the full page is parsed.
     """
     no_data = OrderedDict((
         ('locale', locale),
@@ -80,8 +84,17 @@ def scrape_page(mdn_page, feature, locale='en', data=None):
             ('CompatibilityTable' in mdn_page)):
         return no_data
 
-    # Parse the page with HTML + KumaScript grammar
+    data = data or Data()
 
+    # Try parsing just the relevant sections
+    segments = segment_page(mdn_page)
+    if segments:
+        page_data = scrape_segments(
+            mdn_page, segments, feature, locale, data)
+        if page_data is not None:
+            return page_data
+
+    # Parse the page with HTML + KumaScript grammar
     try:
         page_parsed = kumascript_grammar.parse(mdn_page)
     except IncompleteParseError as ipe:
@@ -90,7 +103,6 @@ def scrape_page(mdn_page, feature, locale='en', data=None):
         return no_data
 
     # Convert parsed page and extract data
-    data = data or Data()
     elements = PageVisitor(data=data).visit(page_parsed)
     extractor = PageExtractor(
         elements=elements, feature=feature, locale=locale, data=data)
@@ -98,6 +110,99 @@ def scrape_page(mdn_page, feature, locale='en', data=None):
     return page_data
 
 
+def scrape_segments(mdn_page, segments, feature, locale, data):
+    """Extract data from the relevant sections of an MDN page.
+
+    Return is the extracted page data, or None if a section fails to parse
+    or no data was found, and the full page should be parsed instead.
+    """
+    elements = []
+    for start, end in segments:
+        try:
+            parsed = kumascript_grammar.parse(mdn_page[start:end])
+        except IncompleteParseError:
+            return None
+        elements.extend(
+            PageVisitor(offset=start, data=data).visit(parsed))
+    extractor = PageExtractor(
+        elements=elements, feature=feature, locale=locale, data=data)
+    page_data = extractor.extract()
+    no_data = all(issue[0] == 'no_data' for issue in page_data['issues'])
+    if not (page_data['specs'] or page_data['compat']) and no_data:
+        return None
+    return page_data
+
+
+re_tag = re.compile(r'<(/?)([a-zA-Z][a-zA-Z0-9]*)')
+re_header_tag = re.compile(r'h[1-6]$')
+re_any_tag = re.compile(r'<[^>]*>')
+void_tags = set((
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link',
+    'meta', 'param', 'source', 'track', 'wbr'))
+section_titles = ('specification', 'specifications', 'browser compatibility')
+
+
+def segment_page(mdn_page):
+    """Find the Specifications and Browser compatibility sections of a page.
+
+    This is a quick scan of the tags, rather than a full parse.  A section
+    starts with a top-level header, and ends at the next top-level header of
+    the same or higher level, so that PageExtractor sees the same sections
+    as in the full page.
+
+    Return is a list of (start, end) positions of the sections, or None if
+    the page should be fully parsed instead, such as when a relevant header
+    is nested in another element.
+    """
+    headers = []
+    depth = 0
+    for match in re_tag.finditer(mdn_page):
+        closing, tag = match.groups()
+        tag = tag.lower()
+        if tag in void_tags:
+            continue
+        if closing:
+            depth -= 1
+            continue
+        tag_end = mdn_page.find('>', match.end())
+        if tag_end == -1:
+            return None
+        if mdn_page[tag_end - 1] == '/':
+            continue  # Self-closing tag
+        if re_header_tag.match(tag):
+            close = mdn_page.find('</' + tag, tag_end)
+            if close == -1:
+                return None
+            inner = mdn_page[tag_end + 1:close]
+            if '{{' in inner:
+                return None
+            title = ' '.join(re_any_tag.sub('', inner).split()).lower()
+            relevant = title in section_titles
+            if depth != 0:
+                if relevant:
+                    return None
+            else:
+                headers.append((match.start(), int(tag[1]), relevant))
+        depth += 1
+
+    # All relevant sections must be at the same level
+    levels = set(level for start, level, relevant in headers if relevant)
+    if len(levels) != 1:
+        return None
+
+    segments = []
+    for num, (start, level, relevant) in enumerate(headers):
+        if not relevant:
+            continue
+        end = len(mdn_page)
+        for next_start, next_level, _ in headers[num + 1:]:
+            if next_level <= level:
+                end = next_start
+                break
+        segments.append((start, end))
+    return segments
+
+
 def narrow_parse_error(fragment, pos):
     """Try to narrow parse errors to inner elements.
 
@@ -0,0 +1,101 @@
+# coding: utf-8
+"""Test mdn management commands."""
+from __future__ import unicode_literals
+from json import dumps
+
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.utils.six import StringIO
+import mock
+
+from mdn.models import FeaturePage, TranslatedContent
+from webplatformcompat.models import Feature
+from .base import TestCase
+
+
+class TestReparseMDNPages(TestCase):
+    def setUp(self):
+        self.feature = self.get_instance('Feature', 'web-css-background-size')
+        self.page = self.create_page(
+            self.feature, '/en-US/docs/Web/CSS/background-size')
+
+    def create_page(self, feature, path, raw='<p>No data</p>'):
+        """Create a FeaturePage with fetched English content."""
+        page = FeaturePage.objects.create(
+            url='https://developer.mozilla.org' + path, feature=feature,
+            status=FeaturePage.STATUS_PARSED)
+        meta = page.meta()
+        meta.raw = dumps({
+            'locale': 'en-US', 'url': path, 'title': 'background-size',
+            'translations': []})
+        meta.status = meta.STATUS_FETCHED
+        meta.save()
+        en_content = page.translations()[0]
+        en_content.raw = raw
+        en_content.status = TranslatedContent.STATUS_FETCHED
+        en_content.save()
+        return page
+
+    def reparse(self, *args):
+        out = StringIO()
+        call_command('reparse_mdn_pages', *args, processes=1, stdout=out)
+        return out.getvalue()
+
+    def test_reparse(self):
+        out = self.reparse()
+        self.assertIn('Reparsed 1 pages', out)
+        self.assertIn('pages/sec', out)
+        page = FeaturePage.objects.get(id=self.page.id)
+        self.assertEqual(FeaturePage.STATUS_NO_DATA, page.status)
+
+    def test_not_fetched(self):
+        TranslatedContent.objects.update(
+            status=TranslatedContent.STATUS_STARTING)
+        out = self.reparse()
+        self.assertIn('Reparsed 0 pages', out)
+        page = FeaturePage.objects.get(id=self.page.id)
+        self.assertEqual(FeaturePage.STATUS_PARSED, page.status)
+
+    def test_by_id(self):
+        other = self.create_page(
+            self.create(Feature, slug='other', name='{"en": "Other"}'),
+            '/en-US/docs/Other')
+        out = self.reparse(str(other.id))
+        self.assertIn('Reparsed 1 pages', out)
+        page = FeaturePage.objects.get(id=self.page.id)
+        self.assertEqual(FeaturePage.STATUS_PARSED, page.status)
+        other = FeaturePage.objects.get(id=other.id)
+        self.assertEqual(FeaturePage.STATUS_NO_DATA, other.status)
+
+    @mock.patch('mdn.management.commands.reparse_mdn_pages.'
+                'scrape_feature_page')
+    def test_exception(self, mock_scrape):
+        mock_scrape.side_effect = ValueError('Bad')
+        out = self.reparse()
+        self.assertIn('Reparsed 0 pages', out)
+        page = FeaturePage.objects.get(id=self.page.id)
+        self.assertEqual(FeaturePage.STATUS_ERROR, page.status)
+        self.assertEqual('exception', page.issues.get().slug)
+
+    @mock.patch('mdn.management.commands.reparse_mdn_pages.'
+                'scrape_feature_page')
+    def test_database_error_rolls_back_page(self, mock_scrape):
+        other = self.create_page(
+            self.create(Feature, slug='other', name='{"en": "Other"}'),
+            '/en-US/docs/Other')
+
+        def scrape(fp, data):
+            if fp.id == self.page.id:
+                # Write, then fail, like a constraint violation
+                fp.save()
+                raise DatabaseError('Bad')
+            fp.status = FeaturePage.STATUS_PARSED
+            fp.save()
+
+        mock_scrape.side_effect = scrape
+        out = self.reparse()
+        self.assertIn('Reparsed 1 pages', out)
+        page = FeaturePage.objects.get(id=self.page.id)
+        self.assertEqual(FeaturePage.STATUS_ERROR, page.status)
+        other = FeaturePage.objects.get(id=other.id)
+        self.assertEqual(FeaturePage.STATUS_PARSED, other.status)
@@ -3,11 +3,13 @@
 from __future__ import unicode_literals
 
 from django.utils.six import text_type
+import mock
 
 from mdn.compatibility import (
     CellVersion, CompatFeatureVisitor, CompatFootnoteVisitor,
     CompatSectionExtractor, CompatSupportVisitor, Footnote,
-    compat_feature_grammar, compat_support_grammar, compat_footnote_grammar)
+    cell_parse_cache, compat_feature_grammar, compat_support_grammar,
+    compat_footnote_grammar, parse_cell)
 from mdn.kumascript import KumaVisitor, kumascript_grammar
 from webplatformcompat.models import Feature, Support
 from .base import TestCase
@@ -210,6 +212,17 @@ class TestCompatSectionExtractor(TestCase):
         issue = ('inline_text', 322, 334, {'text': '(or earlier)'})
         self.assert_extract(html, [expected], issues=[issue])
 
+    def test_support_issue_reused_cell(self):
+        html = self.construct_html(support="1.0 (or earlier)")
+        expected = self.get_default_compat_div()
+        issue = ('inline_text', 322, 334, {'text': '(or earlier)'})
+        self.assert_extract(html, [expected], issues=[issue])
+        html = self.construct_html(
+            support="1.0 (or earlier)",
+            pre_table='<div>{{CompatibilityTable}}</div>\n\n')
+        moved_issue = ('inline_text', 324, 336, {'text': '(or earlier)'})
+        self.assert_extract(html, [expected], issues=[moved_issue])
+
     def test_footnote_issue(self):
         html = self.construct_html(after_table="<p>Here's some text.</p>")
         expected = self.get_default_compat_div()
@@ -237,6 +250,32 @@ class TestCompatSectionExtractor(TestCase):
         self.assert_extract(html, [expected], issues=[issue])
 
 
+class TestParseCell(TestCase):
+    def setUp(self):
+        cell_parse_cache.clear()
+
+    def tearDown(self):
+        cell_parse_cache.clear()
+
+    def test_reused(self):
+        text = '<td>{{CompatNo}}</td>'
+        tree = parse_cell(compat_support_grammar, text)
+        self.assertIs(tree, parse_cell(compat_support_grammar, text))
+        self.assertIsNot(tree, parse_cell(compat_feature_grammar, text))
+
+    @mock.patch('mdn.compatibility.cell_parse_cache_size', 2)
+    def test_least_recently_used_dropped(self):
+        tree1 = parse_cell(compat_support_grammar, '<td>1.0</td>')
+        tree2 = parse_cell(compat_support_grammar, '<td>2.0</td>')
+        parse_cell(compat_support_grammar, '<td>1.0</td>')
+        parse_cell(compat_support_grammar, '<td>3.0</td>')
+        self.assertEqual(2, len(cell_parse_cache))
+        self.assertIs(
+            tree1, parse_cell(compat_support_grammar, '<td>1.0</td>'))
+        self.assertIsNot(
+            tree2, parse_cell(compat_support_grammar, '<td>2.0</td>'))
+
+
 class TestFootnote(TestCase):
     def test_numeric(self):
         footnote = Footnote(raw='[1]', footnote_id='1')
@@ -180,3 +180,59 @@ class TestLookupVersionParams(TestDataBase):
             self.browser.id, self.browser.name['en'], 'current')
         self.assertEqual(version, params.version)
         self.assertEqual(version.id, params.version_id)
+
+
+class TestSnapshot(TestCase):
+    def setUp(self):
+        self.parent = self.get_instance('Feature', 'web-css-background-size')
+        self.feature = self.get_instance(
+            'Feature', 'web-css-background-size-contain_and_cover')
+        self.version = self.get_instance(
+            'Version', ('firefox_desktop', 'current'))
+        self.section = self.get_instance('Section', 'background-size')
+        self.spec = self.section.specification
+        self.support = self.create(
+            Support, version=self.version, feature=self.feature)
+        self.create(Feature, slug='web-css-background-size_slug')
+        self.data = Data(snapshot=True)
+
+    def test_feature_params(self):
+        with self.assertNumQueries(0):
+            params = self.data.lookup_feature_params(
+                self.parent, self.feature.name['en'])
+            new_params = self.data.lookup_feature_params(self.parent, 'slug')
+        self.assertEqual(self.feature, params.feature)
+        self.assertEqual('web-css-background-size_slug1', new_params.slug)
+
+    def test_section_id(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.section.id, self.data.lookup_section_id(
+                    self.spec.id, '#the-background-size'))
+            self.assertIsNone(
+                self.data.lookup_section_id(self.spec.id, '#other'))
+
+    def test_specification(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.spec, self.data.lookup_specification(self.spec.mdn_key))
+            self.assertIsNone(self.data.lookup_specification('NoSpec'))
+
+    def test_support_id(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.support.id, self.data.lookup_support_id(
+                    self.version.id, self.feature.id))
+            self.assertEqual(
+                '_%s-%s' % (self.parent.id, self.version.id),
+                self.data.lookup_support_id(self.version.id, self.parent.id))
+
+    def test_version_params(self):
+        browser = self.version.browser
+        with self.assertNumQueries(0):
+            params = self.data.lookup_version_params(
+                browser.id, browser.name['en'], 'current')
+            new_params = self.data.lookup_version_params(
+                browser.id, browser.name['en'], '1.0')
+        self.assertEqual(self.version, params.version)
+        self.assertIsNone(new_params.version)
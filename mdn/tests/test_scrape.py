@@ -5,8 +5,8 @@ from json import dumps
 
 from mdn.models import FeaturePage
 from mdn.scrape import (
-    narrow_parse_error, scrape_page, scrape_feature_page, PageExtractor,
-    PageVisitor, ScrapedViewFeature)
+    narrow_parse_error, scrape_page, scrape_feature_page, segment_page,
+    PageExtractor, PageVisitor, ScrapedViewFeature)
 from mdn.kumascript import kumascript_grammar
 from webplatformcompat.models import Feature, Support
 from .base import TestCase
@@ -206,6 +206,65 @@ class TestScrape(BaseTestCase):
         sample_spec_section, expected_specs = self.get_sample_specs()
         self.assertScrape(sample_spec_section, expected_specs, [])
 
+    def test_spec_after_content(self):
+        sample_spec_section, expected_specs = self.get_sample_specs()
+        page = "<p>Some lead content</p>\n" + sample_spec_section
+        self.assertScrape(page, expected_specs, [])
+
+    def test_section_issue_offset(self):
+        page = (
+            "<p>Some lead content</p>\n<h2>Other</h2><p>Text</p>\n"
+            "<h2>Specifications</h2><p>Incomplete</p>")
+        start = page.index('<p>Incomplete')
+        issue = ('skipped_content', start, start + 17, {})
+        self.assertScrape(page, [], [issue])
+
+    def test_parse_error_outside_sections(self):
+        sample_spec_section, expected_specs = self.get_sample_specs()
+        page = "<p><unknown>Strange</unknown></p>\n" + sample_spec_section
+        self.assertScrape(page, expected_specs, [])
+
+
+class TestSegmentPage(TestCase):
+    def test_sections(self):
+        page = """\
+<p>Lead</p>
+<h2>Other</h2>
+<p>Other</p>
+<h2 id="Specifications">Specifications</h2>
+<p>Specs</p>
+<h2>Browser <em>compatibility</em></h2>
+<div><h3>Nested</h3></div>
+<h3>Notes</h3>
+<p>Notes</p>
+<h2>See also</h2>
+"""
+        spec_start = page.index('<h2 id="Spec')
+        compat_start = page.index('<h2>Browser')
+        compat_end = page.index('<h2>See')
+        expected = [(spec_start, compat_start), (compat_start, compat_end)]
+        self.assertEqual(expected, segment_page(page))
+
+    def test_to_end(self):
+        page = '<p>Lead</p><br><img src="a.png"/><h2>Specifications</h2><p/>'
+        start = page.index('<h2>')
+        self.assertEqual([(start, len(page))], segment_page(page))
+
+    def test_nested_section(self):
+        page = '<div><h2>Specifications</h2><p>Specs</p></div>'
+        self.assertIsNone(segment_page(page))
+
+    def test_mixed_levels(self):
+        page = '<h2>Specifications</h2><h3>Browser compatibility</h3>'
+        self.assertIsNone(segment_page(page))
+
+    def test_no_sections(self):
+        self.assertIsNone(segment_page('<p>{{CompatibilityTable}}</p>'))
+
+    def test_kumascript_header(self):
+        page = '<h2>{{Specifications}}</h2><h2>Specifications</h2>'
+        self.assertIsNone(segment_page(page))
+
 
 class TestNarrowParseError(TestCase):
     def test_unknown_element(self):
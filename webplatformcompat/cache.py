@@ -1,19 +1,661 @@
 """Cache functions"""
+from bisect import bisect_left
+from collections import OrderedDict
+from functools import reduce
+from hashlib import md5
+from logging import getLogger
+from operator import or_
+from threading import local
+from time import sleep, time
+from uuid import uuid4
+import json
+import zlib
 
+from django.apps import apps
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.db.models import Count, Max, Q
+from django.utils import six
 
 from drf_cached_instances.cache import BaseCache
+from drf_cached_instances.models import PkOnlyQueryset
 from .history import Changeset
 from .models import (
     Browser, Feature, Maturity, Section, Specification, Support, Version)
 
+logger = getLogger('webplatformcompat.cache')
+
+
+def group_pks(pairs, sort=False):
+    """Group (key, pk) pairs into a dictionary of key -> list of pks.
+
+    The order of the pairs is preserved in each list, unless sort is True.
+    """
+    grouped = {}
+    for key, pk in pairs:
+        grouped.setdefault(key, []).append(pk)
+    if sort:
+        for pks in grouped.values():
+            pks.sort()
+    return grouped
+
+
+class FeatureDescendantPKs(object):
+    """Lazy list of the descendant primary keys of a large feature.
+
+    Slices are loaded from the cached descendant index, so a Paginator
+    only fetches the chunks needed for the requested page.
+    """
+
+    def __init__(self, cache, feature, version=None):
+        self.cache = cache
+        self.feature = feature
+        self.version = version
+
+    def __len__(self):
+        return self.feature.descendant_count
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            pks = self.cache.feature_descendant_pks(
+                self.feature, start, stop, self.version)
+            return pks[::step]
+        if key < 0:
+            key += len(self)
+        pks = self.cache.feature_descendant_pks(
+            self.feature, key, key + 1, self.version)
+        if not pks:
+            raise IndexError('list index out of range')
+        return pks[0]
+
+
+class HistoryPKs(object):
+    """Lazy list of the historical primary keys of an instance.
+
+    The cached instance only stores the current history PK and the count.
+    The first item is the current history PK, and other slices are loaded
+    from the cached history index.
+
+    If the list is part of a group, such as the instances loaded by one
+    get_instances call, the full lists of the group are loaded together
+    the first time any of them is needed.
+    """
+
+    def __init__(self, cache, model, pk, current, count, version=None):
+        self.cache = cache
+        self.model = model
+        self.pk = pk
+        self.current = current
+        self.count = count
+        self.version = version
+        self.group = None
+        self.loaded = None
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            if key < 0:
+                key += len(self)
+            if key == 0 and self.count:
+                return self.current
+        if self.loaded is None and self.group:
+            self.cache.load_history_pks(self.group)
+        if self.loaded is not None:
+            return self.loaded[key]
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            pks = self.cache.history_pks(
+                self.model, self.pk, self.count, start, stop, self.version)
+            return pks[::step]
+        pks = self.cache.history_pks(
+            self.model, self.pk, self.count, key, key + 1, self.version)
+        if not pks:
+            raise IndexError('list index out of range')
+        return pks[0]
+
+
+# Per-process copies of hot cached instances, in least-recently-used order
+local_cache = OrderedDict()
+local_cache_state = {'generation': None, 'checked': 0}
+
+# Per-process cache statistics, by (model name, version)
+cache_stats = {}
+
+# Cache statistics of the current request of each thread, logged by
+# CacheStatsMiddleware
+request_cache_stats_local = local()
+
+
+def get_request_cache_stats():
+    """Get the cache statistics of the current thread's request."""
+    if not hasattr(request_cache_stats_local, 'stats'):
+        request_cache_stats_local.stats = {}
+    return request_cache_stats_local.stats
+
+
+def format_cache_stats(stats):
+    """Format cache statistics as a single line."""
+    parts = []
+    for (model_name, version), model_stats in sorted(stats.items()):
+        values = []
+        for name, value in sorted(model_stats.items()):
+            if isinstance(value, dict):
+                values.append('%s=%d/%0.3fs' % (
+                    name, value['count'], value['total']))
+            else:
+                values.append('%s=%d' % (name, value))
+        parts.append('%s.%s %s' % (model_name, version, ' '.join(values)))
+    return '; '.join(parts)
+
+
+class CacheStatsMiddleware(object):
+    """Log the instance cache statistics of each request."""
+
+    def process_request(self, request):
+        get_request_cache_stats().clear()
+
+    def process_response(self, request, response):
+        request_cache_stats = get_request_cache_stats()
+        if request_cache_stats:
+            logger.info(
+                'Cache stats for %s %s: %s', request.method, request.path,
+                format_cache_stats(request_cache_stats))
+            request_cache_stats.clear()
+        return response
+
 
 class Cache(BaseCache):
     """Instance Cache for webplatformcompat"""
     versions = ('v1',)
     default_version = 'v1'
 
+    # Revision of the cached instance format, included in the instance keys.
+    # Increase it when the shape of cached instances changes, such as new
+    # attributes or field encodings, so that entries written by older code
+    # are not read.
+    entry_revision = 2
+
+    # Maximum number of primary keys loaded in one bulk query
+    bulk_load_size = 500
+
+    # Small, rarely changed models also cached in each process
+    local_cache_models = ('Browser', 'Maturity', 'Specification')
+
+    # Seconds between checks of the shared local cache generation
+    local_cache_check_interval = 1.0
+
+    # Compact entries at least this many bytes are compressed
+    compress_min_size = 1024
+
+    # In generational mode, the models whose cached representations include
+    # data from a changed model.  Other models only invalidate themselves.
+    generation_dependents = {
+        'Feature': ('Feature',),
+        'Section': ('Section', 'Specification'),
+        'Specification': ('Specification', 'Maturity'),
+        'Support': ('Support', 'Version', 'Feature'),
+        'Version': ('Version', 'Browser'),
+    }
+
+    # Models included in the metadata of every view feature
+    view_feature_meta_models = (
+        'Browser', 'Maturity', 'Section', 'Specification', 'Version')
+
+    @property
+    def generational(self):
+        """Return True if writes invalidate by changing generations.
+
+        In generational mode, each model type and each feature tree has a
+        generation, which is included in the cache keys.  A write changes
+        a few generations, and the stale entries are ignored and eventually
+        evicted, rather than recomputed.
+        """
+        return bool(
+            self.cache and
+            getattr(settings, 'DRF_INSTANCE_CACHE_GENERATIONS', False))
+
+    def key_for(self, version, model_name, obj_pk, generation=None):
+        """Get the cache key for an instance.
+
+        The key includes the version and the entry revision.  In generational
+        mode, it also includes the generation of the model, which is read
+        from the cache if not passed.
+        """
+        key_version = '{0}r{1}'.format(version, self.entry_revision)
+        if not self.generational:
+            return super(Cache, self).key_for(key_version, model_name, obj_pk)
+        if generation is None:
+            generation = self.get_generations([model_name])[model_name]
+        return 'drfc_{0}_{1}_{2}_{3}'.format(
+            key_version, model_name, generation, obj_pk)
+
+    def get_instances(self, object_specs, version=None):
+        """Get the cached native representation for one or more objects.
+
+        Same as BaseCache.get_instances, but instances missing from the cache
+        are loaded with one bulk loader call per model, rather than one
+        loader call per instance.  Instances of local_cache_models are read
+        from the per-process local cache first.
+        """
+        ret = dict()
+        spec_keys = set()
+        cache_keys = []
+        version = version or self.default_version
+        generations = self.get_generations(
+            set(spec[0] for spec in object_specs))
+
+        # Construct all the cache keys to fetch
+        for model_name, obj_pk, obj in object_specs:
+            assert model_name
+            assert obj_pk
+            obj_key = self.key_for(
+                version, model_name, obj_pk, generations.get(model_name))
+            spec_keys.add((model_name, obj_pk, obj, obj_key))
+            cache_keys.append(obj_key)
+
+        # Fetch the cache keys, trying the local cache first
+        local_vals = self.get_local_instances(cache_keys)
+        remote_keys = [key for key in cache_keys if key not in local_vals]
+        if remote_keys and self.cache:
+            cache_vals = self.cache.get_many(remote_keys)
+        else:
+            cache_vals = {}
+        cache_vals.update(local_vals)
+
+        # Load the missing instances in bulk
+        to_load = {}
+        for model_name, obj_pk, obj, obj_key in spec_keys:
+            if not obj and not cache_vals.get(obj_key):
+                to_load.setdefault(model_name, []).append(obj_pk)
+        loaded = {}
+        for model_name, pks in to_load.items():
+            for pk, obj in self.bulk_load(model_name, version, pks).items():
+                loaded[(model_name, pk)] = obj
+
+        # Use cached representations, or recreate
+        cache_to_set = {}
+        local_to_set = {}
+        hits = {}
+        history_group = []
+        for model_name, obj_pk, obj, obj_key in spec_keys:
+            obj_val = cache_vals.get(obj_key)
+            obj_native = self.decode_instance(obj_val) if obj_val else None
+            counts = hits.setdefault(model_name, [0, 0])
+            counts[0 if obj_native else 1] += 1
+
+            # Invalid or not set - serialize the loaded instance
+            if not obj_native:
+                obj = obj or loaded.get((model_name, obj_pk))
+                serializer = self.model_function(
+                    model_name, version, 'serializer')
+                start = time()
+                obj_native = serializer(obj) or {}
+                self.record_stats(
+                    model_name, version, serialize=time() - start)
+                obj_val = None
+                if obj_native:
+                    obj_val = self.encode_instance(obj_native)
+                    cache_to_set[obj_key] = obj_val
+            if (obj_val and model_name in self.local_cache_models and
+                    obj_key not in local_vals):
+                local_to_set[obj_key] = obj_val
+
+            # Get fields to convert
+            keys = [key for key in obj_native.keys() if ':' in key]
+            for key in keys:
+                json_value = obj_native.pop(key)
+                name, value = self.field_from_json(key, json_value)
+                assert name not in obj_native
+                obj_native[name] = value
+                history = getattr(value, 'pks', None)
+                if isinstance(history, HistoryPKs):
+                    history.group = history_group
+                    history_group.append(history)
+
+            if obj_native:
+                ret[(model_name, obj_pk)] = (obj_native, obj_key, obj)
+
+        # Save any new cached representations
+        if cache_to_set and self.cache:
+            self.cache.set_many(cache_to_set)
+        self.set_local_instances(local_to_set)
+
+        for model_name, (hit_count, miss_count) in hits.items():
+            self.record_stats(
+                model_name, version, hits=hit_count, misses=miss_count)
+        return ret
+
+    def update_instance(
+            self, model_name, pk, instance=None, version=None,
+            update_only=False):
+        """Create or update a cached instance.
+
+        Same as BaseCache.update_instance, but entries are read and written
+        with decode_instance and encode_instance, and updating one of the
+        local_cache_models also invalidates the local caches.  In
+        generational mode, the generations are changed instead, and there
+        are no follow-on updates.
+        """
+        if self.generational:
+            self.change_generations([(model_name, pk, instance)])
+            invalid = []
+        else:
+            invalid = self.update_cached_instance(
+                model_name, pk, instance, version, update_only)
+        if model_name in self.local_cache_models:
+            self.invalidate_local_cache()
+        return invalid
+
+    def update_cached_instance(
+            self, model_name, pk, instance, version, update_only):
+        """Update a cached instance, and return the follow-on updates."""
+        versions = [version] if version else self.versions
+        invalid = []
+        for version in versions:
+            serializer = self.model_function(model_name, version, 'serializer')
+            loader = self.model_function(model_name, version, 'loader')
+            invalidator = self.model_function(
+                model_name, version, 'invalidator')
+            if serializer is None and loader is None and invalidator is None:
+                continue
+
+            if self.cache is None:
+                continue
+
+            # Try to load the instance
+            if not instance:
+                instance = loader(pk)
+
+            if serializer:
+                # Get current value, if in cache
+                key = self.key_for(version, model_name, pk)
+                current_raw = self.cache.get(key)
+                current = (
+                    self.decode_instance(current_raw) if current_raw
+                    else None)
+
+                # Get new value
+                if update_only and current_raw is None:
+                    new = None
+                else:
+                    start = time()
+                    new = serializer(instance)
+                    self.record_stats(
+                        model_name, version, serialize=time() - start)
+                deleted = not instance
+
+                # If cache is invalid, update cache
+                invalidate = (current != new) or deleted
+                if invalidate:
+                    if deleted:
+                        self.cache.delete(key)
+                    else:
+                        self.cache.set(key, self.encode_instance(new))
+            else:
+                invalidate = True
+
+            # Invalidate upstream caches
+            if instance and invalidate:
+                upstreams = invalidator(instance)
+                self.record_stats(
+                    model_name, version, updates=1,
+                    invalidations=len(upstreams))
+                for upstream in upstreams:
+                    if isinstance(upstream, str):
+                        self.cache.delete(upstream)
+                    else:
+                        m, i, immediate = upstream
+                        if immediate:
+                            invalidate_key = self.key_for(version, m, i)
+                            self.cache.delete(invalidate_key)
+                        invalid.append((m, i, version))
+        return invalid
+
+    @property
+    def compact(self):
+        """Return True if new entries use the compact encoding."""
+        return getattr(settings, 'DRF_INSTANCE_CACHE_COMPACT', False)
+
+    def encode_instance(self, obj_native):
+        """Encode the native representation of an instance for the cache.
+
+        The default encoding is JSON.  The compact encoding stores PKLists
+        as the differences between consecutive primary keys, which are
+        usually small, and compresses large entries.
+        """
+        if not self.compact:
+            return json.dumps(obj_native)
+        compact = {}
+        for key, value in obj_native.items():
+            if key.endswith(':PKList') and value and all(
+                    isinstance(pk, six.integer_types)
+                    for pk in value['pks']):
+                pks = value['pks']
+                value = dict(
+                    (name, item) for name, item in value.items()
+                    if name != 'pks')
+                value['pk_deltas'] = [
+                    pk - prev for prev, pk in zip([0] + pks, pks)]
+            compact[key] = value
+        raw = json.dumps(compact, separators=(',', ':')).encode('utf-8')
+        if len(raw) >= self.compress_min_size:
+            return b'Z' + zlib.compress(raw)
+        return b'C' + raw
+
+    def decode_instance(self, raw):
+        """Decode a cached instance to the native representation.
+
+        Both the JSON and compact encodings are decoded, so that entries
+        written before changing DRF_INSTANCE_CACHE_COMPACT can be read.
+        """
+        prefix = raw[:1]
+        if not (isinstance(raw, bytes) and prefix in (b'C', b'Z')):
+            return json.loads(raw)
+        raw = raw[1:]
+        if prefix == b'Z':
+            raw = zlib.decompress(raw)
+        obj_native = json.loads(raw.decode('utf-8'))
+        for value in obj_native.values():
+            if isinstance(value, dict) and 'pk_deltas' in value:
+                pks = []
+                pk = 0
+                for delta in value.pop('pk_deltas'):
+                    pk += delta
+                    pks.append(pk)
+                value['pks'] = pks
+        return obj_native
+
+    def bulk_load(self, model_name, version, pks):
+        """Load instances for a list of primary keys.
+
+        The model's bulk loader is called in chunks of bulk_load_size, or the
+        single instance loader if the model doesn't have a bulk loader.
+
+        Return is a dictionary of requested primary key to instance.
+        Instances that are not in the database are omitted.
+        """
+        start = time()
+        name = '%s_%s_bulk_loader' % (model_name.lower(), version)
+        bulk_loader = getattr(self, name, None)
+        if bulk_loader is None:
+            loader = self.model_function(model_name, version, 'loader')
+            objs = [loader(pk) for pk in pks]
+        else:
+            objs = []
+            size = self.bulk_load_size
+            for first in range(0, len(pks), size):
+                objs.extend(bulk_loader(pks[first:first + size]))
+
+        # Requested PKs may be strings from the URL
+        obj_by_pk = dict((str(obj.pk), obj) for obj in objs if obj)
+        loaded = {}
+        for pk in pks:
+            obj = obj_by_pk.get(str(pk))
+            if obj:
+                loaded[pk] = obj
+        self.record_stats(
+            model_name, version, load=time() - start, loaded=len(loaded))
+        return loaded
+
+    def update_instances(self, object_specs, update_only=False):
+        """Create or update several cached instances.
+
+        Same as calling update_instance for each (model name, pk, version)
+        in object_specs, but the instances are loaded with one bulk_load per
+        model and version.  When update_only is True, instances that are not
+        in the cache are skipped without loading them.
+
+        Return is a list of (model name, pk, version) tuples that also need
+        to be updated.
+        """
+        if self.generational:
+            self.change_generations(
+                [(model_name, pk, None) for model_name, pk, _ in object_specs])
+            if set(spec[0] for spec in object_specs).intersection(
+                    self.local_cache_models):
+                self.invalidate_local_cache()
+            return []
+
+        if self.cache is None:
+            return []
+        grouped = OrderedDict()
+        for model_name, pk, version in object_specs:
+            for version in ([version] if version else self.versions):
+                grouped.setdefault((model_name, version), []).append(pk)
+
+        invalid = []
+        for (model_name, version), pks in grouped.items():
+            if update_only:
+                keys = [self.key_for(version, model_name, pk) for pk in pks]
+                cached = self.cache.get_many(keys)
+                pks = [pk for pk, key in zip(pks, keys) if key in cached]
+            if not pks:
+                continue
+            loaded = self.bulk_load(model_name, version, pks)
+            for pk in pks:
+                invalid.extend(self.update_instance(
+                    model_name, pk, loaded.get(pk), version,
+                    update_only=update_only))
+        return invalid
+
+    def warm_instances(self, model_name, pks, version=None):
+        """Serialize and cache several instances of a model.
+
+        The instances are loaded with bulk_load, and written with one
+        set_many.  Return is (number of instances cached, bytes written).
+        """
+        if not self.cache:
+            return 0, 0
+        version = version or self.default_version
+        serializer = self.model_function(model_name, version, 'serializer')
+        generation = self.get_generations([model_name]).get(model_name)
+        to_set = {}
+        for pk, obj in self.bulk_load(model_name, version, pks).items():
+            obj_native = serializer(obj)
+            if obj_native:
+                key = self.key_for(version, model_name, pk, generation)
+                to_set[key] = self.encode_instance(obj_native)
+        if to_set:
+            self.cache.set_many(to_set)
+        return len(to_set), sum(len(value) for value in to_set.values())
+
+    def bulk_add_history_heads(self, model, objs):
+        """Add the current history PK and history count to instances.
+
+        Only the most recent historical record of each instance is loaded,
+        so the cost doesn't grow with the number of edits.  The full list is
+        loaded on demand by history_pks.
+        """
+        objs = [obj for obj in objs if not hasattr(obj, '_history_current')]
+        if not objs:
+            return
+        history = model.history.model.objects.filter(
+            id__in=[obj.pk for obj in objs])
+        stats = dict(
+            (row['id'], (row['count'], row['latest']))
+            for row in history.order_by().values('id').annotate(
+                count=Count('history_id'), latest=Max('history_date')))
+        current = {}
+        latest_dates = set(latest for count, latest in stats.values())
+        for pk, history_id, history_date in history.filter(
+                history_date__in=latest_dates).values_list(
+                    'id', 'history_id', 'history_date'):
+            if stats[pk][1] == history_date:
+                current[pk] = max(current.get(pk, history_id), history_id)
+        for obj in objs:
+            obj._history_count = stats.get(obj.pk, (0, None))[0]
+            obj._history_current = current.get(obj.pk)
+
+    # Cached PKList fields, and the instance attributes that hold them
+    related_pk_attrs = {
+        'Browser': {'versions': '_version_pks'},
+        'Feature': {
+            'children': '_children_pks',
+            'descendants': '_descendant_pks',
+            'sections': '_section_pks',
+            'supports': '_support_pks',
+        },
+        'Maturity': {'specifications': '_specification_pks'},
+        'Section': {'features': '_feature_pks'},
+        'Specification': {'sections': '_section_pks'},
+        'Support': {},
+        'Version': {'supports': '_support_pks'},
+    }
+
+    def add_known_related_pks(
+            self, model_name, instance, created, changed=(), version=None):
+        """Add the related primary keys known after an API save.
+
+        Keyword arguments:
+        model_name - The name of the model
+        instance - The instance that was just saved
+        created - True if the instance was just created
+        changed - The names of the related fields set by the save
+
+        The current history PK is the record just created.  An updated
+        instance copies the other related PKs and the history count from the
+        cached instance, and a new instance has none.  Changed fields, and
+        any fields not in the cache, are left for the *_add_related_pks
+        functions to load.
+        """
+        if self.generational or model_name not in self.related_pk_attrs:
+            return
+        history_pk = getattr(instance, '_last_history_pk', None)
+        if created:
+            current = {'history:HistoryPKList': {'current': None, 'count': 0}}
+            for name in self.related_pk_attrs[model_name]:
+                current[name + ':PKList'] = {'pks': []}
+        elif self.cache:
+            version = version or self.default_version
+            key = self.key_for(version, model_name, instance.pk)
+            raw = self.cache.get(key)
+            current = self.decode_instance(raw) if raw else {}
+        else:
+            current = {}
+
+        history = current.get('history:HistoryPKList')
+        if (history and history_pk is not None and
+                not hasattr(instance, '_history_current')):
+            count = history['count']
+            if history['current'] != history_pk:
+                count += 1
+            instance._history_current = history_pk
+            instance._history_count = count
+        for name, attr in self.related_pk_attrs[model_name].items():
+            key = name + ':PKList'
+            if (name not in changed and key in current and
+                    not hasattr(instance, attr)):
+                setattr(instance, attr, list(current[key]['pks']))
+
     def browser_v1_serializer(self, obj):
         if not obj:
             return None
@@ -24,11 +666,12 @@ class Cache(BaseCache):
             ('name', obj.name),
             ('note', obj.note),
             self.field_to_json(
-                'PKList', 'history', model=obj.history.model,
-                pks=obj._history_pks),
+                'HistoryPKList', 'history', model=obj.history.model,
+                pk=obj.pk, current=obj._history_current,
+                count=obj._history_count),
             self.field_to_json(
                 'PK', 'history_current', model=obj.history.model,
-                pk=obj._history_pks[0]),
+                pk=obj._history_current),
             self.field_to_json(
                 'PKList', 'versions', model=Version, pks=obj._version_pks),
         ))
@@ -45,15 +688,29 @@ class Cache(BaseCache):
 
     def browser_v1_add_related_pks(self, obj):
         """Add related primary keys to a Browser instance."""
-        if not hasattr(obj, '_history_pks'):
-            obj._history_pks = list(
-                obj.history.all().values_list('history_id', flat=True))
+        self.bulk_add_history_heads(Browser, [obj])
         if not hasattr(obj, '_version_pks'):
             obj._version_pks = list(
                 obj.versions.values_list('pk', flat=True))
 
+    def browser_v1_bulk_loader(self, pks):
+        objs = list(Browser.objects.filter(pk__in=pks))
+        self.browser_v1_bulk_add_related_pks(objs)
+        return objs
+
+    def browser_v1_bulk_add_related_pks(self, objs):
+        """Add related primary keys to several Browser instances."""
+        self.bulk_add_history_heads(Browser, objs)
+        version_pks = group_pks(
+            Version.objects.filter(
+                browser_id__in=[obj.pk for obj in objs]).order_by(
+                    '_order').values_list('browser_id', 'pk'))
+        for obj in objs:
+            if not hasattr(obj, '_version_pks'):
+                obj._version_pks = version_pks.get(obj.pk, [])
+
     def browser_v1_invalidator(self, obj):
-        return []
+        return [self.view_feature_meta_generation_key]
 
     def changeset_v1_serializer(self, obj):
         if not obj:
@@ -128,6 +785,32 @@ class Cache(BaseCache):
             obj._historical_sections_pks = list(
                 obj.historical_sections.values_list('history_id', flat=True))
 
+    def changeset_v1_bulk_loader(self, pks):
+        objs = list(Changeset.objects.filter(pk__in=pks))
+        self.changeset_v1_bulk_add_related_pks(objs)
+        return objs
+
+    def changeset_v1_bulk_add_related_pks(self, objs):
+        """Add related primary keys to several Changeset instances."""
+        changeset_pks = [obj.pk for obj in objs]
+        relations = (
+            ('_historical_browsers_pks', Browser),
+            ('_historical_versions_pks', Version),
+            ('_historical_features_pks', Feature),
+            ('_historical_specifications_pks', Specification),
+            ('_historical_supports_pks', Support),
+            ('_historical_maturities_pks', Maturity),
+            ('_historical_sections_pks', Section),
+        )
+        for attr, model in relations:
+            history_pks = group_pks(
+                model.history.model.objects.filter(
+                    history_changeset_id__in=changeset_pks).values_list(
+                        'history_changeset_id', 'history_id'))
+            for obj in objs:
+                if not hasattr(obj, attr):
+                    setattr(obj, attr, history_pks.get(obj.pk, []))
+
     def changeset_v1_invalidator(self, obj):
         return []
 
@@ -145,6 +828,9 @@ class Cache(BaseCache):
             ('obsolete', obj.obsolete),
             ('name', obj.name),
             ('descendant_count', obj.get_descendant_count()),
+            ('tree_id', obj.tree_id),
+            ('lft', obj.lft),
+            ('rght', obj.rght),
             self.field_to_json(
                 'PKList', 'sections', model=Section, pks=obj._section_pks),
             self.field_to_json(
@@ -157,11 +843,12 @@ class Cache(BaseCache):
                 'PKList', 'descendants', model=Feature,
                 pks=obj._descendant_pks),
             self.field_to_json(
-                'PKList', 'history', model=obj.history.model,
-                pks=obj._history_pks),
+                'HistoryPKList', 'history', model=obj.history.model,
+                pk=obj.pk, current=obj._history_current,
+                count=obj._history_count),
             self.field_to_json(
                 'PK', 'history_current', model=obj.history.model,
-                pk=obj._history_pks[0]),
+                pk=obj._history_current),
         ))
 
     def feature_v1_loader(self, pk):
@@ -176,9 +863,7 @@ class Cache(BaseCache):
 
     def feature_v1_add_related_pks(self, obj):
         """Add related primary keys to a Feature instance."""
-        if not hasattr(obj, '_history_pks'):
-            obj._history_pks = list(
-                obj.history.all().values_list('history_id', flat=True))
+        self.bulk_add_history_heads(Feature, [obj])
         if not hasattr(obj, '_children_pks'):
             obj._children_pks = list(obj.children.values_list('pk', flat=True))
         if not hasattr(obj, '_support_pks'):
@@ -193,6 +878,59 @@ class Cache(BaseCache):
             else:
                 obj._descendant_pks = []
 
+    def feature_v1_bulk_loader(self, pks):
+        objs = list(Feature.objects.filter(pk__in=pks))
+        self.feature_v1_bulk_add_related_pks(objs)
+        return objs
+
+    def feature_v1_bulk_add_related_pks(self, objs):
+        """Add related primary keys to several Feature instances."""
+        self.bulk_add_history_heads(Feature, objs)
+        feature_pks = [obj.pk for obj in objs]
+        children_pks = group_pks(
+            Feature.objects.filter(parent_id__in=feature_pks).values_list(
+                'parent_id', 'pk'))
+        support_pks = group_pks(
+            Support.objects.filter(feature_id__in=feature_pks).values_list(
+                'feature_id', 'pk'), sort=True)
+        sort_field = Feature._meta.get_field('sections').sort_value_field_name
+        section_pks = group_pks(
+            Feature.sections.through.objects.filter(
+                feature_id__in=feature_pks).order_by(sort_field).values_list(
+                    'feature_id', 'section_id'))
+
+        # Load all the descendants of small subtrees in one query
+        max_count = settings.PAGINATE_VIEW_FEATURE
+        subtrees = [
+            obj for obj in objs
+            if 0 < obj.get_descendant_count() <= max_count and
+            not hasattr(obj, '_descendant_pks')]
+        subtree_pks = set(obj.pk for obj in subtrees)
+        descendants = {}
+        if subtrees:
+            in_subtrees = reduce(or_, [
+                Q(tree_id=obj.tree_id, lft__gt=obj.lft, rght__lt=obj.rght)
+                for obj in subtrees])
+            for pk, tree_id, lft in Feature.objects.filter(
+                    in_subtrees).order_by('tree_id', 'lft').values_list(
+                        'pk', 'tree_id', 'lft'):
+                descendants.setdefault(tree_id, []).append((lft, pk))
+
+        for obj in objs:
+            if not hasattr(obj, '_children_pks'):
+                obj._children_pks = children_pks.get(obj.pk, [])
+            if not hasattr(obj, '_support_pks'):
+                obj._support_pks = support_pks.get(obj.pk, [])
+            if not hasattr(obj, '_section_pks'):
+                obj._section_pks = section_pks.get(obj.pk, [])
+            if not hasattr(obj, '_descendant_pks'):
+                if obj.pk in subtree_pks:
+                    obj._descendant_pks = [
+                        pk for lft, pk in descendants.get(obj.tree_id, [])
+                        if obj.lft < lft < obj.rght]
+                else:
+                    obj._descendant_pks = []
+
     def feature_v1_invalidator(self, obj):
         pks = []
         if obj.parent_id:
@@ -203,7 +941,10 @@ class Cache(BaseCache):
             obj, '_children_pks',
             list(obj.children.values_list('pk', flat=True)))
         pks += children_pks
-        return [('Feature', pk, False) for pk in pks]
+        return (
+            [('Feature', pk, False) for pk in pks] +
+            self.view_feature_meta_keys(obj) +
+            self.feature_descendant_keys(obj))
 
     def maturity_v1_serializer(self, obj):
         if not obj:
@@ -217,11 +958,12 @@ class Cache(BaseCache):
                 'PKList', 'specifications', model=Specification,
                 pks=obj._specification_pks),
             self.field_to_json(
-                'PKList', 'history', model=obj.history.model,
-                pks=obj._history_pks),
+                'HistoryPKList', 'history', model=obj.history.model,
+                pk=obj.pk, current=obj._history_current,
+                count=obj._history_count),
             self.field_to_json(
                 'PK', 'history_current', model=obj.history.model,
-                pk=obj._history_pks[0]),
+                pk=obj._history_current),
         ))
 
     def maturity_v1_loader(self, pk):
@@ -239,12 +981,26 @@ class Cache(BaseCache):
         if not hasattr(obj, '_specification_pks'):
             obj._specification_pks = sorted(
                 obj.specifications.values_list('pk', flat=True))
-        if not hasattr(obj, '_history_pks'):
-            obj._history_pks = list(
-                obj.history.all().values_list('history_id', flat=True))
+        self.bulk_add_history_heads(Maturity, [obj])
+
+    def maturity_v1_bulk_loader(self, pks):
+        objs = list(Maturity.objects.filter(pk__in=pks))
+        self.maturity_v1_bulk_add_related_pks(objs)
+        return objs
+
+    def maturity_v1_bulk_add_related_pks(self, objs):
+        """Add related primary keys to several Maturity instances."""
+        self.bulk_add_history_heads(Maturity, objs)
+        specification_pks = group_pks(
+            Specification.objects.filter(
+                maturity_id__in=[obj.pk for obj in objs]).values_list(
+                    'maturity_id', 'pk'), sort=True)
+        for obj in objs:
+            if not hasattr(obj, '_specification_pks'):
+                obj._specification_pks = specification_pks.get(obj.pk, [])
 
     def maturity_v1_invalidator(self, obj):
-        return []
+        return [self.view_feature_meta_generation_key]
 
     def section_v1_serializer(self, obj):
         if not obj:
@@ -262,11 +1018,12 @@ class Cache(BaseCache):
             self.field_to_json(
                 'PKList', 'features', model=Feature, pks=obj._feature_pks),
             self.field_to_json(
-                'PKList', 'history', model=obj.history.model,
-                pks=obj._history_pks),
+                'HistoryPKList', 'history', model=obj.history.model,
+                pk=obj.pk, current=obj._history_current,
+                count=obj._history_count),
             self.field_to_json(
                 'PK', 'history_current', model=obj.history.model,
-                pk=obj._history_pks[0]),
+                pk=obj._history_current),
         ))
 
     def section_v1_loader(self, pk):
@@ -281,15 +1038,32 @@ class Cache(BaseCache):
 
     def section_v1_add_related_pks(self, obj):
         """Add related primary keys to a Section instance."""
-        if not hasattr(obj, '_history_pks'):
-            obj._history_pks = list(
-                obj.history.all().values_list('history_id', flat=True))
+        self.bulk_add_history_heads(Section, [obj])
         if not hasattr(obj, '_feature_pks'):
             obj._feature_pks = sorted(
                 obj.features.values_list('pk', flat=True))
 
+    def section_v1_bulk_loader(self, pks):
+        objs = list(Section.objects.filter(pk__in=pks))
+        self.section_v1_bulk_add_related_pks(objs)
+        return objs
+
+    def section_v1_bulk_add_related_pks(self, objs):
+        """Add related primary keys to several Section instances."""
+        self.bulk_add_history_heads(Section, objs)
+        feature_pks = group_pks(
+            Feature.sections.through.objects.filter(
+                section_id__in=[obj.pk for obj in objs]).values_list(
+                    'section_id', 'feature_id'), sort=True)
+        for obj in objs:
+            if not hasattr(obj, '_feature_pks'):
+                obj._feature_pks = feature_pks.get(obj.pk, [])
+
     def section_v1_invalidator(self, obj):
-        return [('Specification', obj.specification_id, False)]
+        return [
+            ('Specification', obj.specification_id, False),
+            self.view_feature_meta_generation_key,
+        ]
 
     def specification_v1_serializer(self, obj):
         if not obj:
@@ -306,11 +1080,12 @@ class Cache(BaseCache):
             self.field_to_json(
                 'PK', 'maturity', model=Maturity, pk=obj.maturity_id),
             self.field_to_json(
-                'PKList', 'history', model=obj.history.model,
-                pks=obj._history_pks),
+                'HistoryPKList', 'history', model=obj.history.model,
+                pk=obj.pk, current=obj._history_current,
+                count=obj._history_count),
             self.field_to_json(
                 'PK', 'history_current', model=obj.history.model,
-                pk=obj._history_pks[0]),
+                pk=obj._history_current),
         ))
 
     def specification_v1_loader(self, pk):
@@ -325,15 +1100,32 @@ class Cache(BaseCache):
 
     def specification_v1_add_related_pks(self, obj):
         """Add related primary keys to a Specification instance."""
-        if not hasattr(obj, '_history_pks'):
-            obj._history_pks = list(
-                obj.history.all().values_list('history_id', flat=True))
+        self.bulk_add_history_heads(Specification, [obj])
         if not hasattr(obj, '_section_pks'):
             obj._section_pks = list(
                 obj.sections.values_list('pk', flat=True))
 
+    def specification_v1_bulk_loader(self, pks):
+        objs = list(Specification.objects.filter(pk__in=pks))
+        self.specification_v1_bulk_add_related_pks(objs)
+        return objs
+
+    def specification_v1_bulk_add_related_pks(self, objs):
+        """Add related primary keys to several Specification instances."""
+        self.bulk_add_history_heads(Specification, objs)
+        section_pks = group_pks(
+            Section.objects.filter(
+                specification_id__in=[obj.pk for obj in objs]).order_by(
+                    '_order').values_list('specification_id', 'pk'))
+        for obj in objs:
+            if not hasattr(obj, '_section_pks'):
+                obj._section_pks = section_pks.get(obj.pk, [])
+
     def specification_v1_invalidator(self, obj):
-        return [('Maturity', obj.maturity_id, False)]
+        return [
+            ('Maturity', obj.maturity_id, False),
+            self.view_feature_meta_generation_key,
+        ]
 
     def support_v1_serializer(self, obj):
         if not obj:
@@ -355,11 +1147,12 @@ class Cache(BaseCache):
             self.field_to_json(
                 'PK', 'feature', model=Feature, pk=obj.feature_id),
             self.field_to_json(
-                'PKList', 'history', model=obj.history.model,
-                pks=obj._history_pks),
+                'HistoryPKList', 'history', model=obj.history.model,
+                pk=obj.pk, current=obj._history_current,
+                count=obj._history_count),
             self.field_to_json(
                 'PK', 'history_current', model=obj.history.model,
-                pk=obj._history_pks[0]),
+                pk=obj._history_current),
         ))
 
     def support_v1_loader(self, pk):
@@ -374,15 +1167,26 @@ class Cache(BaseCache):
 
     def support_v1_add_related_pks(self, obj):
         """Add related primary keys to a Support instance."""
-        if not hasattr(obj, '_history_pks'):
-            obj._history_pks = list(
-                obj.history.all().values_list('history_id', flat=True))
+        self.bulk_add_history_heads(Support, [obj])
+
+    def support_v1_bulk_loader(self, pks):
+        objs = list(Support.objects.filter(pk__in=pks))
+        self.support_v1_bulk_add_related_pks(objs)
+        return objs
+
+    def support_v1_bulk_add_related_pks(self, objs):
+        """Add related primary keys to several Support instances."""
+        self.bulk_add_history_heads(Support, objs)
 
     def support_v1_invalidator(self, obj):
-        return [
+        invalid = [
             ("Version", obj.version_id, True),
             ("Feature", obj.feature_id, True),
         ]
+        feature = Feature.objects.filter(pk=obj.feature_id).first()
+        if feature:
+            invalid += self.view_feature_meta_keys(feature)
+        return invalid
 
     def version_v1_serializer(self, obj):
         if not obj:
@@ -402,11 +1206,12 @@ class Cache(BaseCache):
             self.field_to_json(
                 'PKList', 'supports', model=Support, pks=obj._support_pks),
             self.field_to_json(
-                'PKList', 'history', model=obj.history.model,
-                pks=obj._history_pks),
+                'HistoryPKList', 'history', model=obj.history.model,
+                pk=obj.pk, current=obj._history_current,
+                count=obj._history_count),
             self.field_to_json(
                 'PK', 'history_current', model=obj.history.model,
-                pk=obj._history_pks[0]),
+                pk=obj._history_current),
         ))
 
     def version_v1_loader(self, pk):
@@ -424,13 +1229,28 @@ class Cache(BaseCache):
         if not hasattr(obj, '_support_pks'):
             obj._support_pks = sorted(
                 obj.supports.values_list('pk', flat=True))
-        if not hasattr(obj, '_history_pks'):
-            obj._history_pks = list(
-                obj.history.all().values_list('history_id', flat=True))
+        self.bulk_add_history_heads(Version, [obj])
+
+    def version_v1_bulk_loader(self, pks):
+        objs = list(Version.objects.filter(pk__in=pks))
+        self.version_v1_bulk_add_related_pks(objs)
+        return objs
+
+    def version_v1_bulk_add_related_pks(self, objs):
+        """Add related primary keys to several Version instances."""
+        self.bulk_add_history_heads(Version, objs)
+        support_pks = group_pks(
+            Support.objects.filter(
+                version_id__in=[obj.pk for obj in objs]).values_list(
+                    'version_id', 'pk'), sort=True)
+        for obj in objs:
+            if not hasattr(obj, '_support_pks'):
+                obj._support_pks = support_pks.get(obj.pk, [])
 
     def version_v1_invalidator(self, obj):
         return [
-            ("Browser", obj.browser_id, True)]
+            ("Browser", obj.browser_id, True),
+            self.view_feature_meta_generation_key]
 
     def user_v1_serializer(self, obj):
         if not obj or not obj.is_active:
@@ -463,5 +1283,746 @@ class Cache(BaseCache):
             self.user_v1_add_related_pks(obj)
             return obj
 
+    def user_v1_bulk_loader(self, pks):
+        objs = list(User.objects.filter(pk__in=pks))
+        self.user_v1_bulk_add_related_pks(objs)
+        return objs
+
+    def user_v1_bulk_add_related_pks(self, objs):
+        """Add related primary keys and data to several User instances."""
+        user_pks = [obj.pk for obj in objs]
+        group_names = group_pks(
+            User.groups.through.objects.filter(
+                user_id__in=user_pks).values_list('user_id', 'group__name'),
+            sort=True)
+        changeset_pks = group_pks(
+            Changeset.objects.filter(user_id__in=user_pks).values_list(
+                'user_id', 'pk'))
+        for obj in objs:
+            if not hasattr(obj, 'group_names'):
+                obj.group_names = group_names.get(obj.pk, [])
+            if not hasattr(obj, '_changeset_pks'):
+                obj._changeset_pks = changeset_pks.get(obj.pk, [])
+
     def user_v1_invalidator(self, obj):
         return []
+
+    #
+    # Generations
+    #
+
+    def generation_key(self, model_name):
+        """Get the key for the generation of a model."""
+        return 'drfc_Generation_{0}'.format(model_name)
+
+    def feature_tree_generation_key(self, tree_id):
+        """Get the key for the generation of a feature tree."""
+        return 'drfc_Generation_FeatureTree_{0}'.format(tree_id)
+
+    def get_generation_values(self, keys):
+        """Get the current value of generation keys.
+
+        Missing generations are initialized.  Return is a dictionary of key
+        to generation.
+        """
+        generations = self.cache.get_many(keys)
+        for key in keys:
+            if key not in generations:
+                self.cache.add(key, uuid4().hex)
+                generations[key] = self.cache.get(key)
+        return generations
+
+    def get_generations(self, model_names):
+        """Get the generations of models.
+
+        Return is a dictionary of model name to generation, which is empty
+        when not in generational mode.
+        """
+        if not (model_names and self.generational):
+            return {}
+        keys = dict(
+            (self.generation_key(name), name) for name in model_names)
+        generations = self.get_generation_values(list(keys))
+        return dict((keys[key], gen) for key, gen in generations.items())
+
+    def get_feature_tree_generation(self, tree_id):
+        """Get a feature tree generation, or None if not generational."""
+        if not self.generational:
+            return None
+        key = self.feature_tree_generation_key(tree_id)
+        return self.get_generation_values([key])[key]
+
+    def change_generations(self, object_specs):
+        """Invalidate cached data for changed instances.
+
+        Keyword arguments:
+        object_specs - A list of (model name, pk, instance) that changed.  The
+            instance is None for existing instances, or the deleted instance.
+
+        The generations of the changed models, their dependent models, and
+        the feature trees containing changed features and supports are
+        changed, independent of the number of affected cached instances.
+        """
+        model_names = set()
+        feature_pks = set()
+        support_pks = set()
+        tree_ids = set()
+        for model_name, pk, instance in object_specs:
+            model_names.update(
+                self.generation_dependents.get(model_name, (model_name,)))
+            if model_name == 'Feature':
+                if instance:
+                    tree_ids.add(instance.tree_id)
+                else:
+                    feature_pks.add(pk)
+            elif model_name == 'Support':
+                if instance:
+                    feature_pks.add(instance.feature_id)
+                else:
+                    support_pks.add(pk)
+        if support_pks:
+            feature_pks.update(Support.objects.filter(
+                pk__in=support_pks).values_list('feature_id', flat=True))
+        if feature_pks:
+            tree_ids.update(Feature.objects.filter(
+                pk__in=feature_pks).values_list('tree_id', flat=True))
+
+        keys = [self.generation_key(name) for name in sorted(model_names)]
+        keys.extend(
+            self.feature_tree_generation_key(tree_id)
+            for tree_id in sorted(tree_ids))
+        self.cache.set_many(dict((key, uuid4().hex) for key in keys))
+        if model_names.intersection(self.view_feature_meta_models):
+            self.cache.delete(self.view_feature_meta_generation_key)
+
+    #
+    # Per-process local cache
+    #
+
+    # Changed when the locally cached instances may be stale
+    local_cache_generation_key = 'drfc_LocalCache_generation'
+
+    @property
+    def local_cache_size(self):
+        """Get the maximum number of instances in the local cache.
+
+        The local cache is disabled when the shared cache is disabled.
+        """
+        if not self.cache:
+            return 0
+        return getattr(settings, 'DRF_INSTANCE_CACHE_LOCAL_SIZE', 0)
+
+    def validate_local_cache(self):
+        """Clear the local cache if the shared generation has changed.
+
+        The generation is checked at most once per
+        local_cache_check_interval, so that local cache hits usually do not
+        need a shared cache request.
+        """
+        now = time()
+        checked = local_cache_state['checked']
+        if 0 <= now - checked < self.local_cache_check_interval:
+            return
+        key = self.local_cache_generation_key
+        generation = self.cache.get(key)
+        if generation is None:
+            self.cache.add(key, uuid4().hex)
+            generation = self.cache.get(key)
+        if generation != local_cache_state['generation']:
+            local_cache.clear()
+            local_cache_state['generation'] = generation
+        local_cache_state['checked'] = now
+
+    def get_local_instances(self, keys):
+        """Get raw cached representations from the local cache.
+
+        Return is a dictionary of cache key to raw representation, for the
+        keys found in the local cache.
+        """
+        if not (keys and self.local_cache_size):
+            return {}
+        self.validate_local_cache()
+        found = {}
+        for key in keys:
+            value = local_cache.pop(key, None)
+            if value is not None:
+                local_cache[key] = value
+                found[key] = value
+        return found
+
+    def set_local_instances(self, values):
+        """Add raw cached representations to the local cache.
+
+        The least recently used entries are dropped to keep the local cache
+        under local_cache_size.
+        """
+        size = self.local_cache_size
+        if not (values and size):
+            return
+        for key, value in values.items():
+            local_cache.pop(key, None)
+            local_cache[key] = value
+        while len(local_cache) > size:
+            local_cache.popitem(last=False)
+
+    def invalidate_local_cache(self):
+        """Clear the local cache in this and all other processes."""
+        local_cache.clear()
+        if self.cache:
+            generation = uuid4().hex
+            self.cache.set(self.local_cache_generation_key, generation)
+            local_cache_state['generation'] = generation
+            local_cache_state['checked'] = time()
+
+    #
+    # Statistics
+    #
+
+    # Statistics that are timings, in seconds
+    timed_stats = ('load', 'serialize')
+
+    # Upper bounds in seconds of the timing histogram buckets.  The last
+    # bucket counts slower timings.
+    stats_buckets = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+
+    @property
+    def stats_enabled(self):
+        """Return True if cache statistics are recorded."""
+        return getattr(settings, 'DRF_INSTANCE_CACHE_STATS', False)
+
+    def record_stats(self, model_name, version, **stats):
+        """Add to the cache statistics of a model.
+
+        Keyword arguments are counts, or timings for names in timed_stats.
+        Statistics are added to the per-process and per-request totals.
+        Requests are counted separately in each thread.
+        """
+        if not self.stats_enabled:
+            return
+        for totals in (cache_stats, get_request_cache_stats()):
+            model_stats = totals.setdefault((model_name, version), {})
+            for name, value in stats.items():
+                if name in self.timed_stats:
+                    timing = model_stats.setdefault(name, {
+                        'count': 0,
+                        'total': 0.0,
+                        'histogram': [0] * (len(self.stats_buckets) + 1),
+                    })
+                    timing['count'] += 1
+                    timing['total'] += value
+                    bucket = bisect_left(self.stats_buckets, value)
+                    timing['histogram'][bucket] += 1
+                else:
+                    model_stats[name] = model_stats.get(name, 0) + value
+
+    def get_stats(self):
+        """Get the cache statistics of this process.
+
+        Return is a dictionary with the statistics by 'Model.version', and
+        the shared view feature response counters.
+        """
+        by_model = {}
+        for (model_name, version), model_stats in cache_stats.items():
+            name = '%s.%s' % (model_name, version)
+            by_model[name] = model_stats
+        return {
+            'buckets': list(self.stats_buckets),
+            'models': by_model,
+            'view_feature_responses':
+                self.get_view_feature_response_counters(),
+        }
+
+    #
+    # History
+    #
+
+    # Number of historical primary keys in each page of the history index
+    history_page_size = 100
+
+    def field_historypklist_from_json(self, data):
+        """Load a PkOnlyQueryset of historical records from a JSON dict."""
+        model = apps.get_model(data['app'], data['model'])
+        return PkOnlyQueryset(self, model, HistoryPKs(
+            self, model, data['pk'], data['current'], data['count']))
+
+    def field_historypklist_to_json(self, model, pk, current, count):
+        """Convert the history of an instance to a JSON dict.
+
+        Only the current history PK and the count of historical records are
+        stored, so the size is the same for heavily edited instances.
+        """
+        app_label = model._meta.app_label
+        model_name = model._meta.model_name
+        return {
+            'app': app_label,
+            'model': model_name,
+            'pk': pk,
+            'current': current,
+            'count': count,
+        }
+
+    def history_index_key(self, version, model, pk, count, page):
+        """Get the cache key for a page of an instance's history PKs.
+
+        The key includes the count of historical records, so a new record
+        creates a new index.
+        """
+        return 'drfc_{0}_HistoryIndex_{1}_{2}_{3}_{4}'.format(
+            version, model._meta.model_name, pk, count, page)
+
+    def history_pks(self, model, pk, count, start, stop, version=None):
+        """Get a slice of the historical primary keys of an instance.
+
+        Keyword arguments:
+        model - The historical model
+        pk - The primary key of the instance
+        count - The count of historical records of the instance
+        start, stop - The slice to return, with the newest record first
+
+        The index is stored in pages of history_page_size primary keys.  If
+        any needed page is missing, all the pages are loaded with one query.
+        """
+        history = model.objects.filter(id=pk).values_list(
+            'history_id', flat=True)
+        if not self.cache:
+            return list(history[start:stop])
+
+        version = version or self.default_version
+        per_page = self.history_page_size
+        first_page = start // per_page
+        last_page = max(first_page, (stop - 1) // per_page)
+        keys = [
+            self.history_index_key(version, model, pk, count, page)
+            for page in range(first_page, last_page + 1)]
+        cached = self.cache.get_many(keys)
+        if len(cached) != len(keys):
+            pks = list(history)
+            pages = {}
+            for page in range(0, (len(pks) + per_page - 1) // per_page):
+                key = self.history_index_key(version, model, pk, count, page)
+                pages[key] = pks[page * per_page:(page + 1) * per_page]
+            self.cache.set_many(pages)
+            cached = pages
+
+        pks = []
+        for key in keys:
+            pks.extend(cached.get(key, []))
+        offset = first_page * per_page
+        return pks[start - offset:stop - offset]
+
+    def load_history_pks(self, history_lists):
+        """Load the full historical primary keys of several instances.
+
+        Keyword arguments:
+        history_lists - A list of HistoryPKs to load
+
+        The index pages of all the instances are read with one cache
+        request.  Instances with a missing page are loaded with one query
+        per historical model, and their index pages are updated.
+        """
+        per_page = self.history_page_size
+        page_keys = {}
+        for history in history_lists:
+            version = history.version or self.default_version
+            page_count = (history.count + per_page - 1) // per_page
+            page_keys[history] = [
+                self.history_index_key(
+                    version, history.model, history.pk, history.count, page)
+                for page in range(page_count)]
+
+        if self.cache:
+            cached = self.cache.get_many(
+                [key for keys in page_keys.values() for key in keys])
+        else:
+            cached = {}
+        missing = {}
+        for history, keys in page_keys.items():
+            if all(key in cached for key in keys):
+                history.loaded = [pk for key in keys for pk in cached[key]]
+            else:
+                missing.setdefault(history.model, []).append(history)
+
+        to_set = {}
+        for model, histories in missing.items():
+            by_id = {}
+            rows = model.objects.filter(
+                id__in=set(history.pk for history in histories)
+            ).values_list('id', 'history_id')
+            for obj_id, history_id in rows:
+                by_id.setdefault(obj_id, []).append(history_id)
+            for history in histories:
+                pks = by_id.get(history.pk, [])
+                history.loaded = pks
+                version = history.version or self.default_version
+                for page in range((len(pks) + per_page - 1) // per_page):
+                    key = self.history_index_key(
+                        version, model, history.pk, history.count, page)
+                    to_set[key] = pks[page * per_page:(page + 1) * per_page]
+        if to_set and self.cache:
+            self.cache.set_many(to_set)
+
+    #
+    # Descendants of large features
+    #
+
+    def feature_descendant_key(
+            self, version, feature, chunk, tree_generation=None):
+        """Get the cache key for a chunk of a feature's descendant PKs.
+
+        The key includes the tree position of the feature, so adding or
+        removing descendants creates a new index.  In generational mode, it
+        also includes the generation of the feature tree.
+        """
+        key = 'drfc_{0}_FeatureDescendants_{1}_{2}_{3}_{4}_{5}'.format(
+            version, feature.pk, feature.tree_id, feature.lft, feature.rght,
+            chunk)
+        if tree_generation:
+            key += '_' + tree_generation
+        return key
+
+    def feature_descendant_keys(self, feature, version=None):
+        """Get the descendant index keys for a feature and its ancestors.
+
+        These are invalidated when a feature moves within a tree, which
+        reorders the descendants without changing the ancestor positions.
+        """
+        version = version or self.default_version
+        per_chunk = settings.PAGINATE_VIEW_FEATURE
+        keys = []
+        for ancestor in feature.get_ancestors(include_self=True):
+            count = ancestor.get_descendant_count()
+            if count > per_chunk:
+                chunks = (count + per_chunk - 1) // per_chunk
+                for chunk in range(chunks):
+                    keys.append(self.feature_descendant_key(
+                        version, ancestor, chunk))
+        return keys
+
+    def feature_descendant_pks(self, feature, start, stop, version=None):
+        """Get a slice of the descendant primary keys of a feature.
+
+        The descendants are stored in chunks of PAGINATE_VIEW_FEATURE
+        primary keys.  If any needed chunk is missing, all the chunks are
+        loaded with one query.
+        """
+        descendants = Feature.objects.filter(
+            tree_id=feature.tree_id, lft__gt=feature.lft,
+            rght__lt=feature.rght).order_by('lft')
+        if not self.cache:
+            return list(descendants.values_list('pk', flat=True)[start:stop])
+
+        version = version or self.default_version
+        per_chunk = settings.PAGINATE_VIEW_FEATURE
+        first_chunk = start // per_chunk
+        last_chunk = max(first_chunk, (stop - 1) // per_chunk)
+        tree_gen = self.get_feature_tree_generation(feature.tree_id)
+        keys = [
+            self.feature_descendant_key(version, feature, chunk, tree_gen)
+            for chunk in range(first_chunk, last_chunk + 1)]
+        cached = self.cache.get_many(keys)
+        if len(cached) != len(keys):
+            pks = list(descendants.values_list('pk', flat=True))
+            chunks = {}
+            for chunk in range(0, (len(pks) + per_chunk - 1) // per_chunk):
+                key = self.feature_descendant_key(
+                    version, feature, chunk, tree_gen)
+                chunks[key] = pks[chunk * per_chunk:(chunk + 1) * per_chunk]
+            self.cache.set_many(chunks)
+            cached = chunks
+
+        pks = []
+        for key in keys:
+            pks.extend(cached.get(key, []))
+        offset = first_chunk * per_chunk
+        return pks[start - offset:stop - offset]
+
+    #
+    # View feature metadata
+    #
+
+    # Deleted when browsers, versions, or specification data change
+    view_feature_meta_generation_key = 'drfc_ViewFeatureMeta_generation'
+
+    def view_feature_meta_key(self, version, feature_pk, page):
+        """Get the cache key for a page of view feature metadata."""
+        return 'drfc_{0}_ViewFeatureMeta_{1}_{2}'.format(
+            version, feature_pk, page)
+
+    def view_feature_meta_keys(self, feature, version=None):
+        """Get the metadata keys for all pages of a feature and ancestors.
+
+        Changes to a feature or its supports change the metadata of each
+        ancestor, since it is included in the ancestor's descendants.
+        """
+        version = version or self.default_version
+        per_page = settings.PAGINATE_VIEW_FEATURE
+        keys = []
+        for ancestor in feature.get_ancestors(include_self=True):
+            count = ancestor.get_descendant_count()
+            pages = max(1, (count + per_page - 1) // per_page)
+            for page in range(1, pages + 1):
+                keys.append(
+                    self.view_feature_meta_key(version, ancestor.pk, page))
+        return keys
+
+    def get_view_feature_meta(
+            self, feature_pk, page, version=None, tree_id=None):
+        """Get the cached metadata for a page of a view feature.
+
+        In generational mode, the tree_id of the feature is needed to check
+        the generation of the feature tree.
+
+        Return is the compat_table metadata, or None if not cached.
+        """
+        if not self.cache:
+            return None
+        version = version or self.default_version
+        key = self.view_feature_meta_key(version, feature_pk, page)
+        gen_key = self.view_feature_meta_generation_key
+        cached = self.cache.get_many([key, gen_key])
+        if key not in cached or gen_key not in cached:
+            return None
+        meta = json.loads(cached[key], object_pairs_hook=OrderedDict)
+        if meta['generation'] != cached[gen_key]:
+            return None
+        if self.generational and (
+                tree_id is None or meta.get('tree_generation') !=
+                self.get_feature_tree_generation(tree_id)):
+            return None
+        return meta['compat_table']
+
+    def set_view_feature_meta(
+            self, feature_pk, page, compat_table, version=None, tree_id=None):
+        """Cache the metadata for a page of a view feature."""
+        if not self.cache:
+            return
+        version = version or self.default_version
+        gen_key = self.view_feature_meta_generation_key
+        self.cache.add(gen_key, uuid4().hex)
+        generation = self.cache.get(gen_key)
+        if generation:
+            key = self.view_feature_meta_key(version, feature_pk, page)
+            meta = OrderedDict((
+                ('generation', generation),
+                ('compat_table', compat_table),
+            ))
+            if self.generational and tree_id is not None:
+                meta['tree_generation'] = self.get_feature_tree_generation(
+                    tree_id)
+            self.cache.set(key, json.dumps(meta))
+
+    #
+    # Rendered view feature responses
+    #
+
+    # Deleted when any resource except features and supports change
+    view_feature_response_generation_key = (
+        'drfc_ViewFeatureResponse_generation')
+
+    # Counts of requests that waited for another worker to render a
+    # response, and of requests served a stale response instead
+    view_feature_response_counter_keys = {
+        'waits': 'drfc_ViewFeatureResponse_waits',
+        'stale': 'drfc_ViewFeatureResponse_stale',
+    }
+
+    # Seconds a worker may hold the lease to render a response
+    view_feature_response_lease_timeout = 30
+
+    # Seconds to wait for the lease holder to render a response, and
+    # seconds between checks for the rendered response
+    view_feature_response_lease_wait = 5.0
+    view_feature_response_lease_poll = 0.05
+
+    # Seconds to keep the last rendered response, to serve while rendering
+    view_feature_response_stale_timeout = 24 * 60 * 60
+
+    def view_feature_response_feature_generation_key(self, feature_pk):
+        """Get the key for the response generation of a feature."""
+        return 'drfc_ViewFeatureResponse_generation_{0}'.format(feature_pk)
+
+    def view_feature_response_key(self, feature_pk, *variant):
+        """Get the cache key for a rendered view feature response.
+
+        Keyword arguments:
+        feature_pk - The primary key of the feature
+        variant - Request details that change the rendered response, such as
+            the page, format, and language
+
+        The key includes the global and per-feature response generations, so
+        changing either generation invalidates the cached responses.  Return
+        is the key, or None if the response can not be cached.
+        """
+        if not self.cache:
+            return None
+        gen_keys = [
+            self.view_feature_response_generation_key,
+            self.view_feature_response_feature_generation_key(feature_pk),
+        ]
+        generations = self.cache.get_many(gen_keys)
+        for gen_key in gen_keys:
+            if gen_key not in generations:
+                self.cache.add(gen_key, uuid4().hex)
+                generations[gen_key] = self.cache.get(gen_key)
+            if not generations[gen_key]:
+                return None
+        raw = json.dumps(
+            [generations[gen_key] for gen_key in gen_keys] + list(variant))
+        return 'drfc_ViewFeatureResponse_{0}_{1}'.format(
+            feature_pk, md5(raw.encode('utf-8')).hexdigest())
+
+    def view_feature_response_stale_key(self, feature_pk, *variant):
+        """Get the cache key for the last rendered view feature response.
+
+        Unlike view_feature_response_key, the key does not include the
+        response generations, so it is the same after invalidation.
+        """
+        raw = json.dumps(list(variant))
+        return 'drfc_ViewFeatureResponse_stale_{0}_{1}'.format(
+            feature_pk, md5(raw.encode('utf-8')).hexdigest())
+
+    def view_feature_response_lease_key(self, key):
+        """Get the key for the lease to render a response."""
+        return key + '_lease'
+
+    def get_view_feature_response(self, key, stale_key=None):
+        """Get a cached response as (headers, content), or None.
+
+        If stale_key is set and the response is not cached, then only one
+        caller at a time gets None and the lease to render the response.
+        Other callers get the stale response, or wait for the lease holder
+        to cache the response.  If the wait times out, they get None, and
+        render the response as well.
+        """
+        if not self.cache:
+            return None
+        cached = self.cache.get(key)
+        if cached or not stale_key:
+            return cached
+
+        lease_key = self.view_feature_response_lease_key(key)
+        if self.cache.add(
+                lease_key, True, self.view_feature_response_lease_timeout):
+            return None
+
+        stale = self.cache.get(stale_key)
+        if stale:
+            self.incr_view_feature_response_counter('stale')
+            return stale
+
+        self.incr_view_feature_response_counter('waits')
+        deadline = time() + self.view_feature_response_lease_wait
+        while time() < deadline:
+            sleep(self.view_feature_response_lease_poll)
+            cached = self.cache.get(key)
+            if cached:
+                return cached
+            if not self.cache.get(lease_key):
+                break
+        return None
+
+    def set_view_feature_response(
+            self, key, headers, content, stale_key=None):
+        """Cache a rendered view feature response.
+
+        Keyword arguments:
+        key - The key from view_feature_response_key
+        headers - A list of (header, value) pairs, including the ETag
+        content - The rendered content
+        stale_key - The key from view_feature_response_stale_key, to also
+            cache the response as the stale copy and release the lease
+        """
+        if self.cache:
+            self.cache.set(key, (headers, content))
+            if stale_key:
+                self.cache.set(
+                    stale_key, (headers, content),
+                    self.view_feature_response_stale_timeout)
+                self.release_view_feature_response_lease(key)
+
+    def release_view_feature_response_lease(self, key):
+        """Release the lease to render a response."""
+        if self.cache:
+            self.cache.delete(self.view_feature_response_lease_key(key))
+
+    def incr_view_feature_response_counter(self, name):
+        """Increment a view feature response counter."""
+        key = self.view_feature_response_counter_keys[name]
+        self.cache.add(key, 0, None)
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            # Evicted between add and incr
+            pass
+
+    def get_view_feature_response_counters(self):
+        """Get the view feature response counters as a dictionary."""
+        if not self.cache:
+            return {}
+        keys = self.view_feature_response_counter_keys
+        counts = self.cache.get_many(list(keys.values()))
+        return dict((name, counts.get(key, 0)) for name, key in keys.items())
+
+    def invalidate_view_feature_responses(self, feature_pks=None):
+        """Invalidate cached view feature responses.
+
+        If feature_pks is None, all cached responses are invalidated.
+        Otherwise, the responses for the features and their ancestors are
+        invalidated.
+        """
+        if not self.cache:
+            return
+        if feature_pks is None:
+            self.cache.delete(self.view_feature_response_generation_key)
+            return
+
+        features = Feature.objects.filter(pk__in=feature_pks).values_list(
+            'tree_id', 'lft', 'rght')
+        if not features:
+            return
+        ancestors = reduce(or_, [
+            Q(tree_id=tree_id, lft__lte=lft, rght__gte=rght)
+            for tree_id, lft, rght in features])
+        ancestor_pks = Feature.objects.filter(ancestors).values_list(
+            'pk', flat=True)
+        self.cache.delete_many([
+            self.view_feature_response_feature_generation_key(pk)
+            for pk in ancestor_pks])
+
+    def view_feature_pks_for_instance(self, model_name, instance):
+        """Get the features with a view that includes an instance.
+
+        Return is a list of feature primary keys, or None if the instance
+        may be in any view.
+        """
+        if model_name == 'Feature':
+            return [pk for pk in (instance.pk, instance.parent_id) if pk]
+        elif model_name == 'Support':
+            return [instance.feature_id]
+        elif model_name == 'User':
+            return []
+        else:
+            return None
+
+    def view_feature_pks_for_changeset(self, changeset):
+        """Get the features with a view changed by a changeset.
+
+        Return is a list of feature primary keys, or None if the changeset
+        may change any view.
+        """
+        other_relations = (
+            'historical_browsers', 'historical_maturities',
+            'historical_sections', 'historical_specifications',
+            'historical_versions')
+        for relation in other_relations:
+            if getattr(changeset, relation).exists():
+                return None
+        feature_pks = set()
+        for pk, parent_pk in changeset.historical_features.values_list(
+                'id', 'parent_id'):
+            feature_pks.add(pk)
+            if parent_pk:
+                feature_pks.add(parent_pk)
+        feature_pks.update(
+            changeset.historical_supports.values_list('feature_id', flat=True))
+        return sorted(feature_pks)
@@ -62,13 +62,36 @@ class Changeset(models.Model):
         """Refresh cache of the items updated in changeset"""
         super(Changeset, self).save(*args, **kwargs)
         if self.closed and update_cache:
-            from .tasks import update_cache_for_instance
+            from .cache import Cache
+            from .tasks import update_cache_for_instances
+            object_specs = []
             for relation in self._meta.get_all_related_objects():
                 related = getattr(self, relation.get_accessor_name())
                 type_name = related.model.instance_type.__name__
-                ids = related.values_list('id', flat=True)
-                for i in ids:
-                    update_cache_for_instance.delay(type_name, i)
+                ids = related.order_by().values_list(
+                    'id', flat=True).distinct()
+                object_specs.extend((type_name, i, None) for i in ids)
+            if object_specs:
+                # Cache the changed instances, even if not cached before
+                update_cache_for_instances.delay(
+                    object_specs, update_only=False)
+            cache = Cache()
+            cache.invalidate_local_cache()
+            cache.invalidate_view_feature_responses(
+                cache.view_feature_pks_for_changeset(self))
+            queue_snapshot_update()
+
+
+# Seconds to wait before updating the snapshot, so that the changesets
+# closed in that time are combined into one update
+snapshot_update_delay = 60
+
+
+def queue_snapshot_update():
+    """Queue an update of the resources snapshot, if enabled."""
+    if getattr(settings, 'SNAPSHOT_ROOT', None):
+        from .tasks import update_snapshot
+        update_snapshot.apply_async(countdown=snapshot_update_delay)
 
 
 class HistoricalRecords(BaseHistoricalRecords):
@@ -136,11 +159,17 @@ class HistoricalRecords(BaseHistoricalRecords):
             history_changeset.closed = True
             update_cache = self.thread.request.delay_cache
             history_changeset.save(update_cache=update_cache)
+            auto_closed = True
         else:
             update_cache = False
-        manager.create(
+            auto_closed = False
+        record = manager.create(
             history_date=history_date, history_type=history_type,
             history_changeset=history_changeset, **attrs)
+        instance._last_history_pk = record.pk
+        if auto_closed:
+            # The changeset was closed before the record was added
+            queue_snapshot_update()
 
 
 class HistoryChangesetRequestMiddleware(BaseHistoryRequestMiddleware):
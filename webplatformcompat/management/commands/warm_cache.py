@@ -0,0 +1,130 @@
+"""Populate the instance cache for all API resources in bulk."""
+from __future__ import unicode_literals
+from collections import OrderedDict
+from multiprocessing import Pool, cpu_count
+from optparse import make_option
+from time import time
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from webplatformcompat.cache import Cache
+from webplatformcompat.models import (
+    Browser, Feature, Maturity, Section, Specification, Support, Version)
+
+cached_models = OrderedDict((
+    ('Browser', Browser),
+    ('Version', Version),
+    ('Feature', Feature),
+    ('Support', Support),
+    ('Section', Section),
+    ('Specification', Specification),
+    ('Maturity', Maturity),
+    ('User', User),
+))
+
+
+def init_worker():
+    """Setup a worker process with its own connections."""
+    for connection in connections.all():
+        connection.close()
+    for cache in caches.all():
+        cache.close()
+
+
+def warm_batch(batch):
+    """Cache a batch of instances of one model.
+
+    Return is (model name, instances cached, bytes written).
+    """
+    model_name, pks = batch
+    count, size = Cache().warm_instances(model_name, pks)
+    return model_name, count, size
+
+
+def get_batches(model_names, batch_size):
+    """Generate (model name, primary keys) batches for the models."""
+    for model_name in model_names:
+        model = cached_models[model_name]
+        pks = []
+        for pk in model.objects.order_by('pk').values_list(
+                'pk', flat=True).iterator():
+            pks.append(pk)
+            if len(pks) == batch_size:
+                yield model_name, pks
+                pks = []
+        if pks:
+            yield model_name, pks
+
+
+class Command(BaseCommand):
+    args = '<model_name model_name ...>'
+    help = (
+        'Populate the instance cache for the given models, or all cached'
+        ' models if none are given.')
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--processes', type='int', default=cpu_count(),
+            help='Number of worker processes, or 1 to cache in-process'),
+        make_option(
+            '--batch', type='int', default=Cache.bulk_load_size,
+            help='Number of instances to load and write at once'),
+    )
+
+    def handle(self, *args, **options):
+        self.verbosity = int(options['verbosity'])
+        model_names = list(args) or list(cached_models.keys())
+        unknown = [name for name in model_names if name not in cached_models]
+        if unknown:
+            raise CommandError(
+                'Unknown model %s, expected one of %s' % (
+                    ', '.join(unknown), ', '.join(cached_models.keys())))
+        batches = get_batches(model_names, options['batch'])
+
+        start = time()
+        processes = options['processes']
+        if processes > 1:
+            # Don't share the parent's connections with the workers
+            init_worker()
+            pool = Pool(processes, init_worker)
+            try:
+                results = pool.imap_unordered(warm_batch, batches)
+                totals = self.report_progress(results, start)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = (warm_batch(batch) for batch in batches)
+            totals = self.report_progress(results, start)
+
+        elapsed = time() - start
+        count = sum(count for count, size in totals.values())
+        size = sum(size for count, size in totals.values())
+        for model_name in model_names:
+            model_count, model_size = totals.get(model_name, (0, 0))
+            self.stdout.write('%s: %d instances, %d bytes' % (
+                model_name, model_count, model_size))
+        rate = (count / elapsed) if elapsed else 0.0
+        self.stdout.write(
+            'Cached %d instances (%d bytes) in %0.1f seconds'
+            ' (%0.1f instances/sec).' % (count, size, elapsed, rate))
+
+    def report_progress(self, results, start):
+        """Report progress as batches complete, and return the totals.
+
+        Return is a dictionary of model name to (instances, bytes).
+        """
+        totals = {}
+        for model_name, batch_count, batch_size in results:
+            count, size = totals.get(model_name, (0, 0))
+            totals[model_name] = (count + batch_count, size + batch_size)
+            if self.verbosity > 1:
+                elapsed = time() - start
+                total = sum(count for count, size in totals.values())
+                self.stdout.write(
+                    '%s: %d instances (%0.1f instances/sec)' % (
+                        model_name, totals[model_name][0],
+                        (total / elapsed) if elapsed else 0.0))
+        return totals
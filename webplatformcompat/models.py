@@ -17,11 +17,13 @@ from .validators import VersionAndStatusValidator
 
 class CachingManager(models.Manager):
     def create(self, **kwargs):
-        """Add the _delay_cache value to the object before saving"""
+        """Add the cache flags to the object before saving"""
         delay_cache = kwargs.pop('_delay_cache', False)
+        write_through_cache = kwargs.pop('_write_through_cache', False)
         obj = self.model(**kwargs)
         self._for_write = True
         obj._delay_cache = delay_cache
+        obj._write_through_cache = write_through_cache
         obj.save(force_insert=True, using=self.db)
         return obj
 
@@ -326,10 +328,19 @@ def feature_sections_changed_update_order(
     from .tasks import update_cache_for_instance
     for feature in features:
         update_cache_for_instance('Feature', feature.pk, feature, False)
+        invalidate_view_feature_responses('Feature', feature)
     for section in sections:
         update_cache_for_instance('Section', section.pk, section, False)
 
 
+def invalidate_view_feature_responses(name, instance):
+    """Invalidate the cached view_feature responses that include instance."""
+    from .cache import Cache
+    cache = Cache()
+    cache.invalidate_view_feature_responses(
+        cache.view_feature_pks_for_instance(name, instance))
+
+
 @receiver(post_delete, dispatch_uid='post_delete_update_cache')
 def post_delete_update_cache(sender, instance, **kwargs):
     name = sender.__name__
@@ -338,6 +349,7 @@ def post_delete_update_cache(sender, instance, **kwargs):
         if not delay_cache:
             from .tasks import update_cache_for_instance
             update_cache_for_instance(name, instance.pk, instance, False)
+            invalidate_view_feature_responses(name, instance)
 
 
 @receiver(post_save, dispatch_uid='post_save_update_cache')
@@ -347,9 +359,12 @@ def post_save_update_cache(sender, instance, created, raw, **kwargs):
     name = sender.__name__
     if name in cached_model_names:
         delay_cache = getattr(instance, '_delay_cache', False)
-        if not delay_cache:
+        # The view that saved the instance will write it to the cache
+        write_through = getattr(instance, '_write_through_cache', False)
+        if not (delay_cache or write_through):
             from .tasks import update_cache_for_instance
             update_cache_for_instance(name, instance.pk, instance, False)
+            invalidate_view_feature_responses(name, instance)
 
 
 #
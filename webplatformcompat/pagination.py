@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""Pagination for API list views."""
+from __future__ import unicode_literals
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from drf_cached_instances.models import CachedQueryset
+
+
+class OptionalCursorPagination(PageNumberPagination):
+    """Paginate by page number, or by a cursor if requested.
+
+    With the cursor parameter, pages are selected by a range of primary
+    keys rather than an offset, so deep pages are as fast as the first
+    page, and the total count is omitted.  An empty cursor (?cursor=)
+    requests the first page, and the next and previous links include the
+    cursor for the adjacent pages.
+
+    Cursor pages are ordered by primary key.  This is the same as the ID
+    for resources, but is the history ID for historical resources.
+    """
+
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor = None
+        if self.cursor_query_param not in request.query_params:
+            return super(OptionalCursorPagination, self).paginate_queryset(
+                queryset, request, view)
+
+        self._handle_backwards_compat(view)
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        self.request = request
+        self.cursor = self.decode_cursor(
+            request.query_params[self.cursor_query_param])
+        reverse, position = self.cursor
+
+        if isinstance(queryset, CachedQueryset):
+            base_queryset = queryset.queryset
+        else:
+            base_queryset = queryset
+        if reverse:
+            ordered = base_queryset.filter(pk__lt=position).order_by('-pk')
+        elif position is not None:
+            ordered = base_queryset.filter(pk__gt=position).order_by('pk')
+        else:
+            ordered = base_queryset.order_by('pk')
+
+        # Load an extra item to detect a following page
+        if isinstance(queryset, CachedQueryset):
+            pks = list(ordered.values_list('pk', flat=True)[:page_size + 1])
+            more = len(pks) > page_size
+            pks = pks[:page_size]
+            if reverse:
+                pks.reverse()
+            page = list(CachedQueryset(queryset.cache, base_queryset, pks))
+        else:
+            page = list(ordered[:page_size + 1])
+            more = len(page) > page_size
+            page = page[:page_size]
+            if reverse:
+                page.reverse()
+            pks = [obj.pk for obj in page]
+
+        self.next_pk = self.previous_pk = None
+        if pks:
+            if reverse:
+                self.next_pk = pks[-1]
+                if more:
+                    self.previous_pk = pks[0]
+            else:
+                if more:
+                    self.next_pk = pks[-1]
+                if position is not None:
+                    self.previous_pk = pks[0]
+        return page
+
+    def get_paginated_response(self, data):
+        if self.cursor is None:
+            return super(
+                OptionalCursorPagination, self).get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+    def get_next_link(self):
+        if self.cursor is None:
+            return super(OptionalCursorPagination, self).get_next_link()
+        if self.next_pk is None:
+            return None
+        return self.get_cursor_link(False, self.next_pk)
+
+    def get_previous_link(self):
+        if self.cursor is None:
+            return super(OptionalCursorPagination, self).get_previous_link()
+        if self.previous_pk is None:
+            return None
+        return self.get_cursor_link(True, self.previous_pk)
+
+    def get_cursor_link(self, reverse, position):
+        """Get the URL for the page before or after a primary key."""
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(
+            url, self.cursor_query_param,
+            self.encode_cursor(reverse, position))
+
+    def decode_cursor(self, encoded):
+        """Decode a cursor to (reverse, primary key).
+
+        The primary key is None for the first page.
+        """
+        if not encoded:
+            return (False, None)
+        try:
+            raw = urlsafe_b64decode(encoded.encode('ascii')).decode('ascii')
+            direction, position = raw.split(':')
+            position = int(position)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if direction not in ('a', 'b') or position < 0:
+            raise NotFound(self.invalid_cursor_message)
+        return (direction == 'b', position)
+
+    def encode_cursor(self, reverse, position):
+        """Encode a cursor for the page before or after a primary key."""
+        raw = '%s:%d' % ('b' if reverse else 'a', position)
+        return urlsafe_b64encode(raw.encode('ascii')).decode('ascii')
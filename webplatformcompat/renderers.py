@@ -1,13 +1,14 @@
 from collections import OrderedDict
-from json import loads
 
 from django.utils import encoding, translation
+from django.utils.six.moves.urllib_parse import urlparse, urlunparse
 
-from rest_framework.relations import ManyRelatedField
-from rest_framework.renderers import TemplateHTMLRenderer
-from rest_framework.serializers import ListSerializer
+from rest_framework.relations import (
+    HyperlinkedRelatedField, ManyRelatedField, RelatedField)
+from rest_framework.renderers import JSONRenderer, TemplateHTMLRenderer
+from rest_framework.serializers import BaseSerializer, ListSerializer
 from rest_framework.utils.encoders import JSONEncoder
-from rest_framework.utils.serializer_helpers import ReturnList
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
 from rest_framework_json_api.renderers import JsonApiRenderer \
     as BaseJsonApiRender
 from rest_framework_json_api.renderers import WrapperNotApplicable
@@ -31,14 +32,32 @@ class JsonApiRenderer(BaseJsonApiRender):
         'wrap_view_extra_error',
     ] + BaseJsonApiRender.wrappers)
 
+    def get_wrapper(self, data, renderer_context):
+        """Convert native data to JSON API, without encoding it.
+
+        This is the wrapper selection of render, for callers that use the
+        JSON API structure directly.
+        """
+        for wrapper_name in self.wrappers:
+            try:
+                return getattr(self, wrapper_name)(data, renderer_context)
+            except WrapperNotApplicable:
+                pass
+        raise WrapperNotApplicable(
+            'No acceptable wrappers found for response.',
+            data=data, renderer_context=renderer_context)
+
     def add_meta(self, resource, field, field_name, request):
         """Add metadata."""
         data = resource[field_name]
         return {'meta': data}
 
     def wrap_paginated(self, data, renderer_context):
-        """Convert paginated data to JSON API with meta"""
-        pagination_keys = ['count', 'next', 'previous', 'results']
+        """Convert paginated data to JSON API with meta
+
+        Cursor pagination omits the count.
+        """
+        pagination_keys = ['next', 'previous', 'results']
         for key in pagination_keys:
             if not (data and key in data):
                 raise WrapperNotApplicable('Not paginated results')
@@ -62,7 +81,8 @@ class JsonApiRenderer(BaseJsonApiRender):
         pagination = self.dict_class()
         pagination['previous'] = data['previous']
         pagination['next'] = data['next']
-        pagination['count'] = data['count']
+        if 'count' in data:
+            pagination['count'] = data['count']
         wrapper.setdefault('meta', self.dict_class())
         wrapper['meta'].setdefault('pagination', self.dict_class())
         wrapper['meta']['pagination'].setdefault(
@@ -221,17 +241,183 @@ class JsonApiRenderer(BaseJsonApiRender):
             return super(JsonApiRenderer, self).fields_from_resource(resource)
 
 
+class CachedJsonApiRenderer(JsonApiRenderer):
+    """Render list and detail GETs with a precomputed plan per serializer.
+
+    The generic renderer converts each field of each item by type, and
+    builds the link templates for every item.  For a GET of instances,
+    every item of a serializer has the same shape, so the field
+    conversions and the link templates are computed once and reused across
+    requests.  The output is encoded the same as the generic renderer.
+    Other responses, such as errors, use the generic renderer.
+
+    The link templates are stored without the server, which is added for
+    each request.  The least recently used plans are dropped to keep the
+    number of plans under plans_size.
+    """
+
+    # (serializer class, field names) -> (plan, links)
+    plans = OrderedDict()
+    plans_size = 100
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer_context = renderer_context or {}
+        try:
+            wrapper = self.wrap_instances(data, renderer_context)
+        except WrapperNotApplicable:
+            return super(CachedJsonApiRenderer, self).render(
+                data, accepted_media_type, renderer_context)
+        renderer_context['indent'] = 4
+        return JSONRenderer.render(
+            self, wrapper, accepted_media_type, renderer_context)
+
+    def wrap_instances(self, data, renderer_context):
+        """Convert serialized instances to JSON API using the plan."""
+        request = renderer_context.get('request', None)
+        response = renderer_context.get('response', None)
+        view = renderer_context.get('view', None)
+        if not (request and request.method == 'GET'):
+            raise WrapperNotApplicable('Request method must be GET.')
+        if not (response and response.status_code == 200):
+            raise WrapperNotApplicable('Status code must be 200.')
+        if getattr(view, 'action', None) not in ('list', 'retrieve'):
+            raise WrapperNotApplicable('Must be a list or detail view.')
+
+        pagination = None
+        if isinstance(data, ReturnDict):
+            many = False
+            resources = [data]
+            serializer = data.serializer
+        elif isinstance(data, ReturnList):
+            many = True
+            resources = data
+            serializer = data.serializer.child
+        elif isinstance(data, dict) and isinstance(
+                data.get('results'), ReturnList):
+            many = True
+            resources = data['results']
+            serializer = resources.serializer.child
+            pagination = self.dict_class()
+            for key in ('previous', 'next', 'count'):
+                if key in data:
+                    pagination[key] = data[key]
+        else:
+            raise WrapperNotApplicable('Not serialized instances.')
+
+        resource_type = self.model_to_resource_type(
+            self.model_from_obj(view))
+        items = []
+        links = None
+        if resources:
+            plan, links = self.get_plan(
+                serializer, resources[0], resource_type, request)
+            for resource in resources:
+                items.append(self.convert_planned(resource, plan))
+
+        wrapper = self.dict_class()
+        wrapper[resource_type] = items if many else items[0]
+        if links:
+            wrapper['links'] = self.links_on_server(links, request)
+        if pagination is not None:
+            wrapper['meta'] = self.dict_class((
+                ('pagination', self.dict_class((
+                    (resource_type, pagination),))),))
+        return wrapper
+
+    def get_plan(self, serializer, resource, resource_type, request):
+        """Get the field conversions and link templates for a serializer.
+
+        The plan is a list of (field name, kind), where kind is 'id',
+        'attr', 'link', or 'links'.  The link templates are the same as
+        the generic renderer, using the first resource, but with paths
+        instead of URLs.
+        """
+        fields = serializer.fields
+        key = (type(serializer), tuple(fields.keys()))
+        cached = self.plans.pop(key, None)
+        if cached:
+            self.plans[key] = cached
+            return cached
+
+        plan = []
+        links = self.dict_class()
+        for field_name, field in fields.items():
+            if field_name == 'id':
+                kind = 'id'
+            elif field_name in self.convert_by_name:
+                raise WrapperNotApplicable(
+                    'Field "%s" needs conversion.' % field_name)
+            elif isinstance(getattr(
+                    field, 'child_relation', field), HyperlinkedRelatedField):
+                raise WrapperNotApplicable(
+                    'Field "%s" is a hyperlink.' % field_name)
+            elif isinstance(field, ManyRelatedField):
+                kind = 'links'
+            elif isinstance(field, BaseSerializer):
+                raise WrapperNotApplicable(
+                    'Field "%s" is a serializer.' % field_name)
+            elif isinstance(field, RelatedField):
+                kind = 'link'
+            else:
+                kind = 'attr'
+            if kind in ('link', 'links'):
+                converted = self.handle_related_field(
+                    resource, field, field_name, request)
+                links.update(converted['links'])
+            plan.append((field_name, kind))
+        links = self.prepend_links_with_name(links, resource_type)
+        server = self.server_url(request)
+        for link in links.values():
+            link['href'] = link['href'][len(server):]
+        self.plans[key] = (plan, links)
+        while len(self.plans) > self.plans_size:
+            self.plans.popitem(last=False)
+        return plan, links
+
+    def server_url(self, request):
+        """Get the scheme and server of link templates for a request."""
+        parsed_url = urlparse(request.build_absolute_uri())
+        return urlunparse(
+            [parsed_url.scheme, parsed_url.netloc, '', '', '', ''])
+
+    def links_on_server(self, links, request):
+        """Convert planned link templates to URLs for a request."""
+        server = self.server_url(request)
+        converted = self.dict_class()
+        for name, link in links.items():
+            converted[name] = self.dict_class(link)
+            converted[name]['href'] = server + link['href']
+        return converted
+
+    def convert_planned(self, resource, plan):
+        """Convert a serialized instance to a JSON API resource."""
+        force_text = encoding.force_text
+        item = self.dict_class()
+        linked_ids = self.dict_class()
+        for field_name, kind in plan:
+            value = resource[field_name]
+            if kind == 'attr':
+                item[field_name] = value
+            elif kind == 'id':
+                item[field_name] = force_text(value)
+            elif kind == 'links':
+                linked_ids[field_name] = [force_text(pk) for pk in value]
+            elif value is None:
+                linked_ids[field_name] = None
+            else:
+                linked_ids[field_name] = force_text(value)
+        if linked_ids:
+            item['links'] = linked_ids
+        return item
+
+
 class JsonApiTemplateHTMLRenderer(TemplateHTMLRenderer):
     """Render to a template, but use JSON API format as context."""
 
     def render(self, data, accepted_media_type=None, renderer_context=None):
         """Generate JSON API representation, as well as collection."""
         # Set the context to the JSON API represention
-        json_api_renderer = JsonApiRenderer()
-        json_api = json_api_renderer.render(
-            data, accepted_media_type, renderer_context)
-        context = loads(
-            json_api.decode('utf-8'), object_pairs_hook=OrderedDict)
+        context = JsonApiRenderer().get_wrapper(data, renderer_context)
 
         # Copy main item to generic 'data' key
         other_keys = ('linked', 'links', 'meta')
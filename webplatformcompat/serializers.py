@@ -7,6 +7,7 @@ from django.contrib.auth.models import User
 from rest_framework.serializers import (
     CurrentUserDefault, DateTimeField, IntegerField,
     ModelSerializer, SerializerMethodField, ValidationError)
+from rest_framework_json_api.utils import snakecase
 from sortedm2m.fields import SortedManyToManyField
 
 from . import fields
@@ -50,6 +51,42 @@ class WriteRestrictedMixin(object):
         return fields
 
 
+class SparseFieldsMixin(object):
+    """Limit the fields of list and detail GETs to the requested fields.
+
+    A request can select the fields of a resource type with a JSON API
+    sparse fieldset, such as ?fields[browsers]=slug,versions.  The ID is
+    always included.  Omitted fields are not serialized, so related data,
+    such as the history PKs, are not loaded.
+
+    A view with sparse_fieldsets set to False returns all the fields, for
+    the main serializer and the serializers nested in it.
+    """
+
+    def get_fields(self):
+        fields = super(SparseFieldsMixin, self).get_fields()
+        view = self.context.get('view', None)
+        request = self.context.get('request', None)
+        if not (request and view and view.action in ('list', 'retrieve') and
+                getattr(view, 'sparse_fieldsets', True)):
+            return fields
+
+        resource_type = snakecase(self.Meta.model._meta.verbose_name_plural)
+        param = 'fields[%s]' % resource_type
+        if param not in request.query_params:
+            return fields
+        requested = [
+            name for name in request.query_params[param].split(',') if name]
+        unknown = [name for name in requested if name not in fields]
+        if unknown:
+            raise ValidationError({param: [
+                'Unknown field "%s".' % name for name in unknown]})
+        for field_name in list(fields.keys()):
+            if field_name != 'id' and field_name not in requested:
+                del fields[field_name]
+        return fields
+
+
 class FieldMapMixin(object):
     """Automatically handle fields used by this project"""
     serializer_field_mapping = ModelSerializer.serializer_field_mapping
@@ -71,7 +108,8 @@ class FieldMapMixin(object):
 
 
 class HistoricalModelSerializer(
-        WriteRestrictedMixin, FieldMapMixin, ModelSerializer):
+        SparseFieldsMixin, WriteRestrictedMixin, FieldMapMixin,
+        ModelSerializer):
     """Model serializer with history manager"""
 
     def build_property_field(self, field_name, model_class):
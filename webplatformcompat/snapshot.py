@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""Precomputed snapshot of all the resources"""
+from gzip import GzipFile
+from io import BytesIO
+from json import dumps, loads
+from os import chmod, fdopen, path, remove, rename
+from tempfile import mkstemp
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.utils.dateparse import parse_datetime
+
+from .cache import Cache
+from .history import Changeset
+from .renderers import JsonApiRenderer
+
+# File describing the current snapshot
+snapshot_index_name = 'snapshot.json'
+
+# Cache keys to allow one snapshot write at a time, and to request another
+# write when the current one is done
+snapshot_lock_key = 'snapshot_lock'
+snapshot_pending_key = 'snapshot_pending'
+
+# Seconds a snapshot write may hold the lock
+snapshot_lock_timeout = 10 * 60
+
+
+class SnapshotRenderer(JsonApiRenderer):
+    """Convert instances to JSON API resources outside of a request."""
+
+    def url_to_template(self, view_name, request, template_name):
+        """Link templates are not included in the snapshot."""
+        return ''
+
+
+def snapshot_storage():
+    """Get the storage for snapshots, or None if disabled."""
+    location = getattr(settings, 'SNAPSHOT_ROOT', None)
+    if location:
+        return FileSystemStorage(location=location)
+    return None
+
+
+def get_snapshot_index(storage):
+    """Get the description of the current snapshot, or None."""
+    if not storage.exists(snapshot_index_name):
+        return None
+    with storage.open(snapshot_index_name) as index_file:
+        return loads(index_file.read().decode('utf-8'))
+
+
+def resource_views():
+    """Get a view for each resource type, to convert instances."""
+    from .routers import router
+    views = []
+    for prefix, viewset, basename in router.registry:
+        if router.view_groups[prefix] == 'resources':
+            views.append(viewset(
+                request=None, format_kwarg=None, action='export', kwargs={},
+                export_renderer_class=SnapshotRenderer))
+    return views
+
+
+def export_all(view):
+    """Get all the instances of a view's model as JSON API resources."""
+    queryset = view.get_queryset().order_by('id')
+    renderer_context = {'view': view, 'request': None}
+    resources = []
+    for pks in view.export_chunks(queryset):
+        resources.extend(
+            view.export_resources(queryset, pks, renderer_context))
+    return resources
+
+
+def changed_pks(views, changesets):
+    """Get the primary keys of instances changed by the changesets.
+
+    Return is a dictionary of model name to a set of primary keys.  This
+    includes instances with historical records in the changesets, and the
+    instances whose representation includes them, such as the feature of a
+    new support.
+    """
+    cache = Cache()
+    changed = {}
+    for view in views:
+        model = view.get_queryset().model
+        model_name = model.__name__
+        invalidator = cache.model_function(
+            model_name, cache.default_version, 'invalidator')
+        records = model.history.model.objects.filter(
+            history_changeset__in=changesets)
+        for record in records:
+            changed.setdefault(model_name, set()).add(record.id)
+            for upstream in invalidator(record.instance):
+                if not isinstance(upstream, str):
+                    other_name, other_pk, immediate = upstream
+                    changed.setdefault(other_name, set()).add(other_pk)
+    return changed
+
+
+def update_resources(data, views, changesets):
+    """Update the resources changed by the changesets.
+
+    The changed instances are refreshed in the instance cache first, since
+    the cache may not have been updated yet.
+    """
+    changed = changed_pks(views, changesets)
+    Cache().update_instances([
+        (model_name, pk, None)
+        for model_name, pks in changed.items() for pk in pks])
+    for view in views:
+        queryset = view.get_queryset()
+        pks = sorted(changed.get(queryset.model.__name__, []))
+        if not pks:
+            continue
+        resource_type = view.export_resource_type()
+        by_id = dict(
+            (resource['id'], resource)
+            for resource in data.get(resource_type, []))
+        for pk in pks:
+            by_id.pop(str(pk), None)
+        existing = list(
+            queryset.filter(pk__in=pks).order_by('id').values_list(
+                'pk', flat=True))
+        renderer_context = {'view': view, 'request': None}
+        size = view.export_chunk_size
+        for start in range(0, len(existing), size):
+            chunk = existing[start:start + size]
+            for resource in view.export_resources(
+                    queryset, chunk, renderer_context):
+                by_id[resource['id']] = resource
+        data[resource_type] = sorted(
+            by_id.values(), key=lambda resource: int(resource['id']))
+
+
+def write_snapshot():
+    """Update the snapshot to the most recently closed changeset.
+
+    If there is a current snapshot, only the resources changed by the
+    changesets closed since are updated.  Otherwise, all the resources are
+    loaded from the instance cache.
+
+    Return is the new snapshot index, or None if disabled or current.
+    """
+    storage = snapshot_storage()
+    if storage is None:
+        return None
+    latest = Changeset.objects.filter(closed=True).order_by(
+        '-modified', '-id').first()
+    if latest is None:
+        return None
+    index = get_snapshot_index(storage)
+    modified = latest.modified.isoformat()
+    if (index and index['changeset'] == latest.id and
+            index['modified'] == modified):
+        return None
+
+    views = resource_views()
+    if index and storage.exists(index['name']):
+        with storage.open(index['name']) as snapshot_file:
+            with GzipFile(fileobj=snapshot_file) as gzip_file:
+                data = loads(gzip_file.read().decode('utf-8'))
+        data.pop('meta', None)
+        changesets = Changeset.objects.filter(
+            closed=True, modified__gt=parse_datetime(index['modified']))
+        update_resources(data, views, changesets)
+    else:
+        data = {}
+        for view in views:
+            data[view.export_resource_type()] = export_all(view)
+
+    data['meta'] = {'snapshot': {'changeset': latest.id, 'modified': modified}}
+    content = BytesIO()
+    with GzipFile(fileobj=content, mode='wb') as gzip_file:
+        gzip_file.write(dumps(
+            data, cls=JsonApiRenderer.encoder_class).encode('utf-8'))
+    name = storage.save(
+        'snapshot-%d.json.gz' % latest.id, ContentFile(content.getvalue()))
+
+    new_index = {
+        'changeset': latest.id,
+        'modified': modified,
+        'name': name,
+        'size': storage.size(name),
+    }
+    replace_snapshot_index(storage, new_index)
+    if index and index['name'] != name and storage.exists(index['name']):
+        storage.delete(index['name'])
+    return new_index
+
+
+def replace_snapshot_index(storage, index):
+    """Replace the snapshot index in one step.
+
+    The index is written to a temporary file, which is renamed over the old
+    index, so that readers always find a complete index.
+    """
+    index_path = storage.path(snapshot_index_name)
+    handle, temp_path = mkstemp(
+        dir=path.dirname(index_path), prefix='.snapshot-', suffix='.tmp')
+    try:
+        with fdopen(handle, 'wb') as temp_file:
+            temp_file.write(dumps(index).encode('utf-8'))
+        chmod(temp_path, storage.file_permissions_mode or 0o644)
+        rename(temp_path, index_path)
+    except Exception:
+        remove(temp_path)
+        raise
+
+
+def write_latest_snapshot():
+    """Write the snapshot, one process at a time, until it is current.
+
+    If another process is writing a snapshot, it is asked to check for
+    closed changesets again when done, and this returns None.  Changesets
+    closed during a write are combined into the next write.
+
+    Return is the last new snapshot index, or None.
+    """
+    index = None
+    while True:
+        if not cache.add(snapshot_lock_key, True, snapshot_lock_timeout):
+            cache.set(snapshot_pending_key, True, snapshot_lock_timeout)
+            if cache.get(snapshot_lock_key):
+                # The writer will see the request when done
+                return index
+            continue
+        try:
+            cache.delete(snapshot_pending_key)
+            index = write_snapshot() or index
+        finally:
+            cache.delete(snapshot_lock_key)
+        if not cache.get(snapshot_pending_key):
+            return index
@@ -1,8 +1,13 @@
+from logging import getLogger
+from time import time
+
 from celery import shared_task
 from django.conf import settings
 
 from .cache import Cache
 
+logger = getLogger('webplatformcompat.tasks')
+
 
 @shared_task(ignore_result=True)
 def update_cache_for_instance(
@@ -11,9 +16,62 @@ def update_cache_for_instance(
     cache = Cache()
     invalid = cache.update_instance(
         model_name, instance_pk, instance, version, update_only=update_only)
+    if invalid:
+        DRF_INSTANCE_CACHE_POPULATE_COLD = getattr(
+            settings, 'DRF_INSTANCE_CACHE_POPULATE_COLD', True)
+        update_cache_for_instances.delay(
+            invalid, update_only=not DRF_INSTANCE_CACHE_POPULATE_COLD)
+
+
+@shared_task(ignore_result=True)
+def update_cache_for_instances(object_specs, update_only=True):
+    """Update cached instances, and the instances they invalidate.
+
+    Keyword arguments:
+    object_specs - A list of (model name, pk, version) to update
+    update_only - If True, only update instances already in the cache
+
+    The invalidation cascade is processed in rounds.  Each (model name, pk,
+    version) is updated at most once, and each round is loaded in bulk.
+    Follow-on invalidations use DRF_INSTANCE_CACHE_POPULATE_COLD.
+    """
     DRF_INSTANCE_CACHE_POPULATE_COLD = getattr(
         settings, 'DRF_INSTANCE_CACHE_POPULATE_COLD', True)
-    for invalid_name, invalid_pk, invalid_version in invalid:
-        update_cache_for_instance.delay(
-            invalid_name, invalid_pk, version=invalid_version,
-            update_only=not DRF_INSTANCE_CACHE_POPULATE_COLD)
+    cache = Cache()
+    start = time()
+    seen = set()
+    pending = []
+    requested = 0
+    max_depth = 0
+    rounds = 0
+    while object_specs:
+        for model_name, pk, version in object_specs:
+            requested += 1
+            spec = (model_name, pk, version)
+            if spec not in seen:
+                seen.add(spec)
+                pending.append(spec)
+        if not pending:
+            break
+        rounds += 1
+        max_depth = max(max_depth, len(pending))
+        object_specs = cache.update_instances(
+            pending, update_only=update_only)
+        pending = []
+        update_only = not DRF_INSTANCE_CACHE_POPULATE_COLD
+    logger.info(
+        'Updated %d cached instances (%d requested, max queue depth %d,'
+        ' %d rounds) in %0.3fs', len(seen), requested, max_depth, rounds,
+        time() - start)
+
+
+@shared_task(ignore_result=True)
+def update_snapshot():
+    """Update the snapshot of all resources to the last closed changeset."""
+    from .snapshot import write_latest_snapshot
+    start = time()
+    index = write_latest_snapshot()
+    if index:
+        logger.info(
+            'Wrote snapshot %s (%d bytes) for changeset %d in %0.3fs',
+            index['name'], index['size'], index['changeset'], time() - start)
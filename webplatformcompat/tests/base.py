@@ -6,6 +6,7 @@ from django.utils import encoding, six
 
 from rest_framework.test import APITestCase as BaseAPITestCase
 
+from webplatformcompat.cache import local_cache
 from webplatformcompat.history import Changeset
 
 
@@ -16,6 +17,7 @@ class TestMixin(object):
 
     def tearDown(self):
         cache.clear()
+        local_cache.clear()
 
     def reverse(self, viewname, **kwargs):
         """Create a full URL for a view"""
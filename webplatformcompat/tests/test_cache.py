@@ -1,13 +1,19 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 """Tests for `web-platform-compat` fields module."""
+from collections import OrderedDict
 from datetime import datetime
+from threading import Thread
 from pytz import UTC
+import json
 
 from django.contrib.auth.models import User
 from django.test.utils import override_settings
+import mock
 
-from webplatformcompat.cache import Cache
+from webplatformcompat.cache import (
+    Cache, CacheStatsMiddleware, FeatureDescendantPKs, HistoryPKs,
+    cache_stats, get_request_cache_stats, local_cache, local_cache_state)
 from webplatformcompat.history import Changeset
 from webplatformcompat.models import (
     Browser, Feature, Maturity, Section, Specification, Support, Version)
@@ -28,10 +34,12 @@ class TestCache(TestCase):
             'slug': u'',
             'name': {},
             'note': {},
-            'history:PKList': {
+            'history:HistoryPKList': {
                 'app': u'webplatformcompat',
                 'model': 'historicalbrowser',
-                'pks': [browser.history.all()[0].pk],
+                'pk': browser.pk,
+                'current': browser.history.all()[0].pk,
+                'count': 1,
             },
             'history_current:PK': {
                 'app': u'webplatformcompat',
@@ -51,7 +59,7 @@ class TestCache(TestCase):
 
     def test_browser_v1_loader(self):
         browser = self.create(Browser)
-        with self.assertNumQueries(3):
+        with self.assertNumQueries(4):
             obj = self.cache.browser_v1_loader(browser.pk)
         with self.assertNumQueries(0):
             serialized = self.cache.browser_v1_serializer(obj)
@@ -63,7 +71,9 @@ class TestCache(TestCase):
 
     def test_browser_v1_invalidator(self):
         browser = self.create(Browser)
-        self.assertEqual([], self.cache.browser_v1_invalidator(browser))
+        expected = ['drfc_ViewFeatureMeta_generation']
+        self.assertEqual(
+            expected, self.cache.browser_v1_invalidator(browser))
 
     def test_changeset_v1_serializer(self):
         created = datetime(2014, 10, 29, 8, 57, 21, 806744, UTC)
@@ -155,6 +165,9 @@ class TestCache(TestCase):
             'obsolete': False,
             'name': {"en": "A Name"},
             'descendant_count': 0,
+            'tree_id': feature.tree_id,
+            'lft': 1,
+            'rght': 2,
             'supports:PKList': {
                 'app': u'webplatformcompat',
                 'model': 'support',
@@ -180,10 +193,12 @@ class TestCache(TestCase):
                 'model': 'feature',
                 'pks': [],
             },
-            'history:PKList': {
+            'history:HistoryPKList': {
                 'app': u'webplatformcompat',
                 'model': 'historicalfeature',
-                'pks': [feature.history.all()[0].pk],
+                'pk': feature.pk,
+                'current': feature.history.all()[0].pk,
+                'count': 1,
             },
             'history_current:PK': {
                 'app': u'webplatformcompat',
@@ -235,7 +250,7 @@ class TestCache(TestCase):
 
     def test_feature_v1_loader(self):
         feature = self.create(Feature)
-        with self.assertNumQueries(5):
+        with self.assertNumQueries(6):
             obj = self.cache.feature_v1_loader(feature.pk)
         with self.assertNumQueries(0):
             serialized = self.cache.feature_v1_serializer(obj)
@@ -247,12 +262,38 @@ class TestCache(TestCase):
 
     def test_feature_v1_invalidator_basic(self):
         feature = self.create(Feature)
-        self.assertEqual([], self.cache.feature_v1_invalidator(feature))
+        expected = ['drfc_v1_ViewFeatureMeta_%s_1' % feature.id]
+        self.assertEqual(
+            expected, self.cache.feature_v1_invalidator(feature))
 
     def test_feature_v1_invalidator_with_relation(self):
         parent = self.create(Feature, slug='parent')
         feature = self.create(Feature, slug='child', parent=parent)
-        expected = [('Feature', parent.id, False)]
+        expected = [
+            ('Feature', parent.id, False),
+            'drfc_v1_ViewFeatureMeta_%s_1' % parent.id,
+            'drfc_v1_ViewFeatureMeta_%s_1' % feature.id,
+        ]
+        self.assertEqual(expected, self.cache.feature_v1_invalidator(feature))
+
+    @override_settings(PAGINATE_VIEW_FEATURE=2)
+    def test_feature_v1_invalidator_paginated(self):
+        parent = self.create(Feature, slug='parent')
+        feature = self.create(Feature, slug='child', parent=parent)
+        self.create(Feature, slug='child2', parent=parent)
+        self.create(Feature, slug='child3', parent=parent)
+        parent = Feature.objects.get(id=parent.id)
+        feature = Feature.objects.get(id=feature.id)
+        expected = [
+            ('Feature', parent.id, False),
+            'drfc_v1_ViewFeatureMeta_%s_1' % parent.id,
+            'drfc_v1_ViewFeatureMeta_%s_2' % parent.id,
+            'drfc_v1_ViewFeatureMeta_%s_1' % feature.id,
+            'drfc_v1_FeatureDescendants_%s_%s_1_8_0' % (
+                parent.id, parent.tree_id),
+            'drfc_v1_FeatureDescendants_%s_%s_1_8_1' % (
+                parent.id, parent.tree_id),
+        ]
         self.assertEqual(expected, self.cache.feature_v1_invalidator(feature))
 
     def test_maturity_v1_serializer(self):
@@ -268,10 +309,12 @@ class TestCache(TestCase):
                 'model': 'specification',
                 'pks': [],
             },
-            'history:PKList': {
+            'history:HistoryPKList': {
                 'app': u'webplatformcompat',
                 'model': 'historicalmaturity',
-                'pks': [maturity.history.all()[0].pk],
+                'pk': maturity.pk,
+                'current': maturity.history.all()[0].pk,
+                'count': 1,
             },
             'history_current:PK': {
                 'app': u'webplatformcompat',
@@ -286,7 +329,7 @@ class TestCache(TestCase):
 
     def test_maturity_v1_loader(self):
         maturity = self.create(Maturity)
-        with self.assertNumQueries(3):
+        with self.assertNumQueries(4):
             obj = self.cache.maturity_v1_loader(maturity.pk)
         with self.assertNumQueries(0):
             serialized = self.cache.maturity_v1_serializer(obj)
@@ -298,7 +341,9 @@ class TestCache(TestCase):
 
     def test_maturity_v1_invalidator(self):
         maturity = self.create(Maturity)
-        self.assertEqual([], self.cache.maturity_v1_invalidator(maturity))
+        expected = ['drfc_ViewFeatureMeta_generation']
+        self.assertEqual(
+            expected, self.cache.maturity_v1_invalidator(maturity))
 
     def test_section_v1_serializer(self):
         maturity = self.create(
@@ -330,10 +375,12 @@ class TestCache(TestCase):
                 'model': 'feature',
                 'pks': [],
             },
-            'history:PKList': {
+            'history:HistoryPKList': {
                 'app': u'webplatformcompat',
                 'model': 'historicalsection',
-                'pks': [section.history.all()[0].pk],
+                'pk': section.pk,
+                'current': section.history.all()[0].pk,
+                'count': 1,
             },
             'history_current:PK': {
                 'app': u'webplatformcompat',
@@ -359,7 +406,7 @@ class TestCache(TestCase):
         section = self.create(
             Section, specification=spec,
             name={'en': ''}, note={'en': 'Non standard'})
-        with self.assertNumQueries(3):
+        with self.assertNumQueries(4):
             obj = self.cache.section_v1_loader(section.pk)
         with self.assertNumQueries(0):
             serialized = self.cache.section_v1_serializer(obj)
@@ -379,9 +426,12 @@ class TestCache(TestCase):
         section = self.create(
             Section, specification=spec,
             name={'en': 'A section'}, subpath={'en': '#section'})
+        expected = [
+            ('Specification', spec.pk, False),
+            'drfc_ViewFeatureMeta_generation',
+        ]
         self.assertEqual(
-            [('Specification', spec.pk, False)],
-            self.cache.section_v1_invalidator(section))
+            expected, self.cache.section_v1_invalidator(section))
 
     def test_specification_v1_serializer(self):
         maturity = self.create(
@@ -409,10 +459,12 @@ class TestCache(TestCase):
                 'model': 'maturity',
                 'pk': maturity.pk,
             },
-            'history:PKList': {
+            'history:HistoryPKList': {
                 'app': u'webplatformcompat',
                 'model': 'historicalspecification',
-                'pks': [history.pk],
+                'pk': spec.pk,
+                'current': history.pk,
+                'count': 1,
             },
             'history_current:PK': {
                 'app': u'webplatformcompat',
@@ -434,7 +486,7 @@ class TestCache(TestCase):
             uri={'en': (
                 'https://dvcs.w3.org/hg/push/raw-file/default/index.html')}
         )
-        with self.assertNumQueries(3):
+        with self.assertNumQueries(4):
             obj = self.cache.specification_v1_loader(spec.pk)
         with self.assertNumQueries(0):
             serialized = self.cache.specification_v1_serializer(obj)
@@ -451,9 +503,12 @@ class TestCache(TestCase):
             Specification, slug='spec', maturity=maturity,
             name={'en': 'Spec'},
             uri={'en': 'http://example.com/spec.html'})
+        expected = [
+            ('Maturity', maturity.pk, False),
+            'drfc_ViewFeatureMeta_generation',
+        ]
         self.assertEqual(
-            [('Maturity', maturity.pk, False)],
-            self.cache.specification_v1_invalidator(spec))
+            expected, self.cache.specification_v1_invalidator(spec))
 
     def test_support_v1_serializer(self):
         browser = self.create(Browser)
@@ -482,10 +537,12 @@ class TestCache(TestCase):
                 'model': 'feature',
                 'pk': feature.id,
             },
-            'history:PKList': {
+            'history:HistoryPKList': {
                 'app': u'webplatformcompat',
                 'model': 'historicalsupport',
-                'pks': [support.history.all()[0].pk],
+                'pk': support.pk,
+                'current': support.history.all()[0].pk,
+                'count': 1,
             },
             'history_current:PK': {
                 'app': u'webplatformcompat',
@@ -503,7 +560,7 @@ class TestCache(TestCase):
         version = self.create(Version, browser=browser, version='1.0')
         feature = self.create(Feature, slug='feature')
         support = self.create(Support, version=version, feature=feature)
-        with self.assertNumQueries(2):
+        with self.assertNumQueries(3):
             obj = self.cache.support_v1_loader(support.pk)
         with self.assertNumQueries(0):
             serialized = self.cache.support_v1_serializer(obj)
@@ -521,6 +578,7 @@ class TestCache(TestCase):
         expected = [
             ('Version', version.id, True),
             ('Feature', feature.id, True),
+            'drfc_v1_ViewFeatureMeta_%s_1' % feature.id,
         ]
         self.assertEqual(expected, self.cache.support_v1_invalidator(support))
 
@@ -547,10 +605,12 @@ class TestCache(TestCase):
                 'model': 'support',
                 'pks': [],
             },
-            'history:PKList': {
+            'history:HistoryPKList': {
                 'app': u'webplatformcompat',
                 'model': 'historicalversion',
-                'pks': [version.history.all()[0].pk],
+                'pk': version.pk,
+                'current': version.history.all()[0].pk,
+                'count': 1,
             },
             'history_current:PK': {
                 'app': u'webplatformcompat',
@@ -566,7 +626,7 @@ class TestCache(TestCase):
     def test_version_v1_loader(self):
         browser = self.create(Browser)
         version = self.create(Version, browser=browser)
-        with self.assertNumQueries(3):
+        with self.assertNumQueries(4):
             obj = self.cache.version_v1_loader(version.pk)
         with self.assertNumQueries(0):
             serialized = self.cache.version_v1_serializer(obj)
@@ -579,7 +639,10 @@ class TestCache(TestCase):
     def test_version_v1_invalidator(self):
         browser = self.create(Browser)
         version = self.create(Version, browser=browser)
-        expected = [('Browser', browser.id, True)]
+        expected = [
+            ('Browser', browser.id, True),
+            'drfc_ViewFeatureMeta_generation',
+        ]
         self.assertEqual(expected, self.cache.version_v1_invalidator(version))
 
     def test_user_v1_serializer(self):
@@ -624,3 +687,826 @@ class TestCache(TestCase):
     def test_user_v1_invalidator(self):
         user = self.create(User)
         self.assertEqual([], self.cache.user_v1_invalidator(user))
+
+
+class TestCacheBulkLoad(TestCase):
+    def setUp(self):
+        self.cache = Cache()
+        self.login_user(groups=['change-resource'])
+        self.maturity = self.create(
+            Maturity, slug='WD', name={'en': 'Working Draft'})
+        self.spec = self.create(
+            Specification, slug='spec', mdn_key='Spec',
+            maturity=self.maturity, name={'en': 'Spec'},
+            uri={'en': 'http://example.com/spec.html'})
+        self.section1 = self.create(
+            Section, specification=self.spec, name={'en': 'Section 1'})
+        self.section2 = self.create(
+            Section, specification=self.spec, name={'en': 'Section 2'})
+        self.browser = self.create(Browser, slug='browser')
+        self.version1 = self.create(
+            Version, browser=self.browser, version='1.0')
+        self.version2 = self.create(
+            Version, browser=self.browser, version='2.0')
+        self.parent = self.create(Feature, slug='parent')
+        self.child1 = self.create(
+            Feature, slug='child1', parent=self.parent)
+        self.child2 = self.create(
+            Feature, slug='child2', parent=self.parent)
+        self.grandchild = self.create(
+            Feature, slug='grandchild', parent=self.child1)
+        self.parent.sections.add(self.section2, self.section1)
+        self.child1.sections.add(self.section1)
+        self.support1 = self.create(
+            Support, version=self.version1, feature=self.parent)
+        self.support2 = self.create(
+            Support, version=self.version2, feature=self.parent)
+        self.support3 = self.create(
+            Support, version=self.version1, feature=self.child1)
+
+    def assert_bulk_matches_single(self, model_name, pks):
+        """Assert bulk loading matches loading instances one by one."""
+        version = 'v1'
+        loader = self.cache.model_function(model_name, version, 'loader')
+        serializer = self.cache.model_function(
+            model_name, version, 'serializer')
+        expected = dict((pk, serializer(loader(pk))) for pk in pks)
+        loaded = self.cache.bulk_load(model_name, version, pks)
+        with self.assertNumQueries(0):
+            actual = dict(
+                (pk, serializer(obj)) for pk, obj in loaded.items())
+        self.assertEqual(expected, actual)
+
+    def test_warm_instances(self):
+        self.cache.cache.clear()
+        pks = [self.support1.pk, self.support2.pk, 666]
+        count, size = self.cache.warm_instances('Support', pks)
+        self.assertEqual(2, count)
+        key = self.cache.key_for('v1', 'Support', self.support1.pk)
+        cached = self.cache.cache.get(key)
+        self.assertEqual(
+            self.support1.pk, self.cache.decode_instance(cached)['id'])
+        self.assertTrue(size > len(cached))
+        with self.assertNumQueries(0):
+            self.cache.get_instances([('Support', self.support1.pk, None)])
+
+    def test_browser_v1_bulk_loader(self):
+        other = self.create(Browser, slug='other')
+        self.create(Version, browser=other, version='1.0')
+        self.assert_bulk_matches_single('Browser', [self.browser.pk, other.pk])
+
+    def test_changeset_v1_bulk_loader(self):
+        other = self.create(Changeset, user=self.user)
+        self.assert_bulk_matches_single(
+            'Changeset', [self.changeset.pk, other.pk])
+
+    def test_feature_v1_bulk_loader(self):
+        pks = [
+            self.parent.pk, self.child1.pk, self.child2.pk,
+            self.grandchild.pk]
+        self.assert_bulk_matches_single('Feature', pks)
+
+    def test_feature_v1_bulk_loader_section_order(self):
+        # Sort the first added section last, against the row order
+        Feature.sections.through.objects.filter(
+            feature=self.parent, section=self.section2).update(sort_value=10)
+        loaded = self.cache.bulk_load('Feature', 'v1', [self.parent.pk])
+        self.assertEqual(
+            [self.section1.pk, self.section2.pk],
+            loaded[self.parent.pk]._section_pks)
+        self.assert_bulk_matches_single('Feature', [self.parent.pk])
+
+    @override_settings(PAGINATE_VIEW_FEATURE=2)
+    def test_feature_v1_bulk_loader_paginated_descendants(self):
+        pks = [self.parent.pk, self.child1.pk]
+        self.assert_bulk_matches_single('Feature', pks)
+
+    def test_maturity_v1_bulk_loader(self):
+        self.assert_bulk_matches_single('Maturity', [self.maturity.pk])
+
+    def test_section_v1_bulk_loader(self):
+        self.assert_bulk_matches_single(
+            'Section', [self.section1.pk, self.section2.pk])
+
+    def test_specification_v1_bulk_loader(self):
+        self.assert_bulk_matches_single('Specification', [self.spec.pk])
+
+    def test_support_v1_bulk_loader(self):
+        self.assert_bulk_matches_single(
+            'Support', [self.support1.pk, self.support2.pk, self.support3.pk])
+
+    def test_version_v1_bulk_loader(self):
+        self.assert_bulk_matches_single(
+            'Version', [self.version1.pk, self.version2.pk])
+
+    def test_user_v1_bulk_loader(self):
+        self.assert_bulk_matches_single('User', [self.user.pk])
+
+    def test_bulk_load_missing_and_string_pks(self):
+        loaded = self.cache.bulk_load(
+            'Support', 'v1', [str(self.support1.pk), 666])
+        self.assertEqual([str(self.support1.pk)], list(loaded.keys()))
+        self.assertEqual(self.support1, loaded[str(self.support1.pk)])
+
+    def test_bulk_load_in_chunks(self):
+        self.cache.bulk_load_size = 2
+        pks = [self.support1.pk, self.support2.pk, self.support3.pk]
+        with self.assertNumQueries(6):
+            loaded = self.cache.bulk_load('Support', 'v1', pks)
+        self.assertEqual(set(pks), set(loaded.keys()))
+
+    def test_get_instances_cold_cache(self):
+        pks = [self.support1.pk, self.support2.pk, self.support3.pk]
+        specs = [('Support', pk, None) for pk in pks]
+        with self.assertNumQueries(3):
+            instances = self.cache.get_instances(specs)
+        self.assertEqual(
+            set(('Support', pk) for pk in pks), set(instances.keys()))
+        with self.assertNumQueries(0):
+            cached = self.cache.get_instances(specs)
+        self.assertEqual(set(instances.keys()), set(cached.keys()))
+
+    def test_get_instances_missing(self):
+        instances = self.cache.get_instances([('Support', 666, None)])
+        self.assertEqual({}, instances)
+
+    def test_update_instances_update_only(self):
+        specs = [('Support', self.support1.pk, None)]
+        with self.assertNumQueries(0):
+            invalid = self.cache.update_instances(specs, update_only=True)
+        self.assertEqual([], invalid)
+
+    def test_update_instances(self):
+        pks = [self.support1.pk, self.support2.pk, self.support3.pk]
+        specs = [('Support', pk, None) for pk in pks]
+        self.cache.get_instances(specs)
+        Support.objects.filter(pk=self.support1.pk).update(support='no')
+        invalid = self.cache.update_instances(specs, update_only=True)
+        self.assertIn(('Feature', self.support1.feature_id, 'v1'), invalid)
+        instances = self.cache.get_instances(specs[:1])
+        support = instances[('Support', self.support1.pk)][0]
+        self.assertEqual('no', support['support'])
+
+
+@override_settings(PAGINATE_VIEW_FEATURE=2)
+class TestCacheFeatureDescendants(TestCase):
+    def setUp(self):
+        self.cache = Cache()
+        self.login_user(groups=['change-resource'])
+        self.parent = self.create(Feature, slug='parent')
+        self.children = [
+            self.create(Feature, slug='child%d' % num, parent=self.parent)
+            for num in range(5)]
+        self.parent = Feature.objects.get(pk=self.parent.pk)
+        self.pks = [child.pk for child in self.children]
+
+    def test_slices(self):
+        with self.assertNumQueries(1):
+            pks = self.cache.feature_descendant_pks(self.parent, 1, 4)
+        self.assertEqual(self.pks[1:4], pks)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.pks, self.cache.feature_descendant_pks(
+                    self.parent, 0, 5))
+            self.assertEqual(
+                self.pks[4:], self.cache.feature_descendant_pks(
+                    self.parent, 4, 6))
+
+    @override_settings(USE_DRF_INSTANCE_CACHE=False)
+    def test_cache_disabled(self):
+        cache = Cache()
+        self.assertEqual(
+            self.pks[2:4], cache.feature_descendant_pks(self.parent, 2, 4))
+
+    def test_new_descendant(self):
+        self.cache.feature_descendant_pks(self.parent, 0, 5)
+        child = self.create(Feature, slug='child5', parent=self.parent)
+        parent = Feature.objects.get(pk=self.parent.pk)
+        self.assertEqual(
+            self.pks + [child.pk],
+            self.cache.feature_descendant_pks(parent, 0, 6))
+
+    def test_lazy_list(self):
+        self.parent.descendant_count = 5
+        pks = FeatureDescendantPKs(self.cache, self.parent)
+        self.assertEqual(5, len(pks))
+        self.assertEqual(self.pks[2:4], pks[2:4])
+        self.assertEqual(self.pks[-1], pks[-1])
+        self.assertEqual(self.pks, list(pks))
+        self.assertRaises(IndexError, lambda: pks[5])
+
+
+class TestCacheHistory(TestCase):
+    def setUp(self):
+        self.cache = Cache()
+        self.cache.history_page_size = 2
+        self.login_user(groups=['change-resource'])
+        self.browser = self.create(Browser, slug='browser')
+        for num in range(4):
+            self.browser.slug = 'browser%d' % num
+            self.browser.save()
+        self.model = Browser.history.model
+        self.pks = list(
+            self.browser.history.all().values_list('history_id', flat=True))
+
+    def test_history_heads(self):
+        browser = Browser.objects.get(pk=self.browser.pk)
+        with self.assertNumQueries(2):
+            self.cache.bulk_add_history_heads(Browser, [browser])
+        self.assertEqual(self.pks[0], browser._history_current)
+        self.assertEqual(5, browser._history_count)
+
+    def test_slices(self):
+        with self.assertNumQueries(1):
+            pks = self.cache.history_pks(
+                self.model, self.browser.pk, 5, 1, 4)
+        self.assertEqual(self.pks[1:4], pks)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.pks, self.cache.history_pks(
+                    self.model, self.browser.pk, 5, 0, 5))
+
+    @override_settings(USE_DRF_INSTANCE_CACHE=False)
+    def test_cache_disabled(self):
+        cache = Cache()
+        self.assertEqual(
+            self.pks[2:4],
+            cache.history_pks(self.model, self.browser.pk, 5, 2, 4))
+
+    def test_new_history(self):
+        self.cache.history_pks(self.model, self.browser.pk, 5, 0, 5)
+        self.browser.slug = 'browser4'
+        self.browser.save()
+        pks = self.cache.history_pks(self.model, self.browser.pk, 6, 0, 6)
+        self.assertEqual(6, len(pks))
+        self.assertEqual(self.pks, pks[1:])
+
+    def test_lazy_list(self):
+        pks = HistoryPKs(self.cache, self.model, self.browser.pk, 666, 5)
+        self.assertEqual(5, len(pks))
+        with self.assertNumQueries(0):
+            self.assertEqual(666, pks[0])
+        self.assertEqual(self.pks[2:4], pks[2:4])
+        self.assertEqual(self.pks[-1], pks[-1])
+        self.assertRaises(IndexError, lambda: pks[5])
+
+    def test_cached_history_field(self):
+        spec = ('Browser', self.browser.pk, None)
+        obj_native = self.cache.get_instances([spec])[spec[:2]][0]
+        self.assertEqual(self.pks[0], obj_native['history_current'].pk)
+        self.assertEqual(
+            self.pks, list(obj_native['history'].values_list(
+                'history_id', flat=True)))
+
+    def test_group_loaded_together(self):
+        other = self.create(Browser, slug='other')
+        specs = [
+            ('Browser', self.browser.pk, None), ('Browser', other.pk, None)]
+
+        def histories():
+            instances = self.cache.get_instances(specs)
+            return [instances[spec[:2]][0]['history'] for spec in specs]
+
+        cold = histories()
+        with self.assertNumQueries(1):
+            pks = [
+                list(history.values_list('history_id', flat=True))
+                for history in cold]
+        self.assertEqual(self.pks, pks[0])
+        self.assertEqual([other.history.get().pk], pks[1])
+
+        warm = histories()
+        with mock.patch.object(
+                self.cache.cache, 'get_many',
+                wraps=self.cache.cache.get_many) as mock_get_many:
+            with self.assertNumQueries(0):
+                self.assertEqual(pks, [
+                    list(history.values_list('history_id', flat=True))
+                    for history in warm])
+        self.assertEqual(1, mock_get_many.call_count)
+
+
+class TestCacheKnownRelatedPKs(TestCase):
+    def setUp(self):
+        self.cache = Cache()
+        self.login_user(groups=['change-resource'])
+        self.browser = self.create(Browser, slug='browser')
+        self.version = self.create(
+            Version, browser=self.browser, version='1.0')
+
+    def test_created(self):
+        browser = self.create(Browser, slug='other')
+        with self.assertNumQueries(0):
+            self.cache.add_known_related_pks('Browser', browser, True)
+        self.assertEqual([], browser._version_pks)
+        self.assertEqual(1, browser._history_count)
+        self.assertEqual(
+            browser.history.all()[0].pk, browser._history_current)
+
+    def test_updated(self):
+        self.cache.get_instances([('Browser', self.browser.pk, None)])
+        browser = self.browser
+        browser.slug = 'new_slug'
+        browser._write_through_cache = True
+        browser.save()
+        with self.assertNumQueries(0):
+            self.cache.add_known_related_pks('Browser', browser, False)
+        self.assertEqual([self.version.pk], browser._version_pks)
+        self.assertEqual(2, browser._history_count)
+        with self.assertNumQueries(0):
+            obj_native = self.cache.browser_v1_serializer(browser)
+        self.assertEqual(
+            self.cache.browser_v1_serializer(
+                self.cache.browser_v1_loader(browser.pk)),
+            obj_native)
+
+    def test_updated_changed_field(self):
+        self.cache.get_instances([('Browser', self.browser.pk, None)])
+        browser = Browser.objects.get(pk=self.browser.pk)
+        self.cache.add_known_related_pks(
+            'Browser', browser, False, changed=['versions'])
+        self.assertFalse(hasattr(browser, '_version_pks'))
+
+    def test_updated_not_cached(self):
+        browser = Browser.objects.get(pk=self.browser.pk)
+        self.cache.add_known_related_pks('Browser', browser, False)
+        self.assertFalse(hasattr(browser, '_version_pks'))
+        self.assertFalse(hasattr(browser, '_history_current'))
+
+    def test_not_write_through_model(self):
+        self.cache.add_known_related_pks('User', self.user, True)
+        self.assertFalse(hasattr(self.user, '_history_current'))
+
+
+class TestCacheViewFeatureMeta(TestCase):
+    def setUp(self):
+        self.cache = Cache()
+        self.compat_table = OrderedDict((
+            ('supports', OrderedDict((('2', {}), ('1', {})))),
+            ('tabs', []),
+            ('languages', ['en']),
+            ('notes', OrderedDict((('5', 1), ('3', 2)))),
+        ))
+
+    def test_get_missing(self):
+        self.assertIsNone(self.cache.get_view_feature_meta(1, 1))
+
+    def test_set_and_get(self):
+        self.cache.set_view_feature_meta(1, 1, self.compat_table)
+        meta = self.cache.get_view_feature_meta(1, 1)
+        self.assertEqual(self.compat_table, meta)
+        self.assertEqual(['2', '1'], list(meta['supports'].keys()))
+        self.assertEqual(['5', '3'], list(meta['notes'].keys()))
+        self.assertIsNone(self.cache.get_view_feature_meta(1, 2))
+
+    def test_new_generation(self):
+        self.cache.set_view_feature_meta(1, 1, self.compat_table)
+        gen_key = self.cache.view_feature_meta_generation_key
+        self.cache.cache.delete(gen_key)
+        self.assertIsNone(self.cache.get_view_feature_meta(1, 1))
+        self.cache.cache.set(gen_key, 'new')
+        self.assertIsNone(self.cache.get_view_feature_meta(1, 1))
+
+    @override_settings(USE_DRF_INSTANCE_CACHE=False)
+    def test_cache_disabled(self):
+        self.cache.set_view_feature_meta(1, 1, self.compat_table)
+        self.assertIsNone(self.cache.get_view_feature_meta(1, 1))
+
+    def test_invalidated_by_support_change(self):
+        self.login_user(groups=['change-resource'])
+        browser = self.create(Browser)
+        version = self.create(Version, browser=browser, version='1.0')
+        parent = self.create(Feature, slug='parent')
+        feature = self.create(Feature, slug='feature', parent=parent)
+        support = self.create(Support, version=version, feature=feature)
+        self.cache.get_instances([('Support', support.pk, None)])
+        self.cache.set_view_feature_meta(parent.pk, 1, self.compat_table)
+        self.cache.set_view_feature_meta(feature.pk, 1, self.compat_table)
+
+        support.support = 'no'
+        support.save()
+        self.assertIsNone(self.cache.get_view_feature_meta(parent.pk, 1))
+        self.assertIsNone(self.cache.get_view_feature_meta(feature.pk, 1))
+
+
+class TestCacheViewFeatureResponse(TestCase):
+    def setUp(self):
+        self.cache = Cache()
+
+    def test_key(self):
+        key = self.cache.view_feature_response_key(1, 'json', 'en')
+        self.assertTrue(key.startswith('drfc_ViewFeatureResponse_1_'))
+        self.assertEqual(
+            key, self.cache.view_feature_response_key(1, 'json', 'en'))
+        self.assertNotEqual(
+            key, self.cache.view_feature_response_key(1, 'json', 'fr'))
+        self.assertNotEqual(
+            key, self.cache.view_feature_response_key(2, 'json', 'en'))
+
+    def test_set_and_get(self):
+        key = self.cache.view_feature_response_key(1, 'json')
+        self.assertIsNone(self.cache.get_view_feature_response(key))
+        headers = [('ETag', '"etag"')]
+        self.cache.set_view_feature_response(key, headers, b'content')
+        self.assertEqual(
+            (headers, b'content'), self.cache.get_view_feature_response(key))
+
+    @override_settings(USE_DRF_INSTANCE_CACHE=False)
+    def test_cache_disabled(self):
+        cache = Cache()
+        self.assertIsNone(cache.view_feature_response_key(1, 'json'))
+
+    def test_invalidate_all(self):
+        key = self.cache.view_feature_response_key(1, 'json')
+        self.cache.invalidate_view_feature_responses()
+        self.assertNotEqual(
+            key, self.cache.view_feature_response_key(1, 'json'))
+
+    def test_invalidate_ancestors(self):
+        self.login_user(groups=['change-resource'])
+        parent = self.create(Feature, slug='parent')
+        feature = self.create(Feature, slug='feature', parent=parent)
+        child = self.create(Feature, slug='child', parent=feature)
+        other = self.create(Feature, slug='other')
+        keys = dict(
+            (obj.pk, self.cache.view_feature_response_key(obj.pk))
+            for obj in (parent, feature, child, other))
+
+        self.cache.invalidate_view_feature_responses([feature.pk])
+        new_keys = dict(
+            (pk, self.cache.view_feature_response_key(pk)) for pk in keys)
+        self.assertNotEqual(keys[parent.pk], new_keys[parent.pk])
+        self.assertNotEqual(keys[feature.pk], new_keys[feature.pk])
+        self.assertEqual(keys[child.pk], new_keys[child.pk])
+        self.assertEqual(keys[other.pk], new_keys[other.pk])
+
+    def test_lease(self):
+        key = self.cache.view_feature_response_key(1, 'json')
+        stale_key = self.cache.view_feature_response_stale_key(1, 'json')
+        self.assertIsNone(self.cache.get_view_feature_response(key, stale_key))
+        self.assertTrue(self.cache.cache.get(
+            self.cache.view_feature_response_lease_key(key)))
+        self.cache.set_view_feature_response(key, [], b'content', stale_key)
+        self.assertIsNone(self.cache.cache.get(
+            self.cache.view_feature_response_lease_key(key)))
+        self.assertEqual(
+            ([], b'content'), self.cache.get_view_feature_response(
+                key, stale_key))
+
+    def test_lease_held_serves_stale(self):
+        key = self.cache.view_feature_response_key(1, 'json')
+        stale_key = self.cache.view_feature_response_stale_key(1, 'json')
+        self.cache.set_view_feature_response(key, [], b'old', stale_key)
+        self.cache.invalidate_view_feature_responses()
+        key = self.cache.view_feature_response_key(1, 'json')
+        self.assertEqual(
+            stale_key, self.cache.view_feature_response_stale_key(1, 'json'))
+        self.assertIsNone(self.cache.get_view_feature_response(key, stale_key))
+        self.assertEqual(
+            ([], b'old'), self.cache.get_view_feature_response(
+                key, stale_key))
+        self.assertEqual(
+            {'stale': 1, 'waits': 0},
+            self.cache.get_view_feature_response_counters())
+
+    def test_lease_held_waits(self):
+        self.cache.view_feature_response_lease_wait = 0.1
+        self.cache.view_feature_response_lease_poll = 0.01
+        key = self.cache.view_feature_response_key(1, 'json')
+        stale_key = self.cache.view_feature_response_stale_key(1, 'json')
+        self.assertIsNone(self.cache.get_view_feature_response(key, stale_key))
+        self.assertIsNone(self.cache.get_view_feature_response(key, stale_key))
+        self.assertEqual(
+            {'stale': 0, 'waits': 1},
+            self.cache.get_view_feature_response_counters())
+
+    def test_lease_released_stops_wait(self):
+        key = self.cache.view_feature_response_key(1, 'json')
+        stale_key = self.cache.view_feature_response_stale_key(1, 'json')
+        self.assertIsNone(self.cache.get_view_feature_response(key, stale_key))
+        self.cache.view_feature_response_lease_wait = 60
+
+        def release(seconds):
+            self.cache.release_view_feature_response_lease(key)
+
+        with mock.patch(
+                'webplatformcompat.cache.sleep', side_effect=release) as slept:
+            self.assertIsNone(
+                self.cache.get_view_feature_response(key, stale_key))
+        slept.assert_called_once_with(
+            self.cache.view_feature_response_lease_poll)
+
+    def test_pks_for_instance(self):
+        self.assertEqual(
+            [2, 1], self.cache.view_feature_pks_for_instance(
+                'Feature', Feature(pk=2, parent_id=1)))
+        self.assertEqual(
+            [3], self.cache.view_feature_pks_for_instance(
+                'Support', Support(feature_id=3)))
+        self.assertIsNone(self.cache.view_feature_pks_for_instance(
+            'Browser', Browser(pk=1)))
+        self.assertEqual([], self.cache.view_feature_pks_for_instance(
+            'User', User(pk=1)))
+
+    def test_pks_for_changeset(self):
+        self.login_user(groups=['change-resource'])
+        parent = self.create(Feature, slug='parent')
+        feature = self.create(Feature, slug='feature', parent=parent)
+        self.assertEqual(
+            sorted([parent.pk, feature.pk]),
+            self.cache.view_feature_pks_for_changeset(self.changeset))
+        self.create(Browser, slug='browser')
+        self.assertIsNone(
+            self.cache.view_feature_pks_for_changeset(self.changeset))
+
+
+@override_settings(DRF_INSTANCE_CACHE_LOCAL_SIZE=1000)
+class TestCacheLocal(TestCase):
+    def setUp(self):
+        self.cache = Cache()
+        self.login_user(groups=['change-resource'])
+        self.browser = self.create(Browser, slug='firefox')
+        self.spec = ('Browser', self.browser.pk, None)
+
+    def test_get_instances_local(self):
+        self.cache.get_instances([self.spec])
+        key = self.cache.key_for('v1', 'Browser', self.browser.pk)
+        self.assertIn(key, local_cache)
+        self.cache.cache.delete(key)
+        with self.assertNumQueries(0):
+            instances = self.cache.get_instances([self.spec])
+        obj_native = instances[('Browser', self.browser.pk)][0]
+        self.assertEqual('firefox', obj_native['slug'])
+
+    def test_get_instances_not_local(self):
+        feature = self.create(Feature, slug='feature')
+        self.cache.get_instances([('Feature', feature.pk, None)])
+        self.assertFalse(local_cache)
+
+    @override_settings(DRF_INSTANCE_CACHE_LOCAL_SIZE=1)
+    def test_local_cache_size(self):
+        browser = self.create(Browser, slug='chrome')
+        self.cache.get_instances([self.spec])
+        self.cache.get_instances([('Browser', browser.pk, None)])
+        self.assertEqual(
+            [self.cache.key_for('v1', 'Browser', browser.pk)],
+            list(local_cache.keys()))
+
+    @override_settings(DRF_INSTANCE_CACHE_LOCAL_SIZE=0)
+    def test_local_cache_disabled(self):
+        self.cache.get_instances([self.spec])
+        self.assertFalse(local_cache)
+
+    def test_update_invalidates(self):
+        self.cache.get_instances([self.spec])
+        self.browser.slug = 'firefox_desktop'
+        self.browser.save()
+        self.assertFalse(local_cache)
+        instances = self.cache.get_instances([self.spec])
+        obj_native = instances[('Browser', self.browser.pk)][0]
+        self.assertEqual('firefox_desktop', obj_native['slug'])
+
+    def test_changeset_close_invalidates(self):
+        changeset = self.create(Changeset, user=self.user)
+        self.cache.get_instances([self.spec])
+        generation = local_cache_state['generation']
+        changeset.closed = True
+        changeset.save()
+        self.assertFalse(local_cache)
+        self.assertNotEqual(generation, local_cache_state['generation'])
+
+    def test_generation_changed_elsewhere(self):
+        self.cache.get_instances([self.spec])
+        self.cache.cache.set(
+            self.cache.local_cache_generation_key, 'other process')
+        local_cache_state['checked'] = 0
+        self.cache.get_instances([self.spec])
+        self.assertEqual('other process', local_cache_state['generation'])
+
+
+@override_settings(DRF_INSTANCE_CACHE_GENERATIONS=True)
+class TestCacheGenerations(TestCase):
+    def setUp(self):
+        self.cache = Cache()
+        self.login_user(groups=['change-resource'])
+
+    def test_generational(self):
+        self.assertTrue(self.cache.generational)
+
+    @override_settings(DRF_INSTANCE_CACHE_GENERATIONS=False)
+    def test_not_generational(self):
+        self.assertFalse(self.cache.generational)
+        self.assertEqual({}, self.cache.get_generations(['Browser']))
+        self.assertEqual(
+            'drfc_v1r2_Browser_1', self.cache.key_for('v1', 'Browser', 1))
+
+    def test_key_for(self):
+        generation = self.cache.get_generations(['Browser'])['Browser']
+        self.assertEqual(
+            'drfc_v1r2_Browser_{0}_1'.format(generation),
+            self.cache.key_for('v1', 'Browser', 1))
+
+    def test_update_changes_dependent_generations(self):
+        browser = self.create(Browser, slug='firefox')
+        spec = ('Browser', browser.pk, None)
+        old = self.cache.get_instances([spec])[('Browser', browser.pk)][0]
+        self.assertEqual([], old['versions'].pks)
+        generations = self.cache.get_generations(['Browser', 'Maturity'])
+
+        version = self.create(Version, browser=browser, version='1.0')
+        new_generations = self.cache.get_generations(['Browser', 'Maturity'])
+        self.assertNotEqual(generations['Browser'], new_generations['Browser'])
+        self.assertEqual(generations['Maturity'], new_generations['Maturity'])
+        new = self.cache.get_instances([spec])[('Browser', browser.pk)][0]
+        self.assertEqual([version.pk], new['versions'].pks)
+
+    def test_update_instance_no_follow_on(self):
+        browser = self.create(Browser)
+        version = self.create(Version, browser=browser)
+        self.assertEqual(
+            [], self.cache.update_instance('Version', version.pk, version))
+        self.assertEqual(
+            [], self.cache.update_instances([('Version', version.pk, None)]))
+
+    def test_feature_tree_generation(self):
+        parent = self.create(Feature, slug='parent')
+        feature = self.create(Feature, slug='feature', parent=parent)
+        other = self.create(Feature, slug='other')
+        tree_gen = self.cache.get_feature_tree_generation(parent.tree_id)
+        other_gen = self.cache.get_feature_tree_generation(other.tree_id)
+        self.cache.set_view_feature_meta(
+            parent.pk, 1, {'tabs': []}, tree_id=parent.tree_id)
+        self.assertEqual(
+            {'tabs': []}, self.cache.get_view_feature_meta(
+                parent.pk, 1, tree_id=parent.tree_id))
+
+        feature.name = {'en': 'Feature'}
+        feature.save()
+        self.assertNotEqual(
+            tree_gen, self.cache.get_feature_tree_generation(parent.tree_id))
+        self.assertEqual(
+            other_gen, self.cache.get_feature_tree_generation(other.tree_id))
+        self.assertIsNone(self.cache.get_view_feature_meta(
+            parent.pk, 1, tree_id=parent.tree_id))
+
+    def test_support_changes_feature_tree(self):
+        feature = self.create(Feature, slug='feature')
+        browser = self.create(Browser)
+        version = self.create(Version, browser=browser)
+        tree_gen = self.cache.get_feature_tree_generation(feature.tree_id)
+        support = self.create(Support, feature=feature, version=version)
+        self.assertNotEqual(
+            tree_gen, self.cache.get_feature_tree_generation(feature.tree_id))
+        tree_gen = self.cache.get_feature_tree_generation(feature.tree_id)
+        self.cache.update_instances([('Support', support.pk, None)])
+        self.assertNotEqual(
+            tree_gen, self.cache.get_feature_tree_generation(feature.tree_id))
+
+    def test_feature_descendant_key(self):
+        feature = self.create(Feature, slug='feature')
+        tree_gen = self.cache.get_feature_tree_generation(feature.tree_id)
+        key = self.cache.feature_descendant_key('v1', feature, 0, tree_gen)
+        self.assertTrue(key.endswith('_0_' + tree_gen))
+
+
+@override_settings(DRF_INSTANCE_CACHE_COMPACT=True)
+class TestCacheCompact(TestCase):
+    def setUp(self):
+        self.cache = Cache()
+        self.obj_native = {
+            'id': 1,
+            'slug': 'feature',
+            'children:PKList': {
+                'app': 'webplatformcompat',
+                'model': 'feature',
+                'pks': [100, 101, 103, 102],
+            },
+            'sections:PKList': {
+                'app': 'webplatformcompat',
+                'model': 'section',
+                'pks': [],
+            },
+        }
+
+    def test_round_trip(self):
+        raw = self.cache.encode_instance(self.obj_native)
+        self.assertTrue(raw.startswith(b'C'))
+        self.assertIn(b'"pk_deltas":[100,1,2,-1]', raw)
+        self.assertEqual(self.obj_native, self.cache.decode_instance(raw))
+
+    def test_compressed(self):
+        pks = list(range(1000, 3000))
+        self.obj_native['children:PKList']['pks'] = pks
+        raw = self.cache.encode_instance(self.obj_native)
+        self.assertTrue(raw.startswith(b'Z'))
+        self.assertTrue(len(raw) < len(json.dumps(self.obj_native)) // 10)
+        self.assertEqual(self.obj_native, self.cache.decode_instance(raw))
+
+    def test_decode_json(self):
+        raw = json.dumps(self.obj_native)
+        self.assertEqual(self.obj_native, self.cache.decode_instance(raw))
+
+    @override_settings(DRF_INSTANCE_CACHE_COMPACT=False)
+    def test_encode_json(self):
+        raw = self.cache.encode_instance(self.obj_native)
+        self.assertEqual(self.obj_native, json.loads(raw))
+
+    def test_get_and_update_instances(self):
+        self.login_user(groups=['change-resource'])
+        browser = self.create(Browser, slug='firefox')
+        version = self.create(Version, browser=browser, version='1.0')
+        spec = ('Browser', browser.pk, None)
+        self.cache.get_instances([spec])
+        key = self.cache.key_for('v1', 'Browser', browser.pk)
+        self.assertTrue(self.cache.cache.get(key).startswith(b'C'))
+        self.cache.update_instance('Browser', browser.pk)
+        obj_native = self.cache.get_instances([spec])[spec[:2]][0]
+        self.assertEqual([version.pk], obj_native['versions'].pks)
+
+
+@override_settings(DRF_INSTANCE_CACHE_STATS=True)
+class TestCacheStats(TestCase):
+    def setUp(self):
+        self.cache = Cache()
+        self.login_user(groups=['change-resource'])
+        self.browser = self.create(Browser, slug='browser')
+        # The new browser was cached by post_save
+        self.cache.cache.clear()
+        local_cache.clear()
+        cache_stats.clear()
+        get_request_cache_stats().clear()
+
+    def tearDown(self):
+        cache_stats.clear()
+        get_request_cache_stats().clear()
+        super(TestCacheStats, self).tearDown()
+
+    def test_hits_and_misses(self):
+        spec = ('Browser', self.browser.pk, None)
+        self.cache.get_instances([spec])
+        self.cache.get_instances([spec])
+        stats = cache_stats[('Browser', 'v1')]
+        self.assertEqual(1, stats['hits'])
+        self.assertEqual(1, stats['misses'])
+        self.assertEqual(1, stats['loaded'])
+        self.assertEqual(1, stats['load']['count'])
+        # Loading takes well under a second, not since the epoch
+        self.assertLess(stats['load']['total'], 60)
+        self.assertEqual(1, stats['serialize']['count'])
+        self.assertEqual(1, sum(stats['serialize']['histogram']))
+
+    def test_invalidations(self):
+        version = self.create(Version, browser=self.browser, version='1.0')
+        cache_stats.clear()
+        self.cache.update_instance('Version', version.pk, version)
+        stats = cache_stats[('Version', 'v1')]
+        self.assertEqual(1, stats['updates'])
+        self.assertEqual(2, stats['invalidations'])
+
+    @override_settings(DRF_INSTANCE_CACHE_STATS=False)
+    def test_disabled(self):
+        self.cache.get_instances([('Browser', self.browser.pk, None)])
+        self.assertEqual({}, cache_stats)
+
+    def test_histogram_buckets(self):
+        for seconds in (0.0005, 0.003, 2.0):
+            self.cache.record_stats('Browser', 'v1', load=seconds)
+        histogram = cache_stats[('Browser', 'v1')]['load']['histogram']
+        self.assertEqual([1, 1, 0, 0, 0, 0, 0, 1], histogram)
+
+    def test_get_stats(self):
+        self.cache.record_stats('Browser', 'v1', hits=2)
+        stats = self.cache.get_stats()
+        self.assertEqual({'hits': 2}, stats['models']['Browser.v1'])
+        self.assertEqual(list(self.cache.stats_buckets), stats['buckets'])
+
+    @mock.patch('webplatformcompat.cache.logger')
+    def test_middleware(self, mock_logger):
+        middleware = CacheStatsMiddleware()
+        request = mock.Mock(method='GET', path='/api/v1/browsers')
+        middleware.process_request(request)
+        self.cache.record_stats('Browser', 'v1', hits=2, load=0.25)
+        response = mock.Mock()
+        self.assertEqual(
+            response, middleware.process_response(request, response))
+        mock_logger.info.assert_called_once_with(
+            'Cache stats for %s %s: %s', 'GET', '/api/v1/browsers',
+            'Browser.v1 hits=2 load=1/0.250s')
+        self.assertEqual({}, get_request_cache_stats())
+
+    @mock.patch('webplatformcompat.cache.logger')
+    def test_middleware_other_thread(self, mock_logger):
+        middleware = CacheStatsMiddleware()
+        request = mock.Mock(method='GET', path='/api/v1/browsers')
+        middleware.process_request(request)
+        self.cache.record_stats('Browser', 'v1', hits=2)
+        other = Thread(
+            target=self.cache.record_stats, args=('Version', 'v1'),
+            kwargs={'misses': 1})
+        other.start()
+        other.join()
+        middleware.process_response(request, mock.Mock())
+        mock_logger.info.assert_called_once_with(
+            'Cache stats for %s %s: %s', 'GET', '/api/v1/browsers',
+            'Browser.v1 hits=2')
+        self.assertEqual(1, cache_stats[('Version', 'v1')]['misses'])
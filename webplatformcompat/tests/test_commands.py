@@ -0,0 +1,55 @@
+# coding: utf-8
+"""Test webplatformcompat management commands."""
+from __future__ import unicode_literals
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils.six import StringIO
+
+from webplatformcompat.cache import Cache
+from webplatformcompat.models import Browser, Version
+
+from .base import TestCase
+
+
+class TestWarmCache(TestCase):
+    def setUp(self):
+        self.browser = self.create(Browser, slug='firefox')
+        self.version = self.create(Version, browser=self.browser)
+        cache.clear()
+
+    def warm(self, *args, **options):
+        out = StringIO()
+        options.setdefault('processes', 1)
+        call_command('warm_cache', *args, stdout=out, **options)
+        return out.getvalue()
+
+    def test_warm_all(self):
+        out = self.warm()
+        self.assertIn('Browser: 1 instances', out)
+        self.assertIn('Version: 1 instances', out)
+        self.assertIn('Feature: 0 instances', out)
+        self.assertIn('instances/sec', out)
+        key = Cache().key_for('v1', 'Browser', self.browser.pk)
+        cached = Cache().decode_instance(cache.get(key))
+        self.assertEqual('firefox', cached['slug'])
+
+    def test_warm_model(self):
+        out = self.warm('Version')
+        self.assertNotIn('Browser', out)
+        self.assertIn('Cached 1 instances', out)
+        self.assertIsNone(
+            cache.get(Cache().key_for('v1', 'Browser', self.browser.pk)))
+        self.assertTrue(
+            cache.get(Cache().key_for('v1', 'Version', self.version.pk)))
+
+    def test_batches(self):
+        self.create(Browser, slug='chrome')
+        out = self.warm('Browser', batch=1, verbosity=2)
+        self.assertIn('Browser: 1 instances (', out)
+        self.assertIn('Browser: 2 instances (', out)
+        self.assertIn('Cached 2 instances', out)
+
+    def test_unknown_model(self):
+        self.assertRaises(CommandError, self.warm, 'Unknown')
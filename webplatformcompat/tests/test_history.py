@@ -7,12 +7,25 @@ from json import loads
 from django.contrib.auth.models import User
 from django.core.urlresolvers import reverse
 
+from webplatformcompat.cache import Cache
 from webplatformcompat.history import Changeset
 from webplatformcompat.models import Browser
 
 from .base import APITestCase
 
 
+class TestChangeset(APITestCase):
+    def test_close_caches_instances(self):
+        browser = self.create(Browser, slug='browser', name={'en': 'Browser'})
+        cache = Cache()
+        cache.cache.clear()
+        key = cache.key_for('v1', 'Browser', browser.pk)
+        self.assertIsNone(cache.cache.get(key))
+        self.changeset.closed = True
+        self.changeset.save()
+        self.assertIsNotNone(cache.cache.get(key))
+
+
 class TestHistoryChangesetRequestMiddleware(APITestCase):
     """Test the HistoryChangesetRequestMiddleware."""
 
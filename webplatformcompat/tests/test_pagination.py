@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tests for `web-platform-compat` pagination module."""
+from json import loads
+
+from django.core.urlresolvers import reverse
+
+from webplatformcompat.models import Browser
+
+from .base import APITestCase
+
+
+class TestOptionalCursorPagination(APITestCase):
+    def setUp(self):
+        self.browsers = [
+            self.create(Browser, slug=slug, name={'en': slug})
+            for slug in ('chrome', 'firefox', 'safari')]
+
+    def get_page(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(200, response.status_code, response.content)
+        return loads(response.content.decode('utf-8'))
+
+    def ids(self, content, resource_type='browsers'):
+        return [item['id'] for item in content[resource_type]]
+
+    def test_page_number_has_count(self):
+        content = self.get_page(reverse('browser-list'), page_size=2)
+        pagination = content['meta']['pagination']['browsers']
+        self.assertEqual(3, pagination['count'])
+
+    def test_cursor_pages(self):
+        pks = [str(browser.pk) for browser in self.browsers]
+        first = self.get_page(reverse('browser-list'), cursor='', page_size=2)
+        self.assertEqual(pks[:2], self.ids(first))
+        pagination = first['meta']['pagination']['browsers']
+        self.assertNotIn('count', pagination)
+        self.assertIsNone(pagination['previous'])
+        self.assertIn('cursor=', pagination['next'])
+
+        second = self.get_page(pagination['next'])
+        self.assertEqual(pks[2:], self.ids(second))
+        pagination = second['meta']['pagination']['browsers']
+        self.assertIsNone(pagination['next'])
+
+        previous = self.get_page(pagination['previous'])
+        self.assertEqual(pks[:2], self.ids(previous))
+        pagination = previous['meta']['pagination']['browsers']
+        self.assertIsNone(pagination['previous'])
+        self.assertEqual(pks[2:], self.ids(self.get_page(pagination['next'])))
+
+    def test_cursor_filtered(self):
+        content = self.get_page(
+            reverse('browser-list'), cursor='', slug='firefox')
+        self.assertEqual([str(self.browsers[1].pk)], self.ids(content))
+
+    def test_cursor_uncached_view(self):
+        content = self.get_page(
+            reverse('historicalbrowser-list'), cursor='', page_size=2)
+        history_ids = [
+            str(browser.history.get().history_id)
+            for browser in self.browsers]
+        self.assertEqual(
+            history_ids[:2], self.ids(content, 'historical_browsers'))
+        pagination = content['meta']['pagination']['historical_browsers']
+        content = self.get_page(pagination['next'])
+        self.assertEqual(
+            history_ids[2:], self.ids(content, 'historical_browsers'))
+
+    def test_invalid_cursor(self):
+        response = self.client.get(
+            reverse('browser-list'), {'cursor': 'invalid'})
+        self.assertEqual(404, response.status_code)
@@ -1,11 +1,17 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 """Tests for `web-platform-compat` renderers module."""
+from json import loads
 
+from django.core.urlresolvers import reverse
 from django.test import TestCase
+import mock
 
-from webplatformcompat.models import Browser
-from webplatformcompat.renderers import JsonApiRenderer
+from webplatformcompat.models import Browser, Feature
+from webplatformcompat.renderers import (
+    CachedJsonApiRenderer, JsonApiRenderer, JsonApiTemplateHTMLRenderer)
+
+from .base import APITestCase
 
 
 class TestJsonApiRenderers(TestCase):
@@ -22,3 +28,90 @@ class TestJsonApiRenderers(TestCase):
         self.assertEqual(
             'data',
             self.renderer.model_to_resource_type(None))
+
+
+class TestCachedJsonApiRenderer(APITestCase):
+
+    def setUp(self):
+        CachedJsonApiRenderer.plans.clear()
+        self.parent = self.create(
+            Feature, slug='parent', name={'en': 'Parent'})
+        self.child = self.create(
+            Feature, slug='child', name={'en': 'Child'}, parent=self.parent)
+
+    def assert_same_as_generic(self, url):
+        response = self.client.get(url)
+        self.assertEqual(200, response.status_code)
+        generic = JsonApiRenderer().render(
+            response.data, 'application/vnd.api+json',
+            response.renderer_context)
+        self.assertDataEqual(
+            loads(generic.decode('utf-8')),
+            loads(response.content.decode('utf-8')))
+        return response
+
+    def test_detail(self):
+        url = reverse('feature-detail', kwargs={'pk': self.child.pk})
+        response = self.assert_same_as_generic(url)
+        self.assertTrue(response.content.startswith(b'{\n    "features": {'))
+
+    def test_list(self):
+        self.assert_same_as_generic(reverse('feature-list'))
+
+    def test_empty_list(self):
+        self.assert_same_as_generic(reverse('browser-list'))
+
+    def test_plan_is_reused(self):
+        url = reverse('feature-detail', kwargs={'pk': self.child.pk})
+        self.client.get(url)
+        self.assertEqual(1, len(CachedJsonApiRenderer.plans))
+        with mock.patch.object(
+                CachedJsonApiRenderer, 'handle_related_field') as mocked:
+            response = self.client.get(url)
+        self.assertFalse(mocked.called)
+        features = loads(response.content.decode('utf-8'))['features']
+        self.assertEqual(str(self.parent.pk), features['links']['parent'])
+
+    def test_plan_is_shared_by_servers(self):
+        url = reverse('feature-detail', kwargs={'pk': self.child.pk})
+        self.client.get(url)
+        response = self.client.get(url, HTTP_HOST='other.example.com')
+        self.assertEqual(1, len(CachedJsonApiRenderer.plans))
+        links = loads(response.content.decode('utf-8'))['links']
+        self.assertEqual(
+            'http://other.example.com/api/v1/features/{features.parent}',
+            links['features.parent']['href'])
+        response = self.client.get(url)
+        links = loads(response.content.decode('utf-8'))['links']
+        self.assertEqual(
+            'http://testserver/api/v1/features/{features.parent}',
+            links['features.parent']['href'])
+
+    def test_plans_size(self):
+        url = reverse('feature-detail', kwargs={'pk': self.child.pk})
+        with mock.patch.object(CachedJsonApiRenderer, 'plans_size', 1):
+            self.client.get(url)
+            self.client.get(reverse('browser-list'))
+            self.client.get(url, {'fields[features]': 'slug,parent'})
+        self.assertEqual(1, len(CachedJsonApiRenderer.plans))
+
+    def test_error_uses_generic_renderer(self):
+        url = reverse('feature-detail', kwargs={'pk': 666})
+        response = self.client.get(url)
+        self.assertEqual(404, response.status_code)
+        errors = loads(response.content.decode('utf-8'))['errors']
+        self.assertEqual('404', errors[0]['status'])
+
+
+class TestJsonApiTemplateHTMLRenderer(APITestCase):
+
+    def test_render_without_encoding(self):
+        feature = self.create(Feature, slug='feature', name={'en': 'Feature'})
+        url = reverse('viewfeatures-detail', kwargs={'pk': feature.pk})
+        with mock.patch.object(JsonApiRenderer, 'render') as mock_render:
+            response = self.client.get(url, {'format': 'html'})
+        self.assertEqual(200, response.status_code)
+        self.assertFalse(mock_render.called)
+        self.assertIsInstance(
+            response.accepted_renderer, JsonApiTemplateHTMLRenderer)
+        self.assertContains(response, 'data-id="%s"' % feature.pk)
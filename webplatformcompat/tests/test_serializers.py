@@ -2,10 +2,12 @@
 # -*- coding: utf-8 -*-
 """Tests for `web-platform-compat.serializer."""
 
-from json import dumps
+from json import dumps, loads
 
 from django.core.urlresolvers import reverse
+import mock
 
+from webplatformcompat.cache import Cache
 from webplatformcompat.models import (
     Browser, Feature, Maturity, Section, Specification, Version)
 
@@ -114,6 +116,84 @@ class TestHistoricalModelSerializer(APITestCase):
         self.assertDataEqual(response.data, expected_data)
 
 
+class TestSparseFieldsMixin(APITestCase):
+    """Test sparse fieldsets through BrowserSerializer."""
+
+    def setUp(self):
+        self.browser = self.create(
+            Browser, slug='browser', name={'en': 'Old Name'})
+        self.url = reverse('browser-detail', kwargs={'pk': self.browser.pk})
+
+    def test_detail(self):
+        response = self.client.get(
+            self.url, {'fields[browsers]': 'slug,versions'})
+        self.assertEqual(200, response.status_code, response.data)
+        expected = {
+            'browsers': {
+                'id': str(self.browser.pk),
+                'slug': 'browser',
+                'links': {'versions': []},
+            },
+            'links': {
+                'browsers.versions': {
+                    'type': 'versions',
+                    'href': (
+                        'http://testserver/api/v1/versions/'
+                        '{browsers.versions}'),
+                },
+            },
+        }
+        self.assertDataEqual(expected, loads(response.content.decode('utf-8')))
+
+    def test_list(self):
+        response = self.client.get(
+            reverse('browser-list'), {'fields[browsers]': 'name'})
+        self.assertEqual(200, response.status_code, response.data)
+        content = loads(response.content.decode('utf-8'))
+        self.assertEqual(
+            [{'id': str(self.browser.pk), 'name': {'en': 'Old Name'}}],
+            content['browsers'])
+        self.assertNotIn('links', content)
+
+    def test_history_not_loaded(self):
+        with mock.patch.object(Cache, 'history_pks') as mock_history_pks:
+            response = self.client.get(self.url, {'fields[browsers]': 'slug'})
+        self.assertEqual(200, response.status_code, response.data)
+        self.assertFalse(mock_history_pks.called)
+
+    def test_other_type_ignored(self):
+        response = self.client.get(self.url, {'fields[versions]': 'version'})
+        self.assertEqual(200, response.status_code, response.data)
+        self.assertIn('history', response.data)
+
+    def test_unknown_field(self):
+        response = self.client.get(self.url, {'fields[browsers]': 'slug,foo'})
+        self.assertEqual(400, response.status_code)
+        self.assertEqual(
+            {'fields[browsers]': ['Unknown field "foo".']}, response.data)
+
+    def test_update_ignores_fieldset(self):
+        data = {'browsers': {'name': {'en': 'New Name'}}}
+        response = self.update_via_json_api(
+            self.url + '?fields[browsers]=slug', data)
+        self.assertIn('history', response.data)
+
+    def test_view_features_ignore_fieldsets(self):
+        feature = self.create(Feature, slug='feature', name={'en': 'Feature'})
+        url = reverse('viewfeatures-detail', kwargs={'pk': feature.pk})
+        params = {
+            'fields[features]': 'slug', 'fields[browsers]': 'slug',
+            'fields[supports]': 'support'}
+        response = self.client.get(url, params)
+        self.assertEqual(200, response.status_code, response.data)
+        self.assertIn('name', response.data)
+        self.assertIn('meta', response.data['_view_extra'])
+        params['format'] = 'html'
+        response = self.client.get(url, params)
+        self.assertEqual(200, response.status_code)
+        self.assertContains(response, 'data-id="%s"' % feature.pk)
+
+
 class TestBrowserSerializer(APITestCase):
     """Test BrowserSerializer through the view."""
     def setUp(self):
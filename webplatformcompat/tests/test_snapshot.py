@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tests for `web-platform-compat` snapshot module."""
+from gzip import GzipFile
+from json import loads
+from os import listdir
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+from django.core.urlresolvers import reverse
+from django.test.utils import override_settings
+import mock
+
+from webplatformcompat.history import Changeset
+from webplatformcompat.models import (
+    Browser, Feature, Maturity, Section, Specification, Support, Version)
+from webplatformcompat import snapshot
+from webplatformcompat.snapshot import (
+    get_snapshot_index, snapshot_storage, write_latest_snapshot,
+    write_snapshot)
+
+from .base import TestCase
+
+
+class TestSnapshot(TestCase):
+    def setUp(self):
+        self.root = mkdtemp()
+        self.addCleanup(rmtree, self.root)
+        overrides = override_settings(SNAPSHOT_ROOT=self.root)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.browser = self.create(
+            Browser, slug='browser', name={'en': 'Browser'})
+        self.version = self.create(
+            Version, browser=self.browser, version='1.0')
+        self.feature = self.create(
+            Feature, slug='feature', name={'en': 'Feature'})
+        self.maturity = self.create(
+            Maturity, slug='mat', name={'en': 'Maturity'})
+        self.spec = self.create(
+            Specification, maturity=self.maturity, slug='spec',
+            mdn_key='SPEC', name={'en': 'Spec'}, uri={'en': 'http://s'})
+        self.section = self.create(Section, specification=self.spec)
+        self.section.features.add(self.feature)
+
+    def close_changeset(self):
+        self.changeset.closed = True
+        self.changeset.save()
+        del self.changeset
+
+    def load_snapshot(self):
+        storage = snapshot_storage()
+        index = get_snapshot_index(storage)
+        with storage.open(index['name']) as snapshot_file:
+            with GzipFile(fileobj=snapshot_file) as gzip_file:
+                return loads(gzip_file.read().decode('utf-8'))
+
+    def test_disabled(self):
+        with override_settings(SNAPSHOT_ROOT=None):
+            self.close_changeset()
+            self.assertIsNone(snapshot_storage())
+            self.assertIsNone(write_snapshot())
+
+    def test_no_closed_changeset(self):
+        self.assertIsNone(write_snapshot())
+        self.assertIsNone(get_snapshot_index(snapshot_storage()))
+
+    def test_write_on_close(self):
+        changeset = self.changeset
+        self.close_changeset()
+        index = get_snapshot_index(snapshot_storage())
+        self.assertEqual(changeset.id, index['changeset'])
+        data = self.load_snapshot()
+        self.assertEqual(
+            {'changeset': changeset.id, 'modified': index['modified']},
+            data['meta']['snapshot'])
+        self.assertEqual(
+            [str(self.browser.pk)], [b['id'] for b in data['browsers']])
+        self.assertEqual(
+            [str(self.version.pk)],
+            data['browsers'][0]['links']['versions'])
+        self.assertEqual(
+            [str(self.version.pk)], [v['id'] for v in data['versions']])
+        self.assertEqual(
+            str(self.browser.pk), data['versions'][0]['links']['browser'])
+        self.assertEqual(
+            [str(self.feature.pk)], [f['id'] for f in data['features']])
+        self.assertEqual(
+            [str(self.section.pk)], data['features'][0]['links']['sections'])
+        self.assertEqual(
+            [str(self.maturity.pk)], [m['id'] for m in data['maturities']])
+        self.assertEqual(
+            [str(self.spec.pk)],
+            data['maturities'][0]['links']['specifications'])
+        self.assertEqual(
+            [str(self.spec.pk)], [s['id'] for s in data['specifications']])
+        self.assertEqual(
+            [str(self.section.pk)], [s['id'] for s in data['sections']])
+        self.assertEqual([], data['supports'])
+
+    def test_current(self):
+        self.close_changeset()
+        self.assertIsNone(write_snapshot())
+
+    def test_incremental_update(self):
+        self.close_changeset()
+        old_index = get_snapshot_index(snapshot_storage())
+        support = self.create(
+            Support, version=self.version, feature=self.feature)
+        changeset = self.changeset
+        self.close_changeset()
+
+        storage = snapshot_storage()
+        index = get_snapshot_index(storage)
+        self.assertEqual(changeset.id, index['changeset'])
+        self.assertFalse(storage.exists(old_index['name']))
+        data = self.load_snapshot()
+        self.assertEqual(
+            [str(support.pk)], [s['id'] for s in data['supports']])
+        self.assertEqual(
+            [str(support.pk)], data['features'][0]['links']['supports'])
+        self.assertEqual(
+            [str(support.pk)], data['versions'][0]['links']['supports'])
+
+    def test_incremental_delete(self):
+        self.close_changeset()
+        changeset = Changeset.objects.create(user=self.user)
+        self.version._history_user = self.user
+        self.version._history_changeset = changeset
+        self.version.delete()
+        changeset.closed = True
+        changeset.save()
+
+        data = self.load_snapshot()
+        self.assertEqual([], data['versions'])
+        self.assertEqual([], data['browsers'][0]['links']['versions'])
+
+    def test_index_replaced_in_place(self):
+        self.close_changeset()
+        with mock.patch.object(
+                FileSystemStorage, 'delete', autospec=True,
+                side_effect=FileSystemStorage.delete) as mock_delete:
+            self.create(Support, version=self.version, feature=self.feature)
+            self.close_changeset()
+        deleted = [args[1] for args, kwargs in mock_delete.call_args_list]
+        self.assertNotIn('snapshot.json', deleted)
+        index = get_snapshot_index(snapshot_storage())
+        self.assertEqual(
+            sorted(['snapshot.json', index['name']]),
+            sorted(listdir(self.root)))
+
+    def test_write_in_progress(self):
+        cache.add(snapshot.snapshot_lock_key, True)
+        self.close_changeset()
+        self.assertIsNone(get_snapshot_index(snapshot_storage()))
+        self.assertTrue(cache.get(snapshot.snapshot_pending_key))
+
+    def test_write_requested_during_write(self):
+        write = snapshot.write_snapshot
+        calls = []
+
+        def write_during_close():
+            calls.append(True)
+            if len(calls) == 1:
+                # Another changeset closes during the first write
+                self.assertIsNone(write_latest_snapshot())
+            return write()
+
+        with mock.patch.object(
+                snapshot, 'write_snapshot', side_effect=write_during_close):
+            self.close_changeset()
+        self.assertEqual(2, len(calls))
+        self.assertIsNone(cache.get(snapshot.snapshot_lock_key))
+
+    def test_view(self):
+        url = reverse('snapshot')
+        response = self.client.get(url)
+        self.assertEqual(404, response.status_code)
+
+        self.close_changeset()
+        index = get_snapshot_index(snapshot_storage())
+        response = self.client.get(url)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('application/gzip', response['Content-Type'])
+        self.assertEqual('"%s"' % index['name'], response['ETag'])
+        content = b''.join(response.streaming_content)
+        self.assertEqual(index['size'], len(content))
+
+        response = self.client.get(
+            url, HTTP_IF_NONE_MATCH='"%s"' % index['name'])
+        self.assertEqual(304, response.status_code)
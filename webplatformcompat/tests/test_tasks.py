@@ -5,7 +5,8 @@ from django.test.utils import override_settings
 import mock
 
 from webplatformcompat.models import Maturity, Specification
-from webplatformcompat.tasks import update_cache_for_instance
+from webplatformcompat.tasks import (
+    update_cache_for_instance, update_cache_for_instances)
 
 from .base import TestCase
 
@@ -15,7 +16,8 @@ class TestUpdateCacheForInstance(TestCase):
         self.mat = self.create(Maturity, slug='maturity')
         self.spec = self.create(Specification, maturity=self.mat)
         self.patcher = mock.patch('webplatformcompat.tasks.Cache')
-        self.mock_cache = mock.Mock(spec_set=['update_instance'])
+        self.mock_cache = mock.Mock(
+            spec_set=['update_instance', 'update_instances'])
         self.mock_cache_class = self.patcher.start()
         self.mock_cache_class.return_value = self.mock_cache
 
@@ -30,20 +32,64 @@ class TestUpdateCacheForInstance(TestCase):
 
     @override_settings(DRF_INSTANCE_CACHE_POPULATE_COLD=True)
     def test_update_cache_with_invalidation(self):
+        self.mock_cache.update_instance.return_value = [
+            ('Maturity', self.mat.id, 'v1')]
+        self.mock_cache.update_instances.return_value = []
+        update_cache_for_instance('Specification', self.spec.id)
+        self.mock_cache.update_instance.assert_called_once_with(
+            'Specification', self.spec.id, None, None, update_only=True)
+        self.mock_cache.update_instances.assert_called_once_with(
+            [('Maturity', self.mat.id, 'v1')], update_only=False)
+
+
+class TestUpdateCacheForInstances(TestCase):
+    def setUp(self):
+        self.patcher = mock.patch('webplatformcompat.tasks.Cache')
+        self.mock_cache = mock.Mock(spec_set=['update_instances'])
+        self.mock_cache_class = self.patcher.start()
+        self.mock_cache_class.return_value = self.mock_cache
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    @override_settings(DRF_INSTANCE_CACHE_POPULATE_COLD=True)
+    def test_cascade_coalesced(self):
         results = [
-            [('Maturity', self.mat.id, 'v1')],
-            [],
+            [('Feature', 1, 'v1'), ('Feature', 2, 'v1'),
+             ('Feature', 1, 'v1')],
+            [('Feature', 3, 'v1'), ('Feature', 1, 'v1')],
+            [('Feature', 2, 'v1')],
         ]
 
         def side_effect(*args, **kwargs):
             return results.pop(0)
 
-        self.mock_cache.update_instance.side_effect = side_effect
-        update_cache_for_instance('Specification', self.spec.id)
+        self.mock_cache.update_instances.side_effect = side_effect
+        update_cache_for_instances(
+            [['Feature', 1, 'v1'], ['Support', 5, 'v1'],
+             ['Feature', 1, 'v1']])
         expected_calls = [
-            mock.call('Specification', self.spec.id, None, None,
-                      update_only=True),
-            mock.call('Maturity', self.mat.id, None, 'v1',
-                      update_only=False)]
-        actual_calls = self.mock_cache.update_instance.call_args_list
+            mock.call(
+                [('Feature', 1, 'v1'), ('Support', 5, 'v1')],
+                update_only=True),
+            mock.call([('Feature', 2, 'v1')], update_only=False),
+            mock.call([('Feature', 3, 'v1')], update_only=False),
+        ]
+        actual_calls = self.mock_cache.update_instances.call_args_list
+        self.assertEqual(expected_calls, actual_calls)
+
+    @override_settings(DRF_INSTANCE_CACHE_POPULATE_COLD=False)
+    def test_cascade_update_only(self):
+        results = [[('Maturity', 1, 'v1')], []]
+
+        def side_effect(*args, **kwargs):
+            return results.pop(0)
+
+        self.mock_cache.update_instances.side_effect = side_effect
+        update_cache_for_instances([('Specification', 1, None)], False)
+        expected_calls = [
+            mock.call([('Specification', 1, None)], update_only=False),
+            mock.call([('Maturity', 1, 'v1')], update_only=True),
+        ]
+        actual_calls = self.mock_cache.update_instances.call_args_list
         self.assertEqual(expected_calls, actual_calls)
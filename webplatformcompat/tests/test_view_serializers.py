@@ -11,11 +11,16 @@ from datetime import date
 from json import dumps, loads
 
 from django.core.urlresolvers import reverse
+from django.test import RequestFactory
 from django.test.utils import override_settings
+from drf_cached_instances.models import CachedQueryset
+import mock
 
+from webplatformcompat.cache import Cache
 from webplatformcompat.history import Changeset
 from webplatformcompat.models import (
     Browser, Feature, Maturity, Section, Specification, Support, Version)
+from webplatformcompat.renderers import JsonApiTemplateHTMLRenderer
 from webplatformcompat.view_serializers import (
     DjangoResourceClient, ViewFeatureExtraSerializer)
 
@@ -1711,6 +1716,166 @@ multipage/sections.html#the-address-element">
         self.assertEqual(404, response.status_code)
 
 
+class TestViewFeatureResponseCache(APITestCase):
+    """Test caching of rendered /view_features/<feature_id> responses."""
+
+    def setUp(self):
+        self.feature = self.create(Feature, slug='feature')
+        self.url = reverse(
+            'viewfeatures-detail', kwargs={'pk': self.feature.pk})
+
+    def test_etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(200, response.status_code)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"'))
+
+        cached = self.client.get(self.url)
+        self.assertEqual(200, cached.status_code)
+        self.assertEqual(etag, cached['ETag'])
+        self.assertEqual(response['Content-Type'], cached['Content-Type'])
+        self.assertEqual(response.content, cached.content)
+
+    def test_cached_by_slug(self):
+        response = self.client.get(self.url)
+        url = reverse('viewfeatures-detail', kwargs={'pk': 'feature'})
+        cached = self.client.get(url)
+        self.assertEqual(200, cached.status_code)
+        self.assertEqual(response['ETag'], cached['ETag'])
+
+    def test_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(etag, response['ETag'])
+        self.assertEqual(b'', response.content)
+
+    def test_not_modified_on_miss(self):
+        etag = self.client.get(self.url)['ETag']
+        Cache().invalidate_view_feature_responses()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(304, response.status_code)
+
+    def test_html_cached_separately(self):
+        json_etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, {'format': 'html'})
+        self.assertEqual(200, response.status_code)
+        self.assertNotEqual(json_etag, response['ETag'])
+        self.assertIn('text/html', response['Content-Type'])
+
+    def test_browsable_api_not_cached(self):
+        response = self.client.get(self.url, {'format': 'api'})
+        self.assertEqual(200, response.status_code)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_invalidated_by_feature_change(self):
+        etag = self.client.get(self.url)['ETag']
+        self.feature.name = {'en': 'Changed'}
+        self.feature.save()
+        response = self.client.get(self.url)
+        self.assertNotEqual(etag, response['ETag'])
+        self.assertContains(response, 'Changed')
+
+    def assert_rendered(self, rendered=True, **params):
+        """Assert if the response is rendered rather than loaded from cache."""
+        with mock.patch.object(
+                Cache, 'set_view_feature_response', autospec=True,
+                side_effect=Cache.set_view_feature_response) as mock_set:
+            response = self.client.get(self.url, params)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(rendered, mock_set.called)
+
+    def test_invalidated_by_child_support(self):
+        child = self.create(Feature, slug='child', parent=self.feature)
+        self.assert_rendered()
+        self.assert_rendered(False)
+        browser = self.create(Browser, slug='browser', name={'en': 'Browser'})
+        version = self.create(Version, browser=browser)
+        self.create(Support, version=version, feature=child)
+        self.assert_rendered()
+
+    def test_not_invalidated_by_other_feature(self):
+        self.assert_rendered()
+        self.create(Feature, slug='other')
+        self.assert_rendered(False)
+
+    def test_html_cached_by_query(self):
+        self.assert_rendered(format='html', lang='en')
+        self.assert_rendered(False, lang='en', format='html')
+        self.assert_rendered(format='html', lang='en', page='1')
+        self.assert_rendered(format='html', lang='en', other='1')
+        self.assert_rendered(
+            format='html', lang='en', **{'fields[features]': 'slug'})
+        self.assert_rendered(format='html', lang='fr')
+
+    def test_invalidated_by_browser_change(self):
+        browser = self.create(Browser, slug='browser', name={'en': 'Browser'})
+        self.assert_rendered()
+        browser.name = {'en': 'Changed'}
+        browser.save()
+        self.assert_rendered()
+
+    def test_invalidated_by_changeset_close(self):
+        etag = self.client.get(self.url)['ETag']
+        changeset = Changeset.objects.create(user=self.user)
+        self.feature.name = {'en': 'Changed'}
+        self.feature._history_changeset = changeset
+        self.feature._delay_cache = True
+        self.feature.save()
+        self.assertEqual(etag, self.client.get(self.url)['ETag'])
+
+        changeset.closed = True
+        changeset.save()
+        self.assertEqual(
+            [self.feature.pk],
+            Cache().view_feature_pks_for_changeset(changeset))
+        response = self.client.get(self.url)
+        self.assertNotEqual(etag, response['ETag'])
+        self.assertContains(response, 'Changed')
+
+    def test_stale_while_rendering(self):
+        etag = self.client.get(self.url)['ETag']
+        self.feature.name = {'en': 'Changed'}
+        self.feature.save()
+
+        get_response = Cache.get_view_feature_response
+
+        def other_worker_rendering(cache, key, stale_key=None):
+            cache.cache.add(cache.view_feature_response_lease_key(key), True)
+            return get_response(cache, key, stale_key)
+
+        with mock.patch.object(
+                Cache, 'get_view_feature_response', autospec=True,
+                side_effect=other_worker_rendering):
+            response = self.client.get(self.url)
+        self.assertEqual(etag, response['ETag'])
+        self.assertEqual(
+            1, Cache().get_view_feature_response_counters()['stale'])
+
+    def test_lease_released_on_error(self):
+        url = reverse('viewfeatures-detail', kwargs={'pk': 666})
+        with mock.patch.object(
+                Cache, 'release_view_feature_response_lease', autospec=True,
+                side_effect=Cache.release_view_feature_response_lease) as \
+                mock_release:
+            response = self.client.get(url)
+        self.assertEqual(404, response.status_code)
+        self.assertTrue(mock_release.called)
+
+    def test_lease_released_on_render_error(self):
+        with mock.patch.object(
+                Cache, 'release_view_feature_response_lease', autospec=True,
+                side_effect=Cache.release_view_feature_response_lease) as \
+                mock_release:
+            with mock.patch.object(
+                    JsonApiTemplateHTMLRenderer, 'render',
+                    side_effect=ValueError('Render failed')):
+                self.assertRaises(
+                    ValueError, self.client.get, self.url, {'format': 'html'})
+        self.assertTrue(mock_release.called)
+        self.assert_rendered(format='html')
+
+
 class TestViewFeatureUpdates(APITestCase):
     """Test PUT to a ViewFeature detail"""
     longMessage = True
@@ -2130,6 +2295,152 @@ class TestViewFeatureUpdates(APITestCase):
         self.assertEqual(expected_error, actual_error)
 
 
+class TestViewFeatureExtraSerializer(TestCase):
+    """Test ViewFeatureExtraSerializer with cached features."""
+
+    def setUp(self):
+        self.feature = self.create(Feature, slug='feature')
+        self.cache = Cache()
+
+    def serialize(self, page=None):
+        """Serialize the cached feature for a GET request."""
+        url = reverse('viewfeatures-detail', kwargs={'pk': self.feature.pk})
+        data = {'page': page} if page else {}
+        request = RequestFactory().get(url, data)
+        context = {'request': request, 'format': None}
+        cached_feature = CachedQueryset(
+            self.cache, Feature.objects.all()).get(pk=self.feature.pk)
+        serializer = ViewFeatureExtraSerializer(context=context)
+        return serializer.to_representation(cached_feature)
+
+    def test_meta_cached(self):
+        self.serialize()
+        cached = self.cache.get_view_feature_meta(self.feature.pk, 1)
+        expected = {
+            'supports': {str(self.feature.pk): {}},
+            'tabs': [],
+            'languages': [],
+            'notes': {},
+        }
+        self.assertDataEqual(expected, cached)
+
+    def test_meta_from_cache(self):
+        compat_table = {
+            'supports': {},
+            'tabs': [],
+            'languages': ['fr'],
+            'notes': {},
+        }
+        self.cache.set_view_feature_meta(self.feature.pk, 1, compat_table)
+        meta = self.serialize()['meta']['compat_table']
+        self.assertEqual(['fr'], meta['languages'])
+        self.assertEqual(
+            ['supports', 'tabs', 'pagination', 'languages', 'notes'],
+            list(meta.keys()))
+
+    @override_settings(PAGINATE_VIEW_FEATURE=2)
+    def test_meta_cached_by_page(self):
+        for slug in ('child1', 'child2', 'child3'):
+            self.create(Feature, slug=slug, parent=self.feature)
+        self.serialize(page=2)
+        self.assertIsNone(
+            self.cache.get_view_feature_meta(self.feature.pk, 1))
+        self.assertTrue(self.cache.get_view_feature_meta(self.feature.pk, 2))
+
+
+class PKList(list):
+    """Stand-in for the PK list of a cached many-to-many field."""
+
+    def values_list(self, *args, **kwargs):
+        return self
+
+
+class Stub(object):
+    """Stand-in for a cached instance."""
+
+    def __init__(self, **kwargs):
+        for name, value in kwargs.items():
+            setattr(self, name, value)
+
+
+class Compared(object):
+    """Stand-in for a support value, counting equality comparisons."""
+
+    def __init__(self, value, counter):
+        self.value = value
+        self.counter = counter
+
+    def __eq__(self, other):
+        self.counter[0] += 1
+        return self.value == getattr(other, 'value', other)
+
+    def __ne__(self, other):
+        return not self == other
+
+
+class TestSignificantChanges(TestCase):
+    """Test ViewFeatureExtraSerializer.significant_changes in memory."""
+
+    def make_feature(self, feature_count, version_count, counter=None):
+        """Create a feature with supports for every child and version.
+
+        If counter is set, comparisons of the support values are counted.
+        """
+        browsers = []
+        versions = []
+        for b_id in (1, 2):
+            browser = Stub(id=b_id, versions=PKList())
+            browsers.append(browser)
+            # Version IDs do not match the version order
+            for order in range(version_count):
+                v_id = b_id * 100000 + version_count - order
+                browser.versions.append(v_id)
+                versions.append(Stub(id=v_id, browser=Stub(pk=b_id)))
+        children = [Stub(id=f_id) for f_id in range(2, feature_count + 1)]
+        supports = []
+        for feature in [Stub(id=1)] + children:
+            for version in versions:
+                b_id = version.browser.pk
+                order = b_id * 100000 + version_count - version.id
+                support = 'yes' if order >= 2 else 'no'
+                if counter is not None:
+                    support = Compared(support, counter)
+                supports.append(Stub(
+                    id=len(supports) + 1, version=Stub(pk=version.id),
+                    feature=Stub(pk=feature.id), support=support, prefix=None,
+                    prefix_mandatory=False, alternate_name=None,
+                    alternate_mandatory=False, requires_config=None,
+                    default_config=None, protected=False,
+                    note={'en': 'Note'} if order >= 4 else None))
+        supports.reverse()
+        return Stub(
+            id=1, all_browsers=browsers, all_versions=versions,
+            child_features=children, all_supports=supports)
+
+    def test_significant_changes(self):
+        obj = self.make_feature(2, 5)
+        changes = ViewFeatureExtraSerializer().significant_changes(obj)
+        self.assertEqual(['1', '2'], list(changes.keys()))
+        by_id = dict((s.id, s) for s in obj.all_supports)
+        first = changes['1']
+        self.assertEqual(['1', '2'], list(first.keys()))
+        for b_id, s_ids in first.items():
+            orders = [
+                obj.all_browsers[int(b_id) - 1].versions.index(
+                    by_id[int(s_id)].version.pk)
+                for s_id in s_ids]
+            self.assertEqual([0, 2, 4], orders)
+
+    def test_linear_scaling(self):
+        for feature_count in (10, 80):
+            counter = [0]
+            obj = self.make_feature(feature_count, 50, counter)
+            ViewFeatureExtraSerializer().significant_changes(obj)
+            # Each support is only compared to the previous support
+            self.assertLessEqual(counter[0], len(obj.all_supports))
+            self.assertTrue(counter[0])
+
+
 class TestDjangoResourceClient(TestCase):
     def setUp(self):
         self.client = DjangoResourceClient()
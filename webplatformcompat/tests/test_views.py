@@ -55,3 +55,17 @@ class TestViews(TestCase):
     def test_browse_app(self):
         response = self.client.get(reverse('browse'))
         self.assertEqual(response.status_code, 200)
+
+    def test_cache_stats(self):
+        user = self.login_user()
+        user.is_staff = True
+        user.save()
+        response = self.client.get(reverse('cache_stats'))
+        self.assertEqual(200, response.status_code)
+        actual = loads(response.content.decode('utf-8'))
+        self.assertIn('models', actual)
+
+    def test_cache_stats_not_staff(self):
+        self.login_user()
+        response = self.client.get(reverse('cache_stats'))
+        self.assertEqual(403, response.status_code)
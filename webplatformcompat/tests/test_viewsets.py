@@ -9,8 +9,12 @@ from pytz import UTC
 from django.core.urlresolvers import reverse
 import mock
 
+from webplatformcompat import tasks
+from webplatformcompat.cache import Cache
 from webplatformcompat.history import Changeset
-from webplatformcompat.models import Browser, Feature
+from webplatformcompat.models import (
+    Browser, Feature, Maturity, Section, Specification, Support, Version)
+from webplatformcompat.viewsets import BatchMixin, ExportMixin
 
 from .base import APITestCase
 
@@ -197,7 +201,45 @@ class TestGenericViewset(APITestCase):
         }
         self.assertDataEqual(response.data, expected_data)
         mock_update.assert_called_once_with(
-            'Browser', browser.pk, browser, False)
+            'Browser', browser.pk, browser, update_only=False)
+
+    def test_put_writes_through_cache(self):
+        browser = self.create(Browser, slug='browser', name={'en': 'Old'})
+        cache = Cache()
+        spec = ('Browser', browser.pk, None)
+        cache.get_instances([spec])
+        data = dumps({'browsers': {'name': {'en': 'New'}}})
+        url = reverse('browser-detail', kwargs={'pk': browser.pk})
+        with mock.patch.object(
+                tasks, 'update_cache_for_instance',
+                wraps=tasks.update_cache_for_instance) as mock_update:
+            response = self.client.put(
+                url, data=data, content_type="application/vnd.api+json")
+        self.assertEqual(200, response.status_code, response.data)
+        # The history head is known before the instance is cached
+        instance = mock_update.call_args[0][2]
+        self.assertEqual(
+            browser.history.all()[0].pk, instance._history_current)
+        self.assertEqual(2, instance._history_count)
+        raw = cache.cache.get(cache.key_for('v1', 'Browser', browser.pk))
+        obj_native = cache.decode_instance(raw)
+        self.assertEqual({'en': 'New'}, obj_native['name'])
+        history = obj_native['history:HistoryPKList']
+        self.assertEqual(2, history['count'])
+        self.assertEqual(browser.history.all()[0].pk, history['current'])
+
+    def test_post_writes_through_cache(self):
+        self.login_user()
+        data = {'slug': 'firefox', 'name': '{"en": "Firefox"}'}
+        response = self.client.post(reverse('browser-list'), data)
+        self.assertEqual(201, response.status_code, response.data)
+        browser = Browser.objects.get()
+        cache = Cache()
+        raw = cache.cache.get(cache.key_for('v1', 'Browser', browser.pk))
+        obj_native = cache.decode_instance(raw)
+        self.assertEqual('firefox', obj_native['slug'])
+        self.assertEqual([], obj_native['versions:PKList']['pks'])
+        self.assertEqual(1, obj_native['history:HistoryPKList']['count'])
 
     @mock.patch('webplatformcompat.tasks.update_cache_for_instance')
     def test_put_in_changeset(self, mock_update):
@@ -314,6 +356,133 @@ class TestFeatureViewSet(APITestCase):
         self.assertEqual(other.id, response.data['results'][1]['id'])
 
 
+class TestExport(APITestCase):
+    def setUp(self):
+        old = datetime(2014, 10, 29, 8, 57, 21, 806744, UTC)
+        self.old = self.create(
+            Browser, slug='old', name={'en': 'Old'}, _history_date=old)
+        self.new = self.create(Browser, slug='new', name={'en': 'New'})
+
+    def export(self, **params):
+        response = self.client.get(reverse('browser-export'), params)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('application/x-ndjson', response['content-type'])
+        content = b''.join(response.streaming_content).decode('utf-8')
+        return [loads(line) for line in content.splitlines()]
+
+    def test_export(self):
+        lines = self.export()
+        self.assertEqual(
+            [str(self.old.pk), str(self.new.pk)],
+            [line['browsers']['id'] for line in lines])
+        browser = lines[0]['browsers']
+        self.assertEqual('old', browser['slug'])
+        self.assertEqual(
+            [str(pk) for pk in self.old.history.values_list(
+                'history_id', flat=True)],
+            browser['links']['history'])
+
+    def test_export_in_chunks(self):
+        with mock.patch.object(ExportMixin, 'export_chunk_size', 1):
+            lines = self.export()
+        self.assertEqual(2, len(lines))
+
+    def test_export_filtered(self):
+        lines = self.export(slug='new')
+        self.assertEqual(
+            [str(self.new.pk)], [line['browsers']['id'] for line in lines])
+
+    def test_export_modified_since(self):
+        lines = self.export(modified_since='2015-01-01T00:00:00Z')
+        self.assertEqual(
+            [str(self.new.pk)], [line['browsers']['id'] for line in lines])
+
+    def test_export_every_type(self):
+        maturity = self.create(Maturity, slug='mat', name={'en': 'Mat'})
+        spec = self.create(
+            Specification, maturity=maturity, slug='spec',
+            mdn_key='SPEC', name={'en': 'Spec'}, uri={'en': 'http://s'})
+        section = self.create(Section, specification=spec)
+        parent = self.create(Feature, slug='parent', name={'en': 'Parent'})
+        feature = self.create(
+            Feature, slug='feature', name={'en': 'Feature'}, parent=parent)
+        section.features.add(feature)
+        version = self.create(Version, browser=self.old, version='1.0')
+        support = self.create(Support, version=version, feature=feature)
+        expected = {
+            'maturity': (maturity, 'maturities', 'specifications'),
+            'specification': (spec, 'specifications', 'sections'),
+            'section': (section, 'sections', 'features'),
+            'feature': (feature, 'features', 'supports'),
+            'version': (version, 'versions', 'supports'),
+            'support': (support, 'supports', 'history'),
+            'browser': (self.old, 'browsers', 'versions'),
+        }
+        for name, (instance, resource_type, link) in expected.items():
+            response = self.client.get(reverse(name + '-export'))
+            self.assertEqual(200, response.status_code, name)
+            content = b''.join(response.streaming_content).decode('utf-8')
+            resources = dict(
+                (resource['id'], resource) for resource in (
+                    loads(line)[resource_type]
+                    for line in content.splitlines()))
+            self.assertIn(str(instance.pk), resources, name)
+            links = resources[str(instance.pk)]['links']
+            self.assertIn(link, links, name)
+            if name == 'feature':
+                self.assertEqual([str(support.pk)], links['supports'])
+
+    def test_export_bad_modified_since(self):
+        response = self.client.get(
+            reverse('browser-export'), {'modified_since': 'yesterday'})
+        self.assertEqual(400, response.status_code)
+
+
+class TestBatch(APITestCase):
+    def setUp(self):
+        self.browsers = [
+            self.create(Browser, slug=slug, name={'en': slug})
+            for slug in ('chrome', 'firefox', 'safari')]
+
+    def get_ids(self, ids):
+        response = self.client.get(reverse('browser-list'), {'ids': ids})
+        self.assertEqual(200, response.status_code, response.content)
+        content = loads(response.content.decode('utf-8'))
+        self.assertNotIn('meta', content)
+        return [browser['id'] for browser in content['browsers']]
+
+    def test_ids_in_requested_order(self):
+        pks = [str(self.browsers[i].pk) for i in (2, 0)]
+        self.assertEqual(pks, self.get_ids(','.join(pks)))
+
+    def test_missing_and_duplicate_ids(self):
+        pk = str(self.browsers[1].pk)
+        self.assertEqual([pk], self.get_ids('%s,666,%s' % (pk, pk)))
+
+    def test_one_cache_request(self):
+        pks = ','.join(str(browser.pk) for browser in self.browsers)
+        with mock.patch.object(
+                Cache, 'get_instances', autospec=True,
+                side_effect=Cache.get_instances) as mock_get:
+            self.assertEqual(3, len(self.get_ids(pks)))
+        self.assertEqual(1, mock_get.call_count)
+
+    def test_invalid_ids(self):
+        response = self.client.get(reverse('browser-list'), {'ids': '1,a'})
+        self.assertEqual(400, response.status_code)
+
+    def test_non_positive_ids(self):
+        for ids in ('0', '1,-2'):
+            response = self.client.get(reverse('browser-list'), {'ids': ids})
+            self.assertEqual(400, response.status_code, ids)
+
+    def test_too_many_ids(self):
+        with mock.patch.object(BatchMixin, 'batch_max_ids', 2):
+            response = self.client.get(
+                reverse('browser-list'), {'ids': '1,2,3'})
+        self.assertEqual(400, response.status_code)
+
+
 class TestHistoricaViewset(APITestCase):
     """Test common historical viewset functionality through browsers."""
     def test_get_historical_browser_detail(self):
@@ -3,7 +3,7 @@ from django.views.generic.base import RedirectView
 from mdn.urls import mdn_urlpatterns
 from webplatformcompat.routers import router
 
-from .views import RequestView, ViewFeature
+from .views import CacheStats, RequestView, Snapshot, ViewFeature
 
 
 webplatformcompat_urlpatterns = patterns(
@@ -21,7 +21,9 @@ webplatformcompat_urlpatterns = patterns(
         namespace='rest_framework')),
     url(r'^api/$', RedirectView.as_view(url='/api/v1/', permanent=False),
         name='api_root'),
+    url(r'^api/v1/snapshot$', Snapshot.as_view(), name='snapshot'),
     url(r'^api/v1/', include(router.urls)),
+    url(r'^cache_stats$', CacheStats.as_view(), name='cache_stats'),
     url(r'^importer$', RedirectView.as_view(
         url='/importer/', permanent=False)),
     url(r'^importer/', include(mdn_urlpatterns)),
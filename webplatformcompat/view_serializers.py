@@ -14,7 +14,7 @@ from rest_framework.serializers import (
 from rest_framework.utils.serializer_helpers import ReturnDict
 
 from tools.resources import Collection, CollectionChangeset
-from .cache import Cache
+from .cache import Cache, FeatureDescendantPKs
 from .models import (
     Browser, Feature, Maturity, Section, Specification, Support, Version)
 from .serializers import (
@@ -390,10 +390,8 @@ class ViewFeatureExtraSerializer(ModelSerializer):
             # The cached PK list is enough to populate descendant_pks
             descendant_pks = obj.descendants.values_list('id', flat=True)
         else:
-            # Load the real object to get the full list of descendants
-            real_obj = Feature.objects.get(id=obj.id)
-            descendant_pks = real_obj.get_descendants().values_list(
-                'pk', flat=True)
+            # Load pages of descendants from the cached descendant index
+            descendant_pks = FeatureDescendantPKs(Cache(), obj)
         descendants = CachedQueryset(
             Cache(), Feature.objects.all(), descendant_pks)
         obj.paginated_child_features = Paginator(descendants, per_page)
@@ -506,60 +504,54 @@ class ViewFeatureExtraSerializer(ModelSerializer):
 
         A version is important if it is the first version with support
         information, or it changes support from the previous version.
+
+        Supports are bucketed by browser and version order, so the pass is
+        linear in the number of supports and versions.
         """
-        # Create lookup of ID/PK -> instances
-        browsers = {}
+        # Create index of browser ID -> version ID -> version order
+        version_order = {}
         for browser in obj.all_browsers:
-            # Cache version order
-            browser.version_ids = browser.versions.values_list('id', flat=True)
-            browsers[browser.id] = browser
-        versions = dict(
-            [(version.id, version) for version in obj.all_versions])
-        features = dict(
-            [(feature.id, feature) for feature in obj.child_features])
-        features[obj.id] = obj
-
-        # Create index of supported browser / version / features
-        supported = []
+            version_ids = browser.versions.values_list('id', flat=True)
+            version_order[browser.id] = dict(
+                (v_id, order) for order, v_id in enumerate(version_ids))
+        browser_ids = dict(
+            [(version.id, version.browser.pk) for version in obj.all_versions])
+
+        # Bucket supports by browser and version order
+        buckets = dict(
+            (b_id, [[] for _ in range(len(orders))])
+            for b_id, orders in version_order.items())
         for support in obj.all_supports:
-            version = versions[support.version.pk]
-            browser = browsers[version.browser.pk]
-            version_order = browser.version_ids.index(version.id)
-            feature = features[support.feature.pk]
-            support_attrs = (
-                support.support,
-                support.prefix,
-                support.prefix_mandatory,
-                support.alternate_name,
-                support.alternate_mandatory,
-                support.requires_config,
-                support.default_config,
-                support.protected,
-                repr(support.note),
-            )
-            supported.append((
-                feature.id, browser.id, version_order, version.id,
-                support.id, support_attrs))
-        supported.sort()
+            v_id = support.version.pk
+            b_id = browser_ids[v_id]
+            buckets[b_id][version_order[b_id][v_id]].append(support)
 
         # Identify significant browser / version / supports by feature
         sig_features = {}
-        last_f_id = None
-        last_b_id = None
-        last_support = None
-        for f_id, b_id, _, v_id, s_id, support in supported:
-            if last_f_id != f_id:
-                last_support = None
-                last_f_id = f_id
-            if last_b_id != b_id:
-                last_support = None
-                last_b_id = b_id
-
-            if last_support != support:
-                sig_feature = sig_features.setdefault(f_id, OrderedDict())
-                sig_browser = sig_feature.setdefault(str(b_id), [])
-                sig_browser.append(str(s_id))
-                last_support = support
+        for b_id in sorted(buckets):
+            last_supports = {}
+            for bucket in buckets[b_id]:
+                if len(bucket) > 1:
+                    bucket.sort(key=lambda support: support.id)
+                for support in bucket:
+                    f_id = support.feature.pk
+                    support_attrs = (
+                        support.support,
+                        support.prefix,
+                        support.prefix_mandatory,
+                        support.alternate_name,
+                        support.alternate_mandatory,
+                        support.requires_config,
+                        support.default_config,
+                        support.protected,
+                        support.note,
+                    )
+                    if last_supports.get(f_id) != support_attrs:
+                        sig_feature = sig_features.setdefault(
+                            f_id, OrderedDict())
+                        sig_browser = sig_feature.setdefault(str(b_id), [])
+                        sig_browser.append(str(support.id))
+                        last_supports[f_id] = support_attrs
 
         # Order significant features
         significant_changes = OrderedDict()
@@ -652,21 +644,46 @@ class ViewFeatureExtraSerializer(ModelSerializer):
                             notes.append(sig_support_pk)
         return OrderedDict((note, i) for i, note in enumerate(notes, 1))
 
-    def get_meta(self, obj):
-        """Assemble the metadata for the feature view."""
+    def compat_table(self, obj):
+        """Assemble the request-independent compat_table metadata."""
         significant_changes = self.significant_changes(obj)
         browser_tabs = self.browser_tabs(obj)
-        pagination = self.pagination(obj)
         languages = self.find_languages(obj)
         notes = self.ordered_notes(
             obj, significant_changes, browser_tabs)
+        return OrderedDict((
+            ('supports', significant_changes),
+            ('tabs', browser_tabs),
+            ('languages', languages),
+            ('notes', notes),
+        ))
+
+    def get_meta(self, obj):
+        """Assemble the metadata for the feature view.
+
+        For cached features, the compat_table metadata (except for the
+        request-dependent pagination links) is cached per feature and page.
+        """
+        page = obj.page_child_features.number
+        if isinstance(obj, Feature):
+            # It's a real Feature, such as after an update
+            compat_table = self.compat_table(obj)
+        else:
+            cache = Cache()
+            compat_table = cache.get_view_feature_meta(
+                obj.id, page, tree_id=obj.tree_id)
+            if compat_table is None:
+                compat_table = self.compat_table(obj)
+                cache.set_view_feature_meta(
+                    obj.id, page, compat_table, tree_id=obj.tree_id)
+
         meta = OrderedDict((
             ('compat_table', OrderedDict((
-                ('supports', significant_changes),
-                ('tabs', browser_tabs),
-                ('pagination', pagination),
-                ('languages', languages),
-                ('notes', notes),
+                ('supports', compat_table['supports']),
+                ('tabs', compat_table['tabs']),
+                ('pagination', self.pagination(obj)),
+                ('languages', compat_table['languages']),
+                ('notes', compat_table['notes']),
             ))),))
         return meta
 
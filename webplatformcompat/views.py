@@ -1,4 +1,10 @@
-from django.views.generic import TemplateView
+from django.http import (
+    Http404, HttpResponseForbidden, HttpResponseNotModified, JsonResponse,
+    StreamingHttpResponse)
+from django.views.generic import TemplateView, View
+
+from .cache import Cache
+from .snapshot import get_snapshot_index, snapshot_storage
 
 
 class RequestContextMixin(object):
@@ -18,3 +24,35 @@ class ViewFeature(RequestContextMixin, TemplateView):
         ctx = super(ViewFeature, self).get_context_data(**kwargs)
         ctx['feature_id'] = self.kwargs['feature_id']
         return ctx
+
+
+class CacheStats(View):
+    """Cache statistics of the process serving the request, for staff."""
+
+    def get(self, request):
+        if not request.user.is_staff:
+            return HttpResponseForbidden()
+        return JsonResponse(Cache().get_stats())
+
+
+class Snapshot(View):
+    """Download the snapshot of all resources."""
+
+    def get(self, request):
+        storage = snapshot_storage()
+        index = storage and get_snapshot_index(storage)
+        if not index:
+            raise Http404('No snapshot is available.')
+        etag = '"%s"' % index['name']
+        header = request.META.get('HTTP_IF_NONE_MATCH', '')
+        etags = [value.strip() for value in header.split(',')]
+        if etag in etags or '*' in etags:
+            response = HttpResponseNotModified()
+        else:
+            response = StreamingHttpResponse(
+                storage.open(index['name']), content_type='application/gzip')
+            response['Content-Length'] = index['size']
+            response['Content-Disposition'] = (
+                'attachment; filename="snapshot.json.gz"')
+        response['ETag'] = etag
+        return response
@@ -1,22 +1,34 @@
 # -*- coding: utf-8 -*-
 
+from hashlib import md5
+from json import dumps
+
 from django.contrib.auth.models import User
-from django.http import Http404
+from django.http import (
+    Http404, HttpResponse, HttpResponseBadRequest, HttpResponseNotModified,
+    StreamingHttpResponse)
+from django.utils import translation
+from django.utils.dateparse import parse_datetime
+from rest_framework.decorators import list_route
 from rest_framework.mixins import UpdateModelMixin
 from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet as BaseModelViewSet
 from rest_framework.viewsets import ReadOnlyModelViewSet as BaseROModelViewSet
 
 from drf_cached_instances.mixins import CachedViewMixin as BaseCacheViewMixin
+from drf_cached_instances.models import CachedModel, CachedQueryset
 
 from .cache import Cache
 from .history import Changeset
 from .mixins import PartialPutMixin
 from .models import (
-    Browser, Feature, Maturity, Section, Specification, Support, Version)
+    Browser, Feature, Maturity, Section, Specification, Support, Version,
+    cached_model_names, invalidate_view_feature_responses)
 from .parsers import JsonApiParser
-from .renderers import JsonApiRenderer, JsonApiTemplateHTMLRenderer
+from .renderers import (
+    CachedJsonApiRenderer, JsonApiRenderer, JsonApiTemplateHTMLRenderer)
 from .serializers import (
     BrowserSerializer, FeatureSerializer, MaturitySerializer,
     SectionSerializer, SpecificationSerializer, SupportSerializer,
@@ -38,16 +50,36 @@ class CachedViewMixin(BaseCacheViewMixin):
     cache_class = Cache
 
     def perform_create(self, serializer):
-        kwargs = {}
-        if getattr(self.request, 'delay_cache', False):
-            kwargs['_delay_cache'] = True
-        serializer.save(**kwargs)
+        self.perform_save(serializer, created=True)
 
     def perform_update(self, serializer):
-        kwargs = {}
+        self.perform_save(serializer, created=False)
+
+    def perform_save(self, serializer, created):
+        """Save the instance, and write it through to the instance cache.
+
+        The post_save signal skips the cache update, and the saved instance
+        is cached with the related PKs it already knows, rather than being
+        reloaded.
+        """
+        model_name = serializer.Meta.model.__name__
         if getattr(self.request, 'delay_cache', False):
-            kwargs['_delay_cache'] = True
-        serializer.save(**kwargs)
+            serializer.save(_delay_cache=True)
+            return
+        if model_name not in cached_model_names:
+            serializer.save()
+            return
+
+        instance = serializer.save(_write_through_cache=True)
+        instance._write_through_cache = False
+        cache = self.get_queryset_cache()
+        cache.add_known_related_pks(
+            model_name, instance, created, serializer.validated_data)
+
+        from .tasks import update_cache_for_instance
+        update_cache_for_instance(
+            model_name, instance.pk, instance, update_only=False)
+        invalidate_view_feature_responses(model_name, instance)
 
     def perform_destroy(self, instance):
         if getattr(self.request, 'delay_cache', False):
@@ -55,8 +87,126 @@ class CachedViewMixin(BaseCacheViewMixin):
         instance.delete()
 
 
+class ExportMixin(object):
+    """Add an export of the whole collection, streamed from the cache."""
+
+    # Number of instances read from the cache at a time
+    export_chunk_size = 500
+
+    # Renderer used to convert instances to JSON API resources
+    export_renderer_class = JsonApiRenderer
+
+    @list_route(methods=['get'])
+    def export(self, request):
+        """Stream every instance as newline-delimited JSON API resources.
+
+        The collection is filtered like the list view, and by the
+        modified_since parameter, an ISO 8601 date-time.  Primary keys are
+        read a chunk at a time in ID order, and the instances are loaded
+        from the instance cache.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        modified_since = request.query_params.get('modified_since')
+        if modified_since:
+            since = parse_datetime(modified_since)
+            if since is None:
+                return HttpResponseBadRequest(
+                    'modified_since must be an ISO 8601 date-time.')
+            history = queryset.model.history.model.objects
+            queryset = queryset.filter(pk__in=history.filter(
+                history_date__gte=since).values('id'))
+        return StreamingHttpResponse(
+            self.export_lines(queryset.order_by('id')),
+            content_type='application/x-ndjson')
+
+    def export_lines(self, queryset):
+        """Generate the exported lines, a chunk at a time."""
+        renderer_context = self.get_renderer_context()
+        resource_type = self.export_resource_type()
+        for pks in self.export_chunks(queryset):
+            resources = self.export_resources(
+                queryset, pks, renderer_context)
+            for resource in resources:
+                yield dumps(
+                    {resource_type: resource},
+                    cls=JsonApiRenderer.encoder_class) + '\n'
+
+    def export_chunks(self, queryset):
+        """Generate lists of primary keys, using ID ranges."""
+        last_pk = 0
+        while True:
+            pks = list(queryset.filter(pk__gt=last_pk).values_list(
+                'pk', flat=True)[:self.export_chunk_size])
+            if not pks:
+                break
+            last_pk = pks[-1]
+            yield pks
+
+    def export_resource_type(self):
+        """Get the JSON API resource type of the exported instances."""
+        model = self.get_serializer_class().Meta.model
+        return self.export_renderer_class().model_to_resource_type(model)
+
+    def export_resources(self, queryset, pks, renderer_context):
+        """Get instances from the cache as JSON API resources."""
+        renderer = self.export_renderer_class()
+        # A list, so the renderer can find related models on an instance
+        instances = list(
+            CachedQueryset(self.get_queryset_cache(), queryset, pks))
+        serializer = self.get_serializer(instances, many=True)
+        data = serializer.data
+        fields = serializer.child.fields
+        for item in data:
+            item.fields = fields
+        wrapper = renderer.wrap_default(list(data), renderer_context)
+        return wrapper[self.export_resource_type()]
+
+
+class BatchMixin(object):
+    """Add fetching a list of instances by ID, from the cache."""
+
+    # Most IDs in one request
+    batch_max_ids = 100
+
+    def list(self, request, *args, **kwargs):
+        """Return the instances for the ids parameter, if given.
+
+        The ids parameter is a comma-separated list of positive integer
+        IDs.  The instances are read from the instance cache with one
+        request, and returned unpaginated in the requested order.  IDs
+        without an instance are omitted, and other filters are ignored.
+        """
+        ids = request.query_params.get('ids')
+        if ids is None:
+            return super(BatchMixin, self).list(request, *args, **kwargs)
+        pks = []
+        try:
+            for raw_pk in ids.split(','):
+                pk = int(raw_pk)
+                if pk <= 0:
+                    raise ValueError('IDs are positive')
+                if pk not in pks:
+                    pks.append(pk)
+        except ValueError:
+            return HttpResponseBadRequest(
+                'ids must be a comma-separated list of IDs.')
+        if len(pks) > self.batch_max_ids:
+            return HttpResponseBadRequest(
+                'ids is limited to %d IDs.' % self.batch_max_ids)
+
+        model = self.get_serializer_class().Meta.model
+        model_name = model.__name__
+        instances = self.get_queryset_cache().get_instances(
+            [(model_name, batch_pk, None) for batch_pk in pks])
+        batch = [
+            CachedModel(model, instances[(model_name, batch_pk)][0])
+            for batch_pk in pks if (model_name, batch_pk) in instances]
+        serializer = self.get_serializer(batch, many=True)
+        return Response(serializer.data)
+
+
 class ModelViewSet(PartialPutMixin, CachedViewMixin, BaseModelViewSet):
-    renderer_classes = (JsonApiRenderer, BrowsableAPIRenderer)
+    renderer_classes = (CachedJsonApiRenderer, BrowsableAPIRenderer)
     parser_classes = (JsonApiParser, FormParser, MultiPartParser)
 
 
@@ -75,13 +225,13 @@ class UpdateOnlyModelViewSet(
 # 'Regular' viewsets
 #
 
-class BrowserViewSet(ModelViewSet):
+class BrowserViewSet(BatchMixin, ExportMixin, ModelViewSet):
     queryset = Browser.objects.order_by('id')
     serializer_class = BrowserSerializer
     filter_fields = ('slug',)
 
 
-class FeatureViewSet(ModelViewSet):
+class FeatureViewSet(BatchMixin, ExportMixin, ModelViewSet):
     queryset = Feature.objects.order_by('id')
     serializer_class = FeatureSerializer
     filter_fields = ('slug', 'parent')
@@ -95,30 +245,30 @@ class FeatureViewSet(ModelViewSet):
         return qs
 
 
-class MaturityViewSet(ModelViewSet):
+class MaturityViewSet(BatchMixin, ExportMixin, ModelViewSet):
     queryset = Maturity.objects.order_by('id')
     serializer_class = MaturitySerializer
     filter_fields = ('slug',)
 
 
-class SectionViewSet(ModelViewSet):
+class SectionViewSet(BatchMixin, ExportMixin, ModelViewSet):
     queryset = Section.objects.order_by('id')
     serializer_class = SectionSerializer
 
 
-class SpecificationViewSet(ModelViewSet):
+class SpecificationViewSet(BatchMixin, ExportMixin, ModelViewSet):
     queryset = Specification.objects.order_by('id')
     serializer_class = SpecificationSerializer
     filter_fields = ('slug', 'mdn_key')
 
 
-class SupportViewSet(ModelViewSet):
+class SupportViewSet(BatchMixin, ExportMixin, ModelViewSet):
     queryset = Support.objects.order_by('id')
     serializer_class = SupportSerializer
     filter_fields = ('version', 'feature')
 
 
-class VersionViewSet(ModelViewSet):
+class VersionViewSet(BatchMixin, ExportMixin, ModelViewSet):
     queryset = Version.objects.order_by('id')
     serializer_class = VersionSerializer
     filter_fields = ('browser', 'browser__slug', 'version', 'status')
@@ -198,6 +348,9 @@ class ViewFeaturesViewSet(UpdateOnlyModelViewSet):
         JsonApiRenderer, BrowsableAPIRenderer, JsonApiTemplateHTMLRenderer)
     template_name = 'webplatformcompat/feature.basic.jinja2'
 
+    # The related data and the HTML template need all the fields
+    sparse_fieldsets = False
+
     def get_serializer_class(self):
         """Return the list serializer when needed."""
         if self.action == 'list':
@@ -205,16 +358,112 @@ class ViewFeaturesViewSet(UpdateOnlyModelViewSet):
         else:
             return super(ViewFeaturesViewSet, self).get_serializer_class()
 
-    def get_object_or_404(self, queryset, *filter_args, **filter_kwargs):
-        """The feature can be accessed by primary key or by feature slug."""
-        pk_or_slug = filter_kwargs['pk']
+    # Rendered responses in these formats are cached
+    cached_response_formats = ('json', 'html')
+    cached_response_headers = ('Content-Type', 'ETag', 'Vary', 'Allow')
+
+    def get_feature_pk(self, pk_or_slug):
+        """Get the feature primary key from a primary key or feature slug."""
         try:
-            pk = int(pk_or_slug)
+            return int(pk_or_slug)
         except ValueError:
             try:
-                pk = Feature.objects.only('pk').get(slug=pk_or_slug).pk
-            except queryset.model.DoesNotExist:
-                raise Http404(
-                    'No %s matches the given query.' % queryset.model)
+                return Feature.objects.only('pk').get(slug=pk_or_slug).pk
+            except Feature.DoesNotExist:
+                raise Http404('No %s matches the given query.' % Feature)
+
+    def get_object_or_404(self, queryset, *filter_args, **filter_kwargs):
+        """The feature can be accessed by primary key or by feature slug."""
+        pk = self.get_feature_pk(filter_kwargs['pk'])
         return super(ViewFeaturesViewSet, self).get_object_or_404(
             queryset, pk=pk)
+
+    def get_response_cache_keys(self, request, pk_or_slug):
+        """Get the rendered response cache key and stale response key.
+
+        Return is (None, None) if the response is not cacheable.
+        """
+        renderer = request.accepted_renderer
+        if renderer.format not in self.cached_response_formats:
+            return None, None
+        pk = self.get_feature_pk(pk_or_slug)
+        if renderer.format == 'html':
+            # The HTML varies by the path, query parameters, and language,
+            # but not by the order of the query parameters
+            query = sorted(
+                (name, value)
+                for name, values in request.query_params.lists()
+                for value in values)
+            variant = (
+                request.accepted_media_type, renderer.format,
+                request.build_absolute_uri(request.path), query,
+                request.query_params.get('lang', translation.get_language()))
+        else:
+            variant = (
+                request.accepted_media_type, renderer.format,
+                request.build_absolute_uri(), translation.get_language())
+        cache = Cache()
+        key = cache.view_feature_response_key(pk, *variant)
+        if key is None:
+            return None, None
+        return key, cache.view_feature_response_stale_key(pk, *variant)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Return a cached rendered response, if available.
+
+        On a miss, only one worker renders the response, while the others
+        serve the stale response or wait for the rendered response.
+        """
+        self.response_cache_keys = (None, None)
+        if request.method == 'GET':
+            key, stale_key = self.get_response_cache_keys(
+                request, kwargs['pk'])
+            cached = key and Cache().get_view_feature_response(
+                key, stale_key)
+            if cached:
+                headers, content = cached
+                response = HttpResponse(content)
+                for header, value in headers:
+                    response[header] = value
+                return self.not_modified(request, response) or response
+            self.response_cache_keys = (key, stale_key)
+        return super(ViewFeaturesViewSet, self).retrieve(
+            request, *args, **kwargs)
+
+    def not_modified(self, request, response):
+        """Return a 304 response if the client has the current response."""
+        header = request.META.get('HTTP_IF_NONE_MATCH', '')
+        etags = [etag.strip() for etag in header.split(',')]
+        if response['ETag'] in etags or '*' in etags:
+            not_modified = HttpResponseNotModified()
+            not_modified['ETag'] = response['ETag']
+            return not_modified
+        return None
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        """Render and cache a successful response.
+
+        The lease to render the response is released if the response is not
+        cached, including when rendering fails.
+        """
+        response = super(ViewFeaturesViewSet, self).finalize_response(
+            request, response, *args, **kwargs)
+        key, stale_key = getattr(
+            self, 'response_cache_keys', (None, None))
+        if key and response.status_code == 200:
+            try:
+                response.render()
+                response['ETag'] = '"%s"' % md5(response.content).hexdigest()
+                headers = [
+                    (header, response[header])
+                    for header in self.cached_response_headers
+                    if response.has_header(header)]
+                Cache().set_view_feature_response(
+                    key, headers, response.content, stale_key)
+            except Exception:
+                Cache().release_view_feature_response_lease(key)
+                raise
+            response = self.not_modified(request, response) or response
+        elif key:
+            Cache().release_view_feature_response_lease(key)
+        return response
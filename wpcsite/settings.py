@@ -50,7 +50,18 @@ MEMCACHE_PASSWORD - password for memcache servers
 USE_DRF_INSTANCE_CACHE - 1 to enable, 0 to disable, default enabled
 DRF_INSTANCE_CACHE_POPULATE_COLD - 1 to recursively populate a cold cache on
   updates, 0 to be eventually consistent, default enabled
+DRF_INSTANCE_CACHE_GENERATIONS - 1 to invalidate by changing cache key
+  generations on updates, 0 to recompute invalid entries, default disabled
+DRF_INSTANCE_CACHE_COMPACT - 1 to store instances in a compact (delta-encoded,
+  compressed) format, 0 to store as JSON, default disabled
+DRF_INSTANCE_CACHE_LOCAL_SIZE - Number of hot instances to also cache in each
+  process, 0 to disable, default disabled.  Other processes drop their copies
+  up to a second after a change, so they may serve stale instances until then
+DRF_INSTANCE_CACHE_STATS - 1 to record cache hits, misses, and timings, and log
+  them for each request, 0 to disable, default disabled
 SECRET_KEY - Overrides SECRET_KEY
+SNAPSHOT_ROOT - Folder for the snapshot of all resources, updated when
+  changesets close.  Default is no snapshot
 SECURE_PROXY_SSL_HEADER - "HTTP_X_FORWARDED_PROTOCOL,https" to enable
 SERVER_EMAIL - Email 'From' address for error messages to admins
 STATIC_ROOT - Overrides STATIC_ROOT
@@ -133,6 +144,7 @@ MIDDLEWARE_CLASSES = (
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'webplatformcompat.history.HistoryChangesetRequestMiddleware',
+    'webplatformcompat.cache.CacheStatsMiddleware',
 )
 
 ROOT_URLCONF = 'wpcsite.urls'
@@ -286,6 +298,8 @@ REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': [
         'webplatformcompat.filters.UnorderedDjangoFilterBackend',
     ],
+    'DEFAULT_PAGINATION_CLASS':
+        'webplatformcompat.pagination.OptionalCursorPagination',
     'PAGINATE_BY': 10,
     'PAGINATE_BY_PARAM': 'page_size',
     'MAX_PAGINATE_BY': 100,
@@ -317,6 +331,17 @@ USE_DRF_INSTANCE_CACHE = (
     environ.get('USE_DRF_INSTANCE_CACHE', '1') not in (0, '0'))
 DRF_INSTANCE_CACHE_POPULATE_COLD = (
     environ.get('DRF_INSTANCE_CACHE_POPULATE_COLD', '1') not in (0, '0'))
+DRF_INSTANCE_CACHE_GENERATIONS = (
+    environ.get('DRF_INSTANCE_CACHE_GENERATIONS', '0') not in (0, '0'))
+DRF_INSTANCE_CACHE_COMPACT = (
+    environ.get('DRF_INSTANCE_CACHE_COMPACT', '0') not in (0, '0'))
+DRF_INSTANCE_CACHE_LOCAL_SIZE = int(
+    environ.get('DRF_INSTANCE_CACHE_LOCAL_SIZE', '0'))
+DRF_INSTANCE_CACHE_STATS = (
+    environ.get('DRF_INSTANCE_CACHE_STATS', '0') not in (0, '0'))
+
+# Snapshot of all resources
+SNAPSHOT_ROOT = environ.get('SNAPSHOT_ROOT')
 
 # CORS Middleware
 CORS_ORIGIN_ALLOW_ALL = True